@@ -1,12 +1,132 @@
-from OCP.AIS import AIS_Shape
+from dataclasses import dataclass
+from typing import Optional
+
+from OCP.AIS import AIS_InteractiveContext, AIS_Shape
+from OCP.Aspect import Aspect_TOL_EMPTY, Aspect_TOL_SOLID
 from OCP.Graphic3d import Graphic3d_MaterialAspect, Graphic3d_NOM_JADE
-from OCP.Quantity import Quantity_Color
+from OCP.Prs3d import Prs3d_Drawer
+from OCP.Quantity import Quantity_Color, Quantity_TOC_RGB
+
+from cq_viewer.quality import FULL_QUALITY, RenderQuality
+from cq_viewer.util import anti_color, highlight_color, quantity_to_tuple
+
+
+StyleKey = tuple[tuple[float, float, float], Optional[float], bool]
+
+
+@dataclass
+class ShapeStyle:
+    transparency: Optional[float]
+    drawer: Prs3d_Drawer
+    # None for shapes that are not selectable
+    highlight: Optional[Prs3d_Drawer]
+    selection: Optional[Prs3d_Drawer]
+
+
+class StylePalette:
+    """
+    Interned drawers keyed by (colour, transparency, selectable).
+
+    Shapes link their own drawer to the drawer of their style instead of
+    setting up own aspects, so styling a shape is a dictionary lookup and
+    render quality changes touch each style once instead of every shape.
+    The drawers of the shapes stay separate since the deflection computed
+    for a shape is stored in its drawer.
+    """
+
+    def __init__(self):
+        self._styles: dict[StyleKey, ShapeStyle] = {}
+        self.quality = FULL_QUALITY
+
+    def __len__(self):
+        return len(self._styles)
+
+    def clear(self):
+        """Only while no shape is displayed with one of the styles"""
+        self._styles.clear()
+
+    def style(
+        self,
+        ctx: AIS_InteractiveContext,
+        color: Quantity_Color,
+        transparency: Optional[float],
+        selectable: bool,
+    ) -> ShapeStyle:
+        key = (quantity_to_tuple(color), transparency, selectable)
+        if (style := self._styles.get(key)) is None:
+            style = self._styles[key] = self._create(
+                ctx, color, transparency, selectable
+            )
+        return style
+
+    def _create(
+        self,
+        ctx: AIS_InteractiveContext,
+        color: Quantity_Color,
+        transparency: Optional[float],
+        selectable: bool,
+    ) -> ShapeStyle:
+        drawer = Prs3d_Drawer()
+        drawer.Link(ctx.DefaultDrawer())
+        drawer.SetupOwnShadingAspect()
+        drawer.ShadingAspect().SetMaterial(
+            Graphic3d_MaterialAspect(Graphic3d_NOM_JADE)
+        )
+        drawer.ShadingAspect().SetColor(color)
+        drawer.SetupOwnFaceBoundaryAspect()
+        drawer.FaceBoundaryAspect().SetColor(
+            Quantity_Color(*anti_color(color), Quantity_TOC_RGB)
+        )
+
+        highlight = selection = None
+        if selectable:
+            selection = Prs3d_Drawer()
+            selection.Link(drawer)
+            selection.SetColor(highlight_color(color, 0.1))
+
+            highlight = Prs3d_Drawer()
+            highlight.Link(drawer)
+            highlight.SetColor(highlight_color(color, 0.05))
+            highlight.SetupOwnFaceBoundaryAspect()
+            # highlight.FaceBoundaryAspect().SetColor does not work :-(
+            # Make it at least a bit thicker..
+            highlight.FaceBoundaryAspect().SetWidth(4)
+
+        style = ShapeStyle(transparency, drawer, highlight, selection)
+        self._apply_quality(style, self.quality)
+        return style
+
+    def apply(
+        self,
+        ctx: AIS_InteractiveContext,
+        ais_shape: AIS_Shape,
+        color: Quantity_Color,
+        transparency: Optional[float],
+        selectable: bool,
+    ):
+        style = self.style(ctx, color, transparency, selectable)
+        attributes = ais_shape.Attributes()
+        attributes.Link(style.drawer)
+        # An own shading aspect from SetColor or SetTransparency would hide
+        # the style. Sharing the aspect of the style keeps HasColor, Color
+        # and Transparency, which the next display reads the style from.
+        if attributes.HasOwnShadingAspect():
+            attributes.SetShadingAspect(style.drawer.ShadingAspect())
+        if style.selection is not None:
+            ais_shape.SetHilightAttributes(style.selection)
+            ais_shape.SetDynamicHilightAttributes(style.highlight)
 
+    @staticmethod
+    def _apply_quality(style: ShapeStyle, quality: RenderQuality):
+        line_type = Aspect_TOL_SOLID if quality.face_boundaries else Aspect_TOL_EMPTY
+        style.drawer.FaceBoundaryAspect().SetTypeOfLine(line_type)
+        if style.transparency is not None:
+            style.drawer.ShadingAspect().SetTransparency(
+                style.transparency if quality.transparency else 0
+            )
 
-def set_color(ais: AIS_Shape, color: Quantity_Color, transparency=None):
-    attrs = ais.Attributes()
-    attrs.SetupOwnShadingAspect()
-    attrs.ShadingAspect().SetMaterial(Graphic3d_MaterialAspect(Graphic3d_NOM_JADE))
-    attrs.ShadingAspect().SetColor(color)
-    if transparency is not None:
-        attrs.ShadingAspect().SetTransparency(transparency)
+    def apply_quality(self, quality: RenderQuality):
+        """Presentations pick the change up with SynchronizeAspects"""
+        self.quality = quality
+        for style in self._styles.values():
+            self._apply_quality(style, quality)
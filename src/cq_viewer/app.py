@@ -1,36 +1,93 @@
+import argparse
 import logging
 import os
 import pathlib
+import time
+from collections import deque
 from typing import Optional
 
 import wx
-from OCP.AIS import AIS_Shaded, AIS_Shape
+from OCP.AIS import AIS_Shaded, AIS_Shape, AIS_Triangulation, AIS_WireFrame
 from OCP.Aspect import Aspect_GDM_Lines, Aspect_GFM_VER, Aspect_GT_Rectangular
 from OCP.gp import gp_Pln
-from OCP.Graphic3d import Graphic3d_Camera
-from OCP.Prs3d import Prs3d_Drawer
+from OCP.Graphic3d import (
+    Graphic3d_Camera,
+    Graphic3d_RenderingParams,
+    Graphic3d_ZLayerId_Top,
+)
 from OCP.Quantity import Quantity_Color, Quantity_TOC_RGB
-from OCP.TopAbs import TopAbs_EDGE, TopAbs_FACE, TopAbs_VERTEX
+from OCP.TopAbs import TopAbs_EDGE, TopAbs_FACE, TopAbs_SOLID, TopAbs_VERTEX
 from OCP.TopoDS import TopoDS_Shape
+from OCP.TopTools import TopTools_IndexedMapOfShape
 
-from cq_viewer import ais, wx_components
-from cq_viewer.interface import exec_file, execution_context, knife_b123d, knife_cq
+from cq_viewer import wx_components
+from cq_viewer.ais import StylePalette
+from cq_viewer.clash import (
+    Clash,
+    ClashSolid,
+    clash_measurement,
+    collect_solids,
+    detect_clashes,
+)
+from cq_viewer.export import (
+    EXPORT_WILDCARD,
+    collect_export_items,
+    detached_items,
+    export_items,
+)
+from cq_viewer.interface import (
+    DisplayObject,
+    exec_file,
+    execution_context,
+    knife_b123d,
+    knife_cq,
+    make_compound,
+)
+from cq_viewer.ipc import ViewerServer
+from cq_viewer.mass_properties import mass_properties_cache
 from cq_viewer.measurement import Measurement, create_measurement, create_midpoint
+from cq_viewer.memory import format_bytes, process_rss
+from cq_viewer.project import FileResult, Project
+from cq_viewer.quality import FULL_QUALITY, INTERACTION_QUALITY, RenderQuality
+from cq_viewer.session import Replayer, Session, SessionRecorder
+from cq_viewer.shape_index import SubShapeRef, find_owner, locate, resolve
+from cq_viewer.snapshot import CameraState, Snapshot, snapshot_item_options
 from cq_viewer.str_enum import StrEnum
+from cq_viewer.sweep import Sweep, variant_label
+from cq_viewer.tessellation import attach_triangulations, tessellate_ais_shapes
+from cq_viewer.thickness import (
+    ThicknessResult,
+    analyze_thickness,
+    thickness_presentation,
+)
+from cq_viewer.timing import timings
+from cq_viewer.tracing import Level, profile_capture, tracer
 from cq_viewer.util import (
-    anti_color,
     color_str_to_quantity_color,
-    highlight_color,
     pending_contains_edges,
     same_topods_vertex,
 )
+from cq_viewer.workers import background_executor
 from cq_viewer.wx_components import MainFrame
 
 logger = logging.getLogger(__name__)
 
 
+RENDER_STATS_LOG_INTERVAL_MS = 2000
+
+# Sketch overlays share the depth of the model but are drawn after it
+SKETCH_OVERLAY_LAYER = Graphic3d_ZLayerId_Top
+
+# Seconds of selection activation per event loop iteration
+SELECTION_ACTIVATION_SLICE = 0.02
+
+# How often a pending replay checks whether the model is ready
+REPLAY_POLL_MS = 100
+
+
 class ConfigKey(StrEnum):
     FILE_PATH = "file_path"
+    PROJECT_FILES = "project_files"
 
 
 class CQViewerContext:
@@ -40,12 +97,65 @@ class CQViewerContext:
             appName="cq-viewer-v1", style=wx.CONFIG_USE_LOCAL_FILE
         )
         self.file_path = self.config.Read(ConfigKey.FILE_PATH, "") or None
+        project_files = self.config.Read(ConfigKey.PROJECT_FILES, "")
+        self.project: Optional[Project] = (
+            Project([pathlib.Path(p) for p in project_files.split(os.pathsep)])
+            if project_files
+            else None
+        )
+        self.changed_paths: set[pathlib.Path] = set()
+        self.sweep: Optional[Sweep] = None
+        self.thickness_presentations: list[AIS_Triangulation] = []
+        # Analyses started before the last toggle or display are dropped
+        self.thickness_generation = 0
+        # Kept apart from measurement, which hovering replaces
+        self.clash_presentations: list[AIS_Shape] = []
+        self.clash_report: Optional[Measurement] = None
+        self.clash_generation = 0
 
-        self.selected_shapes = []
+        self._selected_shapes: tuple[TopoDS_Shape, ...] = ()
+        # Same shapes as selected_shapes for constant time membership tests
+        self.selected_map = TopTools_IndexedMapOfShape()
+        # Re-resolved after a reload, selected once their owners exist
+        self.restored_selection: list[tuple[AIS_Shape, TopoDS_Shape]] = []
         self.detected_shape = None
         self.measurement = Measurement.blank()
         self.midpoint: Optional[AIS_Shape] = None
         self.selected_midpoints: list[AIS_Shape] = []
+        self.solid_selection = False
+        self.selectable_ais_shapes: list[AIS_Shape] = []
+        self.pending_selection_activation: deque[AIS_Shape] = deque()
+        self.style_palette = StylePalette()
+        self.displayed_ais_shapes: list[AIS_Shape] = []
+        # Meshed in worker processes, shown in wireframe until then
+        self.meshing_ais_shapes: list[AIS_Shape] = []
+        # The snapshot is saved once the worker meshes are attached
+        self.snapshot_pending = False
+        # Meshes of shapes that are no longer displayed are dropped
+        self.display_generation = 0
+        self.render_quality = FULL_QUALITY
+        self.interaction_quality = INTERACTION_QUALITY
+        self.interacting = False
+        self.rss_before_reload: Optional[int] = None
+        # Completed executions, a replay waits for the first one
+        self.executions = 0
+        self.recorder: Optional[SessionRecorder] = None
+        self.rss_after_reload: Optional[int] = None
+        self.snapshot_dir = os.path.join(
+            wx.StandardPaths.Get().GetUserLocalDataDir(), "snapshots"
+        )
+        self.ipc_server: Optional[ViewerServer] = None
+
+    @property
+    def selected_shapes(self) -> tuple[TopoDS_Shape, ...]:
+        """Read only, select keeps selected_map in sync"""
+        return self._selected_shapes
+
+    def select(self, shapes: list[TopoDS_Shape]):
+        self._selected_shapes = tuple(shapes)
+        self.selected_map = TopTools_IndexedMapOfShape()
+        for shape in self._selected_shapes:
+            self.selected_map.Add(shape)
 
     @property
     def selected_vx(self):
@@ -61,7 +171,11 @@ class CQViewerContext:
 
     def watch_file(self):
         self.main_frame.file_system_watcher.RemoveAll()
-        self.main_frame.file_system_watcher.Add(str(self.file_path))
+        if self.project:
+            for file_path in self.project.watched_paths:
+                self.main_frame.file_system_watcher.Add(str(file_path))
+        else:
+            self.main_frame.file_system_watcher.Add(str(self.file_path))
 
     def open_file(self) -> Optional[pathlib.Path]:
         current_file_path = self.config.Read(ConfigKey.FILE_PATH, "")
@@ -79,12 +193,160 @@ class CQViewerContext:
 
             # Proceed loading the file chosen by the user
             self.file_path = pathlib.Path(fileDialog.GetPath())
+            self.project = None
             self.config.Write(ConfigKey.FILE_PATH, str(self.file_path))
+            self.config.Write(ConfigKey.PROJECT_FILES, "")
             self.config.Flush()
             self.watch_file()
 
             self.exec_and_display(fit=True)
 
+    def open_project(self):
+        current_file_path = self.config.Read(ConfigKey.FILE_PATH, "")
+        current_dir = os.path.dirname(current_file_path) if current_file_path else ""
+
+        with wx.FileDialog(
+            self.main_frame,
+            message="Open CQ files as a project",
+            defaultDir=current_dir,
+            wildcard="Python files (*.py)|*.py",
+            style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST | wx.FD_MULTIPLE,
+        ) as fileDialog:
+            if fileDialog.ShowModal() == wx.ID_CANCEL:
+                return
+
+            file_paths = [pathlib.Path(path) for path in fileDialog.GetPaths()]
+            self.project = Project(file_paths)
+            # Snapshots are per file, a project has none
+            self.file_path = None
+            self.config.Write(ConfigKey.FILE_PATH, str(file_paths[0]))
+            self.config.Write(
+                ConfigKey.PROJECT_FILES,
+                os.pathsep.join(str(file_path) for file_path in file_paths),
+            )
+            self.config.Flush()
+            self.watch_file()
+
+            execution_context.reset()
+            self.exec_and_display(fit=True, reset_projection=True)
+
+    def export_file(self):
+        if not execution_context.display_objects:
+            return
+
+        current_dir = os.path.dirname(self.file_path) if self.file_path else ""
+        with wx.FileDialog(
+            self.main_frame,
+            message="Export",
+            defaultDir=current_dir,
+            wildcard=EXPORT_WILDCARD,
+            style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT,
+        ) as fileDialog:
+            if fileDialog.ShowModal() == wx.ID_CANCEL:
+                return None
+            export_path = fileDialog.GetPath()
+
+        items = collect_export_items(execution_context.display_objects)
+
+        def progress(fraction: float, message: str):
+            wx.CallAfter(
+                self.main_frame.set_status, f"{message} ({fraction * 100:.0f}%)"
+            )
+
+        def done(future):
+            if exception := future.exception():
+                logger.error("Export failed: %s", exception)
+                wx.CallAfter(self.main_frame.set_status, f"Export failed: {exception}")
+
+        future = background_executor().submit(
+            export_items, items, export_path, progress
+        )
+        future.add_done_callback(done)
+
+    def toggle_render_stats(self):
+        view = self.main_frame.canvas.view
+        params = view.ChangeRenderingParams()
+        params.ToShowStats = not params.ToShowStats
+        params.CollectedStats = Graphic3d_RenderingParams.PerfCounters_All
+        if params.ToShowStats:
+            self.main_frame.render_stats_timer.Start(RENDER_STATS_LOG_INTERVAL_MS)
+        else:
+            self.main_frame.render_stats_timer.Stop()
+            self.main_frame.set_status("")
+        view.Redraw()
+
+    @property
+    def render_stats_enabled(self) -> bool:
+        return self.main_frame.canvas.view.RenderingParams().ToShowStats
+
+    def log_render_stats(self):
+        view = self.main_frame.canvas.view
+        logger.info("Rendering statistics\n%s", view.StatisticInformation().ToCString())
+        logger.info("Last event timings: %s", timings.summary())
+
+    def toggle_tracing(self):
+        if tracer.enabled:
+            tracer.disable()
+            self.main_frame.set_status("Tracing off")
+        else:
+            tracer.enable(Level.DEBUG)
+            self.main_frame.set_status("Tracing on")
+
+    def dump_trace(self):
+        directory = os.path.dirname(self.file_path) if self.file_path else "."
+        file_path = os.path.join(directory, "cq-viewer-trace.json")
+        tracer.write_chrome_trace(file_path)
+        logger.info("Trace written to %s\n%s", file_path, tracer.format_summary())
+        self.main_frame.set_status(f"Trace written to {file_path}")
+
+    def toggle_profiling(self):
+        directory = os.path.dirname(self.file_path) if self.file_path else "."
+        if file_path := profile_capture.toggle(directory):
+            self.main_frame.set_status(f"Profile written to {file_path}")
+        else:
+            self.main_frame.set_status("Profiling...")
+
+    def record_event(self, kind: str, **args):
+        if self.recorder is None:
+            return
+        if not self.recorder.started:
+            canvas = self.main_frame.canvas
+            self.recorder.begin(
+                self.file_path,
+                tuple(canvas.GetClientSize()),
+                CameraState.from_camera(canvas.view.Camera()),
+            )
+        self.recorder.record(kind, **args)
+
+    def start_replay(self, session: Session, realtime=False, exit_when_done=False):
+        """Starts once the model has been executed and selection is ready"""
+        if not self.executions or not self.selection_ready:
+            wx.CallLater(
+                REPLAY_POLL_MS, self.start_replay, session, realtime, exit_when_done
+            )
+            return
+
+        canvas = self.main_frame.canvas
+        for problem in session.mismatches(
+            self.file_path, tuple(canvas.GetClientSize())
+        ):
+            logger.warning("Replay: %s", problem)
+        self.main_frame.set_status(f"Replaying {len(session.events)} events")
+        report = Replayer(session, canvas, self.main_frame.key_down).run(
+            realtime,
+            # Lets CallAfter work such as measurement refreshes run
+            between=lambda: wx.SafeYield(None, True),
+        )
+        logger.info("Replay latencies\n%s", report.format_summary())
+        slowest = max(
+            (stats["p99"] for stats in report.summary().values()), default=0.0
+        )
+        self.main_frame.set_status(
+            f"Replay done, slowest p99 {slowest * 1000:.1f} ms, see the log"
+        )
+        if exit_when_done:
+            self.main_frame.Close()
+
     def increment_wp_render_index(self, name=None):
         execution_context.increment_wp_render_index(name)
         self.exec_and_display()
@@ -94,11 +356,360 @@ class CQViewerContext:
         self.exec_and_display()
 
     def exec_and_display(self, fit=False, reset_projection=False):
-        print("EXEC & DISPLAY")
+        if self.project:
+            self.exec_project(fit, reset_projection)
+            return
+
+        logger.info("Executing %s", self.file_path)
+        # Variants of a sweep are stale once the file is executed again
+        self.sweep = None
+        self.main_frame.update_sweep_table()
+        self.rss_before_reload = process_rss()
+        selection_refs = self.selection_refs()
+        execution_context.reset()
+        # Shapes of the previous execution are not measured again
+        mass_properties_cache.clear()
+        with tracer.span("exec"):
+            _locals = exec_file(self.file_path)
+        self.configure()
+        self.display(fit, reset_projection)
+        self.restore_selection(selection_refs)
+        self.rss_after_reload = process_rss()
+        logger.info(
+            "RSS before reload %s, after reload %s",
+            format_bytes(self.rss_before_reload),
+            format_bytes(self.rss_after_reload),
+        )
+        self.main_frame.update_memory_stats()
+        self.save_snapshot()
+        self.executions += 1
+
+    def exec_project(self, fit=False, reset_projection=False):
+        changed, self.changed_paths = self.changed_paths, set()
+        if changed:
+            file_paths = self.project.affected(changed)
+            # Imports may have been added or removed
+            self.project.update_import_graph()
+            self.watch_file()
+        else:
+            file_paths = self.project.file_paths
+        self.main_frame.set_status(f"Executing {len(file_paths)} files")
+        self.project.execute(
+            file_paths,
+            lambda result: wx.CallAfter(
+                self.show_project_result, result, fit, reset_projection
+            ),
+        )
+
+    def show_project_result(
+        self, result: FileResult, fit=False, reset_projection=False
+    ):
+        selection_refs = self.selection_refs()
+        self.project.apply_result(result)
         execution_context.reset()
-        _locals = exec_file(self.file_path)
+        for dp_obj in self.project.merged_display_objects():
+            execution_context.add_display_object(dp_obj)
+        execution_context.config = self.project.config
         self.configure()
         self.display(fit, reset_projection)
+        self.restore_selection(selection_refs)
+        if self.project.errors:
+            self.main_frame.set_status(
+                "Failed: " + ", ".join(path.name for path in self.project.errors)
+            )
+        else:
+            self.main_frame.set_status(f"Executed {result.file_path.name}")
+        self.main_frame.update_memory_stats()
+        self.executions += 1
+
+    def start_sweep(self):
+        parameters = execution_context.config.get("parameters")
+        if not self.file_path or not parameters:
+            self.main_frame.set_status("Declare parameters with setup() to sweep")
+            return
+
+        sweep = Sweep(
+            pathlib.Path(self.file_path),
+            parameters,
+            execution_context.config.get("sweep_measurements"),
+        )
+        self.sweep = sweep
+        self.main_frame.set_status(f"Sweeping {len(sweep.variants)} variants")
+        self.main_frame.update_sweep_table()
+        sweep.run(
+            lambda index, result: wx.CallAfter(
+                self.on_sweep_result, sweep, index, result
+            )
+        )
+
+    def on_sweep_result(self, sweep: Sweep, index: int, result: FileResult):
+        if sweep is not self.sweep:
+            return
+        sweep.apply_result(index, result)
+        if result.error:
+            logger.warning(
+                "Variant %s failed:\n%s",
+                variant_label(sweep.variants[index]),
+                result.error,
+            )
+        self.main_frame.set_status(f"Swept {sweep.done}/{len(sweep.variants)}")
+        self.main_frame.update_sweep_table()
+        if index == sweep.current:
+            self.show_variant(index)
+
+    def show_variant(self, index: int):
+        sweep = self.sweep
+        if sweep is None:
+            return
+        sweep.current = index
+        label = variant_label(sweep.variants[index])
+        display_objects = sweep.display_objects(index)
+        if display_objects is None:
+            state = "failed" if index in sweep.results else "not ready"
+            self.main_frame.set_status(f"{label} {state}")
+            return
+
+        execution_context.reset()
+        for dp_obj in display_objects:
+            execution_context.add_display_object(dp_obj)
+        self.display()
+        self.main_frame.set_status(f"{index + 1}/{len(sweep.variants)}: {label}")
+
+    def next_variant(self, step: int):
+        if self.sweep and self.sweep.variants:
+            self.show_variant((self.sweep.current + step) % len(self.sweep.variants))
+            self.main_frame.update_sweep_table()
+
+    def toggle_thickness(self):
+        ctx = self.main_frame.canvas.context
+        self.thickness_generation += 1
+        if self.thickness_presentations:
+            for ais_triangulation in self.thickness_presentations:
+                ctx.Remove(ais_triangulation, False)
+            self.thickness_presentations = []
+            self.main_frame.set_status("")
+            self.main_frame.canvas.viewer.Update()
+            return
+
+        solids = [
+            shape for shape in self.selected_shapes if shape.ShapeType() == TopAbs_SOLID
+        ]
+        if not solids:
+            self.main_frame.set_status(
+                "Select solids for wall thickness analysis (s selects solids)"
+            )
+            return
+
+        generation = self.thickness_generation
+        threshold = execution_context.config.get("min_wall_thickness")
+        self.main_frame.set_status("Analysing wall thickness...")
+        for solid in solids:
+            # Ends when the last rays are back, not when they are submitted
+            span = tracer.begin("thickness analysis")
+
+            def on_done(result: ThicknessResult, span=span):
+                span.end()
+                wx.CallAfter(self.show_thickness, result, generation)
+
+            analyze_thickness(solid, on_done, threshold)
+
+    def show_thickness(self, result: ThicknessResult, generation: int):
+        if generation != self.thickness_generation:
+            return
+        if result.minimum is None:
+            self.main_frame.set_status("No wall thickness found")
+            return
+        ctx = self.main_frame.canvas.context
+        ais_triangulation = thickness_presentation(result)
+        ctx.Display(ais_triangulation, False)
+        ctx.Deactivate(ais_triangulation)
+        self.thickness_presentations.append(ais_triangulation)
+        self.main_frame.set_status(
+            f"Thinnest wall {result.minimum}, "
+            f"{result.thin_count} nodes below {result.threshold:.4g}"
+        )
+        self.main_frame.canvas.viewer.Update()
+
+    def detect_clashes(self):
+        self.clash_generation += 1
+        if self.clash_presentations or self.clash_report:
+            self.clear_clashes()
+            self.main_frame.set_status("")
+            self.main_frame.info_panel.update_info()
+            self.main_frame.canvas.viewer.Update()
+            return
+
+        solids = collect_solids(execution_context.display_objects)
+        if len(solids) < 2:
+            self.main_frame.set_status("Clash detection needs at least two solids")
+            return
+        generation = self.clash_generation
+        try:
+            pairs = detect_clashes(
+                solids,
+                lambda clashes: wx.CallAfter(
+                    self.show_clashes, solids, clashes, generation
+                ),
+            )
+        except Exception as ex:
+            logger.warning("Clash detection failed: %s", ex)
+            self.main_frame.set_status(f"Clash detection failed: {ex}")
+            return
+        self.main_frame.set_status(
+            f"Checking {pairs} pairs of {len(solids)} solids for clashes..."
+        )
+
+    def show_clashes(
+        self, solids: list[ClashSolid], clashes: list[Clash], generation: int
+    ):
+        """Shown until clash detection is toggled off or the model is displayed"""
+        if generation != self.clash_generation:
+            return
+        ctx = self.main_frame.canvas.context
+        self.clear_clashes()
+        self.clash_report = clash_measurement(solids, clashes)
+        self.clash_presentations = self.clash_report.ais_shapes
+        for ais_shape in self.clash_presentations:
+            ctx.Display(ais_shape, False)
+            ctx.Deactivate(ais_shape)
+        self.main_frame.set_status(f"{len(clashes)} clashes")
+        self.main_frame.info_panel.update_info()
+        self.main_frame.canvas.viewer.Update()
+
+    def clear_clashes(self):
+        ctx = self.main_frame.canvas.context
+        for ais_shape in self.clash_presentations:
+            ctx.Remove(ais_shape, False)
+        self.clash_presentations = []
+        self.clash_report = None
+
+    @property
+    def panel_measurement(self) -> Measurement:
+        """What the info panel shows, the hovered measurement and clashes"""
+        if self.clash_report is None:
+            return self.measurement
+        return self.measurement + self.clash_report
+
+    def selection_refs(self) -> list[SubShapeRef]:
+        refs = []
+        for shape in self.selected_shapes:
+            if ref := locate(execution_context.display_objects, shape):
+                refs.append(ref)
+        return refs
+
+    def restore_selection(self, refs: list[SubShapeRef]):
+        """
+        Select the sub-shapes that correspond to the selection before
+        a reload. The context selection needs the owners that are created
+        on activation, the measurement can be updated right away.
+        """
+        resolved = [
+            result
+            for ref in refs
+            if (result := resolve(execution_context.display_objects, ref))
+        ]
+        self.select([sub_shape for _, sub_shape in resolved])
+        self.restored_selection = resolved
+        if len(resolved) != len(refs):
+            logger.info("Lost %d selected shapes on reload", len(refs) - len(resolved))
+        self.update_measurement()
+        if self.selection_ready:
+            self.select_restored_shapes()
+
+    def select_restored_shapes(self):
+        if not self.restored_selection:
+            return
+        ctx = self.main_frame.canvas.context
+        # Shapes that are still meshing are selected once they are activated
+        remaining = []
+        for ais_shape, sub_shape in self.restored_selection:
+            if owner := find_owner(ais_shape, sub_shape):
+                ctx.AddOrRemoveSelected(owner, False)
+            elif self.is_meshing(ais_shape):
+                remaining.append((ais_shape, sub_shape))
+        self.restored_selection = remaining
+        self.main_frame.canvas.viewer.Update()
+
+    def start_ipc_server(self):
+        self.ipc_server = ViewerServer(
+            on_object=lambda name, shape, options: wx.CallAfter(
+                self.show_remote_object, name, shape, options
+            ),
+            on_remove=lambda name: wx.CallAfter(self.remove_remote_object, name),
+            on_clear=lambda: wx.CallAfter(self.clear_remote_objects),
+        )
+        try:
+            self.ipc_server.start()
+        except OSError as ex:
+            logger.warning("Unable to listen for remote shapes: %s", ex)
+            self.ipc_server = None
+
+    def stop_ipc_server(self):
+        if self.ipc_server:
+            self.ipc_server.stop()
+            self.ipc_server = None
+
+    def show_remote_object(self, name: str, shape: TopoDS_Shape, options: dict):
+        execution_context.set_remote_object(
+            DisplayObject(execution_context, shape, name, **options)
+        )
+        self.display()
+        self.main_frame.set_status(f"Received {name}")
+
+    def remove_remote_object(self, name: str):
+        execution_context.remove_remote_object(name)
+        self.display()
+
+    def clear_remote_objects(self):
+        execution_context.clear_remote_objects()
+        self.display()
+
+    def save_snapshot(self):
+        """
+        Deferred until the worker meshes are attached so that the snapshot
+        holds them, and written from copies of the displayed shapes
+        """
+        if not self.file_path or not execution_context.display_objects:
+            return
+        if self.meshing_ais_shapes:
+            self.snapshot_pending = True
+            return
+        self.snapshot_pending = False
+
+        snapshot = Snapshot(self.snapshot_dir, str(self.file_path))
+        items = detached_items(collect_export_items(execution_context.display_objects))
+        camera = CameraState.from_camera(self.main_frame.canvas.view.Camera())
+
+        def done(future):
+            if exception := future.exception():
+                logger.warning("Failed to save snapshot: %s", exception)
+
+        background_executor().submit(snapshot.write, items, camera).add_done_callback(
+            done
+        )
+
+    def show_snapshot(self) -> bool:
+        """
+        Display the snapshot of the last session, if there is one.
+        It is replaced by the next exec_and_display.
+        """
+        snapshot = Snapshot(self.snapshot_dir, str(self.file_path))
+        result = snapshot.read()
+        if result is None:
+            return False
+
+        items, camera = result
+        execution_context.reset()
+        for item, shape in items:
+            execution_context.add_display_object(
+                DisplayObject(
+                    execution_context, shape, item.name, **snapshot_item_options(item)
+                )
+            )
+        self.display()
+        camera.apply(self.main_frame.canvas.view.Camera())
+        self.main_frame.canvas.view.Redraw()
+        return True
 
     def configure(self):
         canvas = self.main_frame.canvas
@@ -132,12 +743,60 @@ class CQViewerContext:
                 Quantity_Color(0.117, 0.078, 0.368, Quantity_TOC_RGB)
             )
 
+        self.render_quality = RenderQuality.from_config(
+            config.get("render_quality"), FULL_QUALITY
+        )
+        self.interaction_quality = RenderQuality.from_config(
+            config.get("interaction_quality"), INTERACTION_QUALITY
+        )
+        self.apply_render_quality(
+            self.interaction_quality if self.interacting else self.render_quality
+        )
+
+    def set_interacting(self, interacting: bool):
+        if interacting == self.interacting:
+            return
+        self.interacting = interacting
+        self.apply_render_quality(
+            self.interaction_quality if interacting else self.render_quality
+        )
+
+    def apply_render_quality(self, quality: RenderQuality):
+        """
+        Only touches existing aspects and synchronizes them,
+        presentations are not recomputed
+        """
+        params = self.main_frame.canvas.view.ChangeRenderingParams()
+        params.NbMsaaSamples = quality.msaa_samples
+        params.IsAntialiasingEnabled = quality.msaa_samples > 0
+
+        self.style_palette.apply_quality(quality)
+        for ais_shape in self.displayed_ais_shapes:
+            ais_shape.SynchronizeAspects()
+
     def display(self, fit=False, reset_projection=False):
-        print("Display..")
+        with timings.measure("display"):
+            self._display(fit, reset_projection)
+
+    def _display(self, fit=False, reset_projection=False):
+        logger.debug("Display")
         ctx = self.main_frame.canvas.context
         view = self.main_frame.canvas.view
         previous_immediate_update = view.SetImmediateUpdate(False)
         ctx.RemoveAll(False)
+        # Styles of shapes that are gone would pile up over reloads
+        self.style_palette.clear()
+        self.selectable_ais_shapes = []
+        self.pending_selection_activation = deque()
+        self.displayed_ais_shapes = []
+        self.meshing_ais_shapes = []
+        self.snapshot_pending = False
+        self.display_generation += 1
+        self.thickness_presentations = []
+        self.thickness_generation += 1
+        self.clash_presentations = []
+        self.clash_report = None
+        self.clash_generation += 1
 
         all_sketches = [dp_obj.sketch for dp_obj in execution_context.display_objects]
         active_sketches = [
@@ -153,7 +812,7 @@ class CQViewerContext:
             if not execution_context.bp_sketching:
                 planes = active_sketches[-1][2]
                 if execution_context.bp_autosketch and len(planes) == 1:
-                    print("Started sketching")
+                    logger.debug("Started sketching")
                     execution_context.bp_sketching = True
                     plane = planes[0]
                     execution_context.camera_scale = view.Camera().Scale()
@@ -180,20 +839,34 @@ class CQViewerContext:
                 else {}
             )
             for faces, edges, _ in active_sketches:
-                for face in faces:
-                    self.display_ais_shape(AIS_Shape(face), **face_display_kwargs)
-                for edge in edges:
-                    self.display_ais_shape(AIS_Shape(edge))
+                self.display_sketch_overlay(faces, face_display_kwargs)
+                self.display_sketch_overlay(edges, {})
         else:
             sketching = False
 
         if not sketching and execution_context.bp_sketching:
-            print("Stopped sketching")
+            logger.debug("Stopped sketching")
             execution_context.bp_sketching = False
             self.hide_grid()
             view.Reset(False)
             view.Camera().SetScale(execution_context.camera_scale)
 
+        if execution_context.config.get("process_tessellation"):
+            generation = self.display_generation
+            self.meshing_ais_shapes = tessellate_ais_shapes(
+                [
+                    ais_object
+                    for dp_obj in execution_context.display_objects
+                    for ais_object in dp_obj.ais_objects
+                    if isinstance(ais_object, AIS_Shape)
+                ],
+                lambda ais_shape, meshed: wx.CallAfter(
+                    self.show_meshed, ais_shape, meshed, generation
+                ),
+            )
+            for ais_shape in self.meshing_ais_shapes:
+                ais_shape.SetDisplayMode(AIS_WireFrame)
+
         # Default behaviour
         for dp_obj in execution_context.display_objects:
             ais_objects = dp_obj.ais_objects
@@ -219,6 +892,7 @@ class CQViewerContext:
         if fit:
             self.fit()
         self.main_frame.canvas.viewer.Update()
+        self.activate_pending_selection()
 
     def display_ais_shape(
         self, ais_shape: AIS_Shape, selectable=True, color=None, transparency=None
@@ -242,31 +916,55 @@ class CQViewerContext:
                 transparency = ais_transparency
         if transparency and (transparency < 0 or transparency > 1):
             raise ValueError("Transparency must be between 0 and 1")
-        hilight_color = highlight_color(color, 0.05)
-        select_color = highlight_color(color, 0.1)
+        with tracer.span("styling", Level.DEBUG):
+            self.style_palette.apply(
+                ctx, ais_shape, color, transparency or None, selectable
+            )
 
-        ais.set_color(
-            ais_shape,
-            color,
-            transparency,
-        )
-        selection_style: Prs3d_Drawer = ais_shape.HilightAttributes()
-        selection_style.SetColor(select_color)
-        ais_shape.Attributes().SetupOwnFaceBoundaryAspect()
-        ais_shape.Attributes().FaceBoundaryAspect().SetColor(
-            Quantity_Color(*anti_color(color), Quantity_TOC_RGB)
-        )
+        # Computing the presentation is where the shape gets meshed
+        with tracer.span("tessellation", Level.DEBUG):
+            ctx.Display(ais_shape, False)
+        self.displayed_ais_shapes.append(ais_shape)
+        if selectable:
+            self.selectable_ais_shapes.append(ais_shape)
+            # Activating selection would mesh the faces on this thread
+            if not self.is_meshing(ais_shape):
+                self.pending_selection_activation.append(ais_shape)
 
-        highlight_style = ais_shape.DynamicHilightAttributes()
-        highlight_style.SetColor(hilight_color)
-        highlight_style.SetupOwnFaceBoundaryAspect()
-        # highlight_style.FaceBoundaryAspect().SetColor does not work :-(
-        # Make it at least a bit thicker..
-        highlight_style.FaceBoundaryAspect().SetWidth(4)
+    def is_meshing(self, ais_shape: AIS_Shape) -> bool:
+        return any(ais_shape is meshing for meshing in self.meshing_ais_shapes)
 
-        ctx.Display(ais_shape, False)
-        if selectable:
-            self.activate_selection(ais_shape)
+    def show_meshed(
+        self, ais_shape: AIS_Shape, meshed: Optional[TopoDS_Shape], generation: int
+    ):
+        """Without a mesh AIS meshes the shape when it is shown shaded"""
+        if generation != self.display_generation:
+            return
+        self.meshing_ais_shapes = [
+            s for s in self.meshing_ais_shapes if s is not ais_shape
+        ]
+        if meshed is not None:
+            with tracer.span("attach triangulations", Level.DEBUG):
+                attach_triangulations(ais_shape.Shape(), meshed)
+        self.main_frame.canvas.context.SetDisplayMode(ais_shape, AIS_Shaded, False)
+        if any(ais_shape is s for s in self.selectable_ais_shapes):
+            self.pending_selection_activation.append(ais_shape)
+            self.activate_pending_selection()
+        self.main_frame.canvas.viewer.Update()
+        if self.snapshot_pending and not self.meshing_ais_shapes:
+            self.save_snapshot()
+
+    def display_sketch_overlay(self, shapes: list[TopoDS_Shape], display_kwargs: dict):
+        """
+        Pending sketch geometry as a single non-selectable presentation in
+        the top layer, a sketch with text easily has thousands of shapes
+        """
+        if not shapes:
+            return
+        ais_shape = AIS_Shape(make_compound(shapes))
+        with tracer.span("sketch overlay", Level.DEBUG, shapes=len(shapes)):
+            self.display_ais_shape(ais_shape, selectable=False, **display_kwargs)
+        self.main_frame.canvas.context.SetZLayer(ais_shape, SKETCH_OVERLAY_LAYER)
 
     def show_grid(self, plane: gp_Pln):
         viewer = self.main_frame.canvas.viewer
@@ -298,6 +996,33 @@ class CQViewerContext:
         if fit:
             self.fit()
 
+    @property
+    def selection_ready(self) -> bool:
+        return not self.pending_selection_activation
+
+    def activate_pending_selection(self):
+        """
+        Activate selection of displayed shapes a slice at a time so that the
+        first frame is not held back. Each Activate queues the BVH build of
+        its sensitive entities to the selector's builder threads, hovering
+        is skipped until everything is activated.
+        """
+        if not self.pending_selection_activation:
+            return
+
+        self.main_frame.set_status(
+            f"Preparing selection, {len(self.pending_selection_activation)} left"
+        )
+        deadline = time.perf_counter() + SELECTION_ACTIVATION_SLICE
+        while self.pending_selection_activation and time.perf_counter() < deadline:
+            self.activate_selection(self.pending_selection_activation.popleft())
+
+        if self.pending_selection_activation:
+            wx.CallAfter(self.activate_pending_selection)
+        else:
+            self.main_frame.set_status("")
+            self.select_restored_shapes()
+
     def deactivate_selection(self, ais_shape: AIS_Shape):
         ctx = self.main_frame.canvas.context
         ctx.Deactivate(ais_shape)
@@ -311,20 +1036,36 @@ class CQViewerContext:
         # ctx.SetSelectionModeActive(ais_shape, ais_shape.SelectionMode_s(TopAbs_EDGE), True, AIS_SelectionModesConcurrency_Multiple)
         # ctx.SetSelectionModeActive(ais_shape, ais_shape.SelectionMode_s(TopAbs_FACE), True, AIS_SelectionModesConcurrency_Multiple)
 
+        if self.solid_selection:
+            ctx.Activate(ais_shape, ais_shape.SelectionMode_s(TopAbs_SOLID), True)
+            return
+
         ctx.Activate(ais_shape, ais_shape.SelectionMode_s(TopAbs_VERTEX), True)
         ctx.Activate(ais_shape, ais_shape.SelectionMode_s(TopAbs_EDGE), True)
         ctx.Activate(ais_shape, ais_shape.SelectionMode_s(TopAbs_FACE), True)
 
+    def toggle_solid_selection(self):
+        self.solid_selection = not self.solid_selection
+        self.select([])
+        self.main_frame.canvas.context.ClearSelected(False)
+        for ais_shape in self.selectable_ais_shapes:
+            self.activate_selection(ais_shape)
+        self.update_measurement()
+        self.main_frame.set_status(
+            "Selecting solids" if self.solid_selection else "Selecting sub-shapes"
+        )
+        self.main_frame.canvas.viewer.Update()
+
+    def refresh_measurement(self):
+        self.update_measurement([self.detected_shape] if self.detected_shape else None)
+
     def update_measurement(self, detected_shapes: Optional[list[TopoDS_Shape]] = None):
         if self.selected_shapes:
-            measurement_shapes = self.selected_shapes[:]
+            measurement_shapes = list(self.selected_shapes)
             if detected_shapes:
                 # We use only the first hit for measurements!
                 detected_shape = detected_shapes[0]
-                if not any(
-                    detected_shape.IsSame(measurement_shape)
-                    for measurement_shape in measurement_shapes
-                ):
+                if not self.selected_map.Contains(detected_shape):
                     measurement_shapes.append(detected_shape)
             blank_measurement = Measurement(set())
             if blank_measurement != self.measurement:
@@ -334,16 +1075,20 @@ class CQViewerContext:
                     for ais_shape in self.measurement.ais_shapes:
                         ctx.Remove(ais_shape, False)
 
-                self.measurement = create_measurement(*measurement_shapes)
+                with timings.measure("measure"):
+                    self.measurement = create_measurement(
+                        *measurement_shapes,
+                        on_update=lambda: wx.CallAfter(self.refresh_measurement),
+                    )
                 if self.measurement:
-                    print("Measurements", self.measurement.measurements)
+                    logger.debug("Measurements %s", self.measurement.measurements)
                     for ais_shape in self.measurement.ais_shapes:
                         ctx.Display(ais_shape, False)
                         # AddZLayer?
                     self.main_frame.canvas.viewer.Update()
 
                 else:
-                    print("No measurement")
+                    logger.debug("No measurement")
                 self.detected_shape = detected_shapes[0] if detected_shapes else None
 
         elif self.measurement:
@@ -363,7 +1108,7 @@ class CQViewerContext:
                 for selected_vx in self.selected_vx
             ):
                 self.selected_midpoints.remove(selected_midpoint)
-                print("MP: Removing selected midpoint")
+                logger.debug("MP: Removing selected midpoint")
                 ctx.Remove(selected_midpoint, False)
                 needs_update = True
         return needs_update
@@ -390,7 +1135,7 @@ class CQViewerContext:
                     for selected_vx in self.selected_vx
                 ):
                     # Don't need to show if it is already selected
-                    print("MP: Already selected - NOP")
+                    logger.debug("MP: Already selected - NOP")
                     new_midpoint = None
 
             elif shape_type == TopAbs_VERTEX:
@@ -403,29 +1148,29 @@ class CQViewerContext:
                 if selected_vx.ShapeType() == TopAbs_VERTEX
             ):
                 self.selected_midpoints.append(self.midpoint)
-                print("MP: Moving current midpoint to selected_midpoints")
+                logger.debug("MP: Moving current midpoint to selected_midpoints")
                 self.midpoint = None
 
             elif new_midpoint and same_topods_vertex(
                 self.midpoint.Shape(), new_midpoint.Shape()
             ):
                 # NOP - already showing the correct things
-                print("MP: Already visible - NOP")
+                logger.debug("MP: Already visible - NOP")
                 new_midpoint = None
             elif highlighted_vertex and same_topods_vertex(
                 self.midpoint.Shape(), highlighted_vertex
             ):
                 # NOP - already showing the correct things
-                print("MP: Already highlighted - NOP")
+                logger.debug("MP: Already highlighted - NOP")
                 new_midpoint = None
             else:
-                print("MP: Removing unneeded midpoint")
+                logger.debug("MP: Removing unneeded midpoint")
                 ctx.Remove(self.midpoint, False)
                 self.midpoint = None
                 needs_update = True
 
         if new_midpoint and self.midpoint is None:
-            print("MP: Showing new midpoint")
+            logger.debug("MP: Showing new midpoint")
             self.midpoint = new_midpoint
             ctx.Display(self.midpoint, False)
             needs_update = True
@@ -434,13 +1179,47 @@ class CQViewerContext:
             self.main_frame.canvas.viewer.Update()
 
 
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="cq-viewer")
+    parser.add_argument(
+        "--record", metavar="SESSION", help="record the interaction to a file"
+    )
+    parser.add_argument(
+        "--replay", metavar="SESSION", help="replay a recorded interaction"
+    )
+    parser.add_argument(
+        "--realtime",
+        action="store_true",
+        help="replay with the recorded timing instead of as fast as possible",
+    )
+    parser.add_argument(
+        "--exit", action="store_true", help="exit when the replay is done"
+    )
+    return parser.parse_args(argv)
+
+
 def run():
+    args = parse_args()
     app = wx.App(False)
     cq_viewer_ctx = CQViewerContext()
+    session = None
+    if args.replay:
+        session = Session.read(args.replay)
+        if session.model:
+            cq_viewer_ctx.file_path = session.model
+            cq_viewer_ctx.project = None
+    if args.record:
+        cq_viewer_ctx.recorder = SessionRecorder(args.record)
     frame = MainFrame(cq_viewer_ctx=cq_viewer_ctx)
     knife_cq(frame)
     knife_b123d(frame)
+    cq_viewer_ctx.start_ipc_server()
+    if session:
+        wx.CallAfter(cq_viewer_ctx.start_replay, session, args.realtime, args.exit)
     app.MainLoop()
+    cq_viewer_ctx.stop_ipc_server()
+    if cq_viewer_ctx.recorder:
+        cq_viewer_ctx.recorder.close()
 
 
 if __name__ == "__main__":
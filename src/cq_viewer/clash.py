@@ -0,0 +1,217 @@
+"""
+Interference and contact detection between displayed solids
+
+Broad phase: sweep and prune over bounding boxes sorted along X, only
+pairs whose boxes overlap are kept. Narrow phase: the common volume of
+each remaining pair in the process pool, falling back to the minimum
+distance to tell touching solids from separate ones. Every solid goes to
+the workers once through shared memory, each worker reads it once.
+"""
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from OCP.AIS import AIS_Shape
+from OCP.BRepAlgoAPI import BRepAlgoAPI_Common
+from OCP.BRepBuilderAPI import BRepBuilderAPI_MakeVertex
+from OCP.BRepGProp import BRepGProp
+from OCP.GProp import GProp_GProps
+from OCP.Quantity import Quantity_Color, Quantity_TOC_RGB
+from OCP.TopAbs import TopAbs_SOLID
+from OCP.TopExp import TopExp_Explorer
+from OCP.TopoDS import TopoDS_Shape
+
+from cq_viewer.ipc import bytes_to_shape, shape_to_bytes
+from cq_viewer.measurement import Measurement
+from cq_viewer.pairwise import bounding_box, min_distance
+from cq_viewer.shared_brep import SharedBRep, cached_shape, release, share_shape
+from cq_viewer.tracing import tracer
+from cq_viewer.workers import process_executor
+
+logger = logging.getLogger(__name__)
+
+CONTACT_TOLERANCE = 1e-4
+# Common volumes below this are numerical noise of touching faces
+VOLUME_EPSILON = 1e-9
+
+INTERFERENCE_COLOR = Quantity_Color(1.0, 0.0, 0.0, Quantity_TOC_RGB)
+CONTACT_COLOR = Quantity_Color(1.0, 0.6, 0.0, Quantity_TOC_RGB)
+
+
+@dataclass
+class ClashSolid:
+    name: str
+    shape: TopoDS_Shape
+
+
+@dataclass
+class Clash:
+    solid1: ClashSolid
+    solid2: ClashSolid
+    volume: float
+    # Common volume for interferences, a vertex at the contact otherwise
+    shape: TopoDS_Shape
+
+    @property
+    def interference(self) -> bool:
+        return self.volume > VOLUME_EPSILON
+
+
+def collect_solids(display_objects) -> list[ClashSolid]:
+    solids = []
+    for dp_obj in display_objects:
+        shapes = [
+            ais_object.Shape()
+            for ais_object in dp_obj.ais_objects
+            if isinstance(ais_object, AIS_Shape)
+        ]
+        count = 0
+        for shape in shapes:
+            explorer = TopExp_Explorer(shape, TopAbs_SOLID)
+            while explorer.More():
+                count += 1
+                solids.append(ClashSolid(f"{dp_obj.name}#{count}", explorer.Current()))
+                explorer.Next()
+    return solids
+
+
+def broad_phase(
+    solids: list[ClashSolid], tolerance: float = CONTACT_TOLERANCE
+) -> list[tuple[int, int]]:
+    boxes = []
+    for solid in solids:
+        box = bounding_box(solid.shape)
+        box.Enlarge(tolerance)
+        boxes.append(box)
+
+    order = sorted(range(len(solids)), key=lambda i: boxes[i].Get()[0])
+    pairs = []
+    active: list[int] = []
+    for i in order:
+        x_min = boxes[i].Get()[0]
+        # Boxes that end before this one starts can not overlap anything later
+        active = [j for j in active if boxes[j].Get()[3] >= x_min]
+        pairs.extend(
+            (min(i, j), max(i, j)) for j in active if not boxes[i].IsOut(boxes[j])
+        )
+        active.append(i)
+    return sorted(pairs)
+
+
+def contact(
+    shape1: TopoDS_Shape, shape2: TopoDS_Shape, tolerance: float
+) -> Optional[tuple[float, TopoDS_Shape]]:
+    common = BRepAlgoAPI_Common(shape1, shape2)
+    if common.IsDone():
+        props = GProp_GProps()
+        BRepGProp.VolumeProperties_s(common.Shape(), props)
+        if props.Mass() > VOLUME_EPSILON:
+            return props.Mass(), common.Shape()
+    else:
+        logger.warning("Common failed, falling back to the distance")
+
+    if (result := min_distance(shape1, shape2)) and result[2] <= tolerance:
+        return 0.0, BRepBuilderAPI_MakeVertex(result[0]).Vertex()
+    return None
+
+
+def narrow_phase(
+    solid1: ClashSolid, solid2: ClashSolid, tolerance: float = CONTACT_TOLERANCE
+) -> Optional[Clash]:
+    if result := contact(solid1.shape, solid2.shape, tolerance):
+        return Clash(solid1, solid2, *result)
+    return None
+
+
+def shared_narrow_phase(
+    shared1: SharedBRep, shared2: SharedBRep, tolerance: float
+) -> Optional[tuple[float, bytes]]:
+    """Runs in a worker process"""
+    if result := contact(cached_shape(shared1), cached_shape(shared2), tolerance):
+        volume, shape = result
+        return volume, shape_to_bytes(shape)
+    return None
+
+
+def detect_clashes(
+    solids: list[ClashSolid],
+    on_done: Callable[[list[Clash]], None],
+    tolerance: float = CONTACT_TOLERANCE,
+) -> int:
+    """
+    Runs the broad phase on the calling thread and submits the narrow
+    phase of the remaining pairs, returns their number. on_done is called
+    from a pool thread with the clashes in pair order once all pairs are
+    done. Pairs that failed are logged and left out.
+    """
+    with tracer.span("clash broad phase", solids=len(solids)):
+        pairs = broad_phase(solids, tolerance)
+    logger.debug("Clash broad phase kept %d of %d solids", len(pairs), len(solids))
+    if not pairs:
+        on_done([])
+        return 0
+
+    span = tracer.begin("clash narrow phase", pairs=len(pairs))
+    shared = {i: share_shape(solids[i].shape) for pair in pairs for i in pair}
+    results: list[Optional[Clash]] = [None] * len(pairs)
+    lock = threading.Lock()
+    remaining = len(pairs)
+
+    def finish():
+        for block in shared.values():
+            release(block)
+        span.end()
+        on_done([clash for clash in results if clash is not None])
+
+    def done(future, index: int):
+        nonlocal remaining
+        solid1, solid2 = (solids[i] for i in pairs[index])
+        try:
+            if result := future.result():
+                volume, data = result
+                results[index] = Clash(solid1, solid2, volume, bytes_to_shape(data))
+        except Exception as ex:
+            logger.warning(
+                "Clash of %s and %s failed: %s", solid1.name, solid2.name, ex
+            )
+        with lock:
+            remaining -= 1
+            last = remaining == 0
+        if last:
+            finish()
+
+    for index, (i, j) in enumerate(pairs):
+        future = process_executor().submit(
+            shared_narrow_phase, shared[i], shared[j], tolerance
+        )
+        future.add_done_callback(lambda future, index=index: done(future, index))
+    return len(pairs)
+
+
+def clash_measurement(solids: list[ClashSolid], clashes: list[Clash]) -> Measurement:
+    ais_shapes = []
+    for clash in clashes:
+        ais_shape = AIS_Shape(clash.shape)
+        ais_shape.SetColor(INTERFERENCE_COLOR if clash.interference else CONTACT_COLOR)
+        ais_shapes.append(ais_shape)
+
+    table = [["solid", "solid", "volume"]] + [
+        [
+            clash.solid1.name,
+            clash.solid2.name,
+            f"{clash.volume:.4g}" if clash.interference else "contact",
+        ]
+        for clash in clashes
+    ]
+    interferences = sum(1 for clash in clashes if clash.interference)
+    return Measurement(
+        {solid.shape for solid in solids},
+        {
+            "solids": len(solids),
+            "interferences": interferences,
+            "contacts": len(clashes) - interferences,
+        },
+        ais_shapes,
+        table if clashes else None,
+    )
@@ -0,0 +1,261 @@
+"""
+Export of the displayed objects
+
+Mesh formats (STL, glTF) reuse the triangulation that was already
+computed for the viewer. Shapes with faces that lack one are meshed as
+copies, the displayed shapes must not change under the viewer.
+"""
+import dataclasses
+import logging
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Optional
+
+from OCP.AIS import AIS_Shape
+from OCP.BRep import BRep_Tool
+from OCP.BRepBuilderAPI import BRepBuilderAPI_Copy
+from OCP.BRepMesh import BRepMesh_IncrementalMesh
+from OCP.BRepTools import BRepTools
+from OCP.Message import Message_ProgressRange
+from OCP.IFSelect import IFSelect_RetDone
+from OCP.Quantity import Quantity_Color, Quantity_ColorRGBA, Quantity_TOC_RGB
+from OCP.RWGltf import RWGltf_CafWriter
+from OCP.RWMesh import RWMesh_CoordinateSystem_Zup
+from OCP.STEPCAFControl import STEPCAFControl_Writer
+from OCP.STEPControl import STEPControl_AsIs
+from OCP.StlAPI import StlAPI_Writer
+from OCP.TCollection import TCollection_AsciiString, TCollection_ExtendedString
+from OCP.TColStd import TColStd_IndexedDataMapOfStringString
+from OCP.TDataStd import TDataStd_Name
+from OCP.TDocStd import TDocStd_Document
+from OCP.TopAbs import TopAbs_FACE
+from OCP.TopExp import TopExp_Explorer
+from OCP.TopLoc import TopLoc_Location
+from OCP.TopoDS import TopoDS, TopoDS_Face, TopoDS_Shape
+from OCP.XCAFDoc import XCAFDoc_ColorSurf, XCAFDoc_DocumentTool
+
+from cq_viewer.interface import make_compound
+from cq_viewer.str_enum import StrEnum
+
+if TYPE_CHECKING:
+    from cq_viewer.interface import DisplayObject
+
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[float, str], None]
+
+# Only used for faces that the viewer never meshed
+FALLBACK_LINEAR_DEFLECTION = 0.1
+FALLBACK_ANGULAR_DEFLECTION = 0.5
+
+
+class ExportFormat(StrEnum):
+    STEP = "step"
+    BREP = "brep"
+    STL = "stl"
+    GLTF = "gltf"
+    GLB = "glb"
+
+    @classmethod
+    def from_path(cls, file_path: str) -> "ExportFormat":
+        extension = os.path.splitext(file_path)[1].lower().lstrip(".")
+        if extension == "stp":
+            extension = "step"
+        try:
+            return cls(extension)
+        except ValueError:
+            raise ValueError(f"Unknown export format: {extension}")
+
+    @property
+    def is_mesh(self) -> bool:
+        return self in (ExportFormat.STL, ExportFormat.GLTF, ExportFormat.GLB)
+
+
+EXPORT_WILDCARD = "|".join(
+    [
+        "STEP files (*.step)|*.step;*.stp",
+        "BREP files (*.brep)|*.brep",
+        "STL files (*.stl)|*.stl",
+        "glTF files (*.gltf)|*.gltf",
+        "Binary glTF files (*.glb)|*.glb",
+    ]
+)
+
+
+@dataclass
+class ExportItem:
+    name: str
+    shape: TopoDS_Shape
+    color: Optional[Quantity_Color]
+    transparency: Optional[float]
+
+
+def to_quantity_color(color) -> Optional[Quantity_Color]:
+    if color is None or isinstance(color, Quantity_Color):
+        return color
+    return Quantity_Color(*color, Quantity_TOC_RGB)
+
+
+def collect_export_items(display_objects: list["DisplayObject"]) -> list[ExportItem]:
+    """
+    Must be called on the UI thread, the export itself can run elsewhere.
+    """
+    items = []
+    for dp_obj in display_objects:
+        ais_shapes = [
+            ais_object
+            for ais_object in dp_obj.ais_objects
+            if isinstance(ais_object, AIS_Shape)
+        ]
+        for i, ais_shape in enumerate(ais_shapes):
+            color = to_quantity_color(dp_obj.options.get("color"))
+            if color is None and ais_shape.HasColor():
+                color = Quantity_Color()
+                ais_shape.Color(color)
+            transparency = dp_obj.options.get("transparency")
+            if transparency is None and ais_shape.Transparency() != 0:
+                transparency = ais_shape.Transparency()
+            name = dp_obj.name if len(ais_shapes) == 1 else f"{dp_obj.name}-{i}"
+            items.append(ExportItem(name, ais_shape.Shape(), color, transparency))
+    return items
+
+
+def detached_items(items: list[ExportItem]) -> list[ExportItem]:
+    """
+    Items with copies of the shapes and their triangulations, to be
+    written on a pool thread while the UI thread attaches worker meshes
+    to the displayed shapes. Geometry is shared, nothing modifies it.
+    """
+    return [
+        dataclasses.replace(
+            item, shape=BRepBuilderAPI_Copy(item.shape, False, True).Shape()
+        )
+        for item in items
+    ]
+
+
+def unmeshed_faces(shape: TopoDS_Shape) -> list[TopoDS_Face]:
+    faces = []
+    explorer = TopExp_Explorer(shape, TopAbs_FACE)
+    while explorer.More():
+        face = TopoDS.Face_s(explorer.Current())
+        if BRep_Tool.Triangulation_s(face, TopLoc_Location()) is None:
+            faces.append(face)
+        explorer.Next()
+    return faces
+
+
+def ensure_triangulation(shape: TopoDS_Shape) -> int:
+    """
+    Mesh only the faces that have no triangulation, return their count.
+    Changes the shape, only for shapes that are not displayed.
+    """
+    faces = unmeshed_faces(shape)
+    if faces:
+        BRepMesh_IncrementalMesh(
+            make_compound(faces),
+            FALLBACK_LINEAR_DEFLECTION,
+            False,
+            FALLBACK_ANGULAR_DEFLECTION,
+            True,
+        )
+    return len(faces)
+
+
+def triangulated(shape: TopoDS_Shape) -> tuple[TopoDS_Shape, int]:
+    """
+    The shape itself if all its faces are meshed, otherwise a copy with
+    the existing triangulations and the missing ones. Also returns the
+    number of faces that were meshed.
+    """
+    if not unmeshed_faces(shape):
+        return shape, 0
+    copy = BRepBuilderAPI_Copy(shape, True, True).Shape()
+    return copy, ensure_triangulation(copy)
+
+
+def create_xcaf_document(items: list[ExportItem]) -> TDocStd_Document:
+    doc = TDocStd_Document(TCollection_ExtendedString("XmlOcaf"))
+    shape_tool = XCAFDoc_DocumentTool.ShapeTool_s(doc.Main())
+    color_tool = XCAFDoc_DocumentTool.ColorTool_s(doc.Main())
+    for item in items:
+        label = shape_tool.AddShape(item.shape, False)
+        TDataStd_Name.Set_s(label, TCollection_ExtendedString(item.name))
+        if item.color is not None:
+            alpha = 1 - (item.transparency or 0)
+            color_tool.SetColor(
+                label, Quantity_ColorRGBA(item.color, alpha), XCAFDoc_ColorSurf
+            )
+    shape_tool.UpdateAssemblies()
+    return doc
+
+
+def write_brep(items: list[ExportItem], file_path: str):
+    BRepTools.Write_s(make_compound([item.shape for item in items]), file_path)
+
+
+def write_stl(items: list[ExportItem], file_path: str):
+    writer = StlAPI_Writer()
+    writer.ASCIIMode = False
+    if not writer.Write(make_compound([item.shape for item in items]), file_path):
+        raise RuntimeError(f"Failed to write {file_path}")
+
+
+def write_step(items: list[ExportItem], file_path: str):
+    writer = STEPCAFControl_Writer()
+    writer.SetColorMode(True)
+    writer.SetNameMode(True)
+    if not writer.Transfer(create_xcaf_document(items), STEPControl_AsIs):
+        raise RuntimeError("Failed to transfer the shapes to STEP")
+    status = writer.Write(file_path)
+    if status != IFSelect_RetDone:
+        raise RuntimeError(f"Failed to write {file_path}: {status}")
+
+
+def write_gltf(items: list[ExportItem], file_path: str, binary: bool):
+    writer = RWGltf_CafWriter(TCollection_AsciiString(file_path), binary)
+    converter = writer.ChangeCoordinateSystemConverter()
+    converter.SetInputLengthUnit(1e-3)
+    converter.SetInputCoordinateSystem(RWMesh_CoordinateSystem_Zup)
+    if not writer.Perform(
+        create_xcaf_document(items),
+        TColStd_IndexedDataMapOfStringString(),
+        Message_ProgressRange(),
+    ):
+        raise RuntimeError(f"Failed to write {file_path}")
+
+
+def export_items(
+    items: list[ExportItem],
+    file_path: str,
+    progress: Optional[ProgressCallback] = None,
+):
+    """
+    Write the items to file_path, the format is chosen by the extension.
+    Safe to run on a worker thread.
+    """
+    export_format = ExportFormat.from_path(file_path)
+    progress = progress or (lambda fraction, message: None)
+
+    if export_format.is_mesh:
+        remeshed = 0
+        meshed_items = []
+        for i, item in enumerate(items):
+            progress(i / (len(items) + 1), f"Checking mesh of {item.name}")
+            shape, count = triangulated(item.shape)
+            meshed_items.append(dataclasses.replace(item, shape=shape))
+            remeshed += count
+        items = meshed_items
+        if remeshed:
+            logger.info("Export meshed %d faces without triangulation", remeshed)
+
+    progress(len(items) / (len(items) + 1), f"Writing {file_path}")
+    if export_format == ExportFormat.BREP:
+        write_brep(items, file_path)
+    elif export_format == ExportFormat.STL:
+        write_stl(items, file_path)
+    elif export_format == ExportFormat.STEP:
+        write_step(items, file_path)
+    else:
+        write_gltf(items, file_path, export_format == ExportFormat.GLB)
+    progress(1.0, f"Exported {file_path}")
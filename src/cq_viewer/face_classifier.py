@@ -0,0 +1,71 @@
+"""
+Point-in-face classification in UV space
+
+BRepClass_FaceClassifier projects a 3D point and rebuilds its
+classification data on every call. IntTools_FClass2d prepares the
+trimming loops of a face once and then classifies UV points directly,
+so one is built per face and cached.
+"""
+import sys
+import threading
+from collections import OrderedDict
+from typing import Iterable
+
+from OCP.BRepTools import BRepTools
+from OCP.gp import gp_Pnt2d
+from OCP.IntTools import IntTools_FClass2d
+from OCP.TopAbs import TopAbs_IN, TopAbs_ON, TopAbs_State
+from OCP.TopoDS import TopoDS_Face
+
+CLASSIFIER_TOLERANCE = 1e-7
+CACHE_SIZE = 256
+
+
+class UVFaceClassifier:
+    def __init__(self, face: TopoDS_Face, tolerance: float = CLASSIFIER_TOLERANCE):
+        self.face = face
+        BRepTools.UpdateFaceUVPoints_s(face)
+        self.u_min, self.u_max, self.v_min, self.v_max = BRepTools.UVBounds_s(face)
+        self._classifier = IntTools_FClass2d(face, tolerance)
+
+    def state(self, u: float, v: float) -> TopAbs_State:
+        return self._classifier.Perform(gp_Pnt2d(u, v))
+
+    def contains(self, u: float, v: float) -> bool:
+        return self.state(u, v) in (TopAbs_IN, TopAbs_ON)
+
+    def contains_normalized(self, u: float, v: float) -> bool:
+        """u and v scaled to [0, 1] over the UV bounds of the face"""
+        return self.contains(
+            self.u_min + (self.u_max - self.u_min) * u,
+            self.v_min + (self.v_max - self.v_min) * v,
+        )
+
+    def states(self, uv: Iterable[tuple[float, float]]) -> list[TopAbs_State]:
+        perform = self._classifier.Perform
+        return [perform(gp_Pnt2d(u, v)) for u, v in uv]
+
+    def contains_many(self, uv: Iterable[tuple[float, float]]) -> list[bool]:
+        return [state in (TopAbs_IN, TopAbs_ON) for state in self.states(uv)]
+
+
+_lock = threading.Lock()
+# HashCode -> [classifier], IsEqual resolves collisions
+_cache: OrderedDict[int, list[UVFaceClassifier]] = OrderedDict()
+
+
+def face_classifier(face: TopoDS_Face) -> UVFaceClassifier:
+    key = face.HashCode(sys.maxsize)
+    with _lock:
+        for classifier in _cache.get(key, []):
+            if classifier.face.IsEqual(face):
+                _cache.move_to_end(key)
+                return classifier
+
+    classifier = UVFaceClassifier(face)
+    with _lock:
+        _cache.setdefault(key, []).append(classifier)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return classifier
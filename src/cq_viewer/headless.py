@@ -0,0 +1,165 @@
+"""
+Headless viewer for tests and benchmarks
+
+Drives the same CQViewerContext as the application against an offscreen
+view and a stub frame, so display, selection activation, hovering and
+selecting can run without a window. Durations of the stages are in
+timings.last ("display", "pick", "measure", "select").
+
+With an X display the view gets a virtual (never mapped) window,
+otherwise a neutral window which needs an OCCT built with EGL. Software
+rendering is requested from Mesa unless LIBGL_ALWAYS_SOFTWARE is set.
+"""
+import logging
+import os
+import tempfile
+
+import wx
+from OCP.AIS import AIS_InteractiveContext
+from OCP.Aspect import Aspect_DisplayConnection, Aspect_NeutralWindow
+from OCP.OpenGl import OpenGl_GraphicDriver
+from OCP.V3d import V3d_Viewer
+
+from cq_viewer.app import CQViewerContext
+from cq_viewer.interface import execution_context
+from cq_viewer.quality import FULL_QUALITY
+from cq_viewer.session import ReplayReport, Replayer, Session
+from cq_viewer.wx_components import PointerMixin, configure_context
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZE = (800, 600)
+
+
+class HeadlessCanvas(PointerMixin):
+    def __init__(self, cq_viewer_ctx: CQViewerContext, width: int, height: int):
+        self.cq_viewer_ctx = cq_viewer_ctx
+        os.environ.setdefault("LIBGL_ALWAYS_SOFTWARE", "1")
+        self.display_connection = Aspect_DisplayConnection()
+        self.graphics_driver = OpenGl_GraphicDriver(self.display_connection)
+        self.graphics_driver.ChangeOptions().buffersNoSwap = True
+        self.viewer = V3d_Viewer(self.graphics_driver)
+        self.viewer.SetDefaultLights()
+        self.viewer.SetLightOn()
+        self.view = self.viewer.CreateView()
+        self.context = AIS_InteractiveContext(self.viewer)
+        configure_context(self.context)
+
+        params = self.view.ChangeRenderingParams()
+        params.NbMsaaSamples = FULL_QUALITY.msaa_samples
+        params.IsAntialiasingEnabled = FULL_QUALITY.msaa_samples > 0
+
+        self.view.SetWindow(self.create_window(width, height))
+        self.view.MustBeResized()
+        self.view.Redraw()
+
+    def create_window(self, width: int, height: int):
+        if os.environ.get("DISPLAY"):
+            from OCP.Xw import Xw_Window
+
+            window = Xw_Window(
+                self.display_connection, "cq-viewer headless", 0, 0, width, height
+            )
+            window.SetVirtual(True)
+            return window
+
+        window = Aspect_NeutralWindow()
+        window.SetSize(width, height)
+        return window
+
+    def begin_interaction(self):
+        # Without an idle timer to end it, the quality would never recover
+        pass
+
+
+class HeadlessInfoPanel:
+    def update_info(self):
+        pass
+
+
+class HeadlessFrame:
+    """The parts of MainFrame that CQViewerContext uses"""
+
+    def __init__(self, cq_viewer_ctx: CQViewerContext, width: int, height: int):
+        cq_viewer_ctx.main_frame = self
+        self.cq_viewer_ctx = cq_viewer_ctx
+        self.canvas = HeadlessCanvas(cq_viewer_ctx, width, height)
+        self.info_panel = HeadlessInfoPanel()
+        self.status = ""
+
+    def set_status(self, text: str):
+        self.status = text
+
+    def update_memory_stats(self):
+        pass
+
+    def update_sweep_table(self):
+        pass
+
+
+class HeadlessViewer:
+    """Pixel coordinates of model points come from to_pixel"""
+
+    def __init__(self, width: int = DEFAULT_SIZE[0], height: int = DEFAULT_SIZE[1]):
+        self.size = (width, height)
+        # wx.CallAfter and wx.FileConfig need an application object,
+        # a console one does not need a display
+        self.app = wx.GetApp() or wx.AppConsole()
+        self.ctx = CQViewerContext()
+        # Not the last session of the application
+        self.ctx.file_path = None
+        self.ctx.project = None
+        self.ctx.snapshot_dir = tempfile.mkdtemp(prefix="cq-viewer-headless-")
+        self.frame = HeadlessFrame(self.ctx, width, height)
+
+    @property
+    def canvas(self) -> HeadlessCanvas:
+        return self.frame.canvas
+
+    def load(self, file_path: str):
+        """Execute and display a model, selection is ready when this returns"""
+        self.ctx.file_path = file_path
+        self.ctx.exec_and_display(fit=True, reset_projection=True)
+        self.finish_selection_activation()
+
+    def finish_selection_activation(self):
+        """Activation is otherwise spread over wx.CallAfter calls"""
+        while not self.ctx.selection_ready:
+            self.ctx.activate_pending_selection()
+        self.process_pending_events()
+
+    def process_pending_events(self):
+        self.app.ProcessPendingEvents()
+
+    def redraw(self):
+        self.canvas.view.Redraw()
+
+    def hover(self, x: int, y: int):
+        self.canvas.hover(x, y)
+
+    def click(self, x: int, y: int, shift: bool = False):
+        self.canvas.hover(x, y)
+        self.canvas.click(shift)
+
+    def replay(self, session: Session, realtime: bool = False) -> ReplayReport:
+        """Key events are skipped, there is no frame to handle them"""
+        for problem in session.mismatches(self.ctx.file_path, self.size):
+            logger.warning("Replay: %s", problem)
+        return Replayer(session, self.canvas).run(
+            realtime, between=self.process_pending_events
+        )
+
+    def to_pixel(self, x: float, y: float, z: float) -> tuple[int, int]:
+        """Pixel coordinates of a model point"""
+        return self.canvas.view.Convert(x, y, z)
+
+    def clear_selection(self):
+        self.canvas.context.ClearSelected(False)
+        self.ctx.select([])
+        self.ctx.update_measurement()
+
+    def close(self):
+        self.canvas.context.RemoveAll(False)
+        execution_context.reset()
+        self.ctx.main_frame = None
+
@@ -1,18 +1,24 @@
 import inspect
 import logging
+import time
 import traceback
 from collections import defaultdict
 from types import ModuleType
-from typing import Literal, Optional
+from typing import Literal, Optional, Sequence
 
 import wx
 from OCP.AIS import AIS_InteractiveObject, AIS_Shape
-from OCP.gp import gp_Pln
-from OCP.TopoDS import TopoDS_Builder, TopoDS_Compound, TopoDS_Face, TopoDS_Shape
+from OCP.Quantity import Quantity_Color, Quantity_TOC_RGB
+from OCP.TopoDS import TopoDS_Builder, TopoDS_Compound, TopoDS_Shape
 
 from cq_viewer.conf import FAILED_BUILDERS_KEY
 from cq_viewer.managers import ImportManager, PathManager
-from cq_viewer.util import collect_b3d_builder_pending, color_str_to_quantity_color
+from cq_viewer.shape_index import ShapeIndex
+from cq_viewer.util import (
+    PendingSketch,
+    PendingSketchCache,
+    color_str_to_quantity_color,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -73,51 +79,69 @@ def extract_shape(obj) -> Optional[TopoDS_Shape]:
 
 
 def extract_ais_shapes(obj) -> list[AIS_Shape]:
-    if obj is None:
-        return []
-
-    if isinstance(obj, TopoDS_Shape):
-        return [AIS_Shape(obj)]
-
-    if isinstance(obj, (list, tuple)):
-        return [
-            sub_shape
-            for _sub_shapes in [extract_ais_shapes(item) for item in obj]
-            for sub_shape in _sub_shapes
-        ]
-
-    if b3d:
-        if isinstance(obj, b3d.Shape):
-            if obj.children:
-                location = obj.location
-                moved_children = [child.moved(location) for child in obj.children]
-                return extract_ais_shapes(moved_children)
-
-            shape = AIS_Shape(obj.wrapped)
-            if obj.color:
-                shape.SetColor(obj.color.wrapped.GetRGB())
-                shape.SetTransparency(obj.color.wrapped.Alpha())
-
-            # TODO material
-
-            return [shape]
-        elif isinstance(obj, b3d.ShapeList):
-            return extract_ais_shapes(list(obj))
-
-        elif isinstance(obj, b3d.BuildPart):
-            return extract_ais_shapes(obj.part)
-
-    if cq:
-        if isinstance(obj, cq.Workplane):
-            return extract_ais_shapes(obj.objects)
-        if isinstance(obj, cq.Shape):
-            shape = AIS_Shape(obj.wrapped)
-            if hasattr(obj, "color"):
-                shape.SetColor(obj.color.wrapped.GetRGB())
-                shape.SetTransparency(obj.color.wrapped.Alpha())
-            return [shape]
+    """
+    Flatten obj into AIS shapes.
 
-    raise ValueError(f"Unable to extract shape from {type(obj)}!")
+    Iterative on purpose, deeply nested ShapeLists and children
+    would otherwise cost a recursion level and a temporary list each.
+    """
+    ais_shapes = []
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if item is None:
+            continue
+
+        if isinstance(item, TopoDS_Shape):
+            ais_shapes.append(AIS_Shape(item))
+            continue
+
+        # Reversed so that the output keeps the input order
+        if isinstance(item, (list, tuple)):
+            stack.extend(reversed(item))
+            continue
+
+        if b3d:
+            if isinstance(item, b3d.Shape):
+                if item.children:
+                    location = item.location
+                    stack.extend(
+                        child.moved(location) for child in reversed(item.children)
+                    )
+                    continue
+
+                shape = AIS_Shape(item.wrapped)
+                if item.color:
+                    shape.SetColor(item.color.wrapped.GetRGB())
+                    shape.SetTransparency(item.color.wrapped.Alpha())
+
+                # TODO material
+
+                ais_shapes.append(shape)
+                continue
+            elif isinstance(item, b3d.ShapeList):
+                stack.extend(reversed(item))
+                continue
+
+            elif isinstance(item, b3d.BuildPart):
+                stack.append(item.part)
+                continue
+
+        if cq:
+            if isinstance(item, cq.Workplane):
+                stack.extend(reversed(item.objects))
+                continue
+            if isinstance(item, cq.Shape):
+                shape = AIS_Shape(item.wrapped)
+                if hasattr(item, "color"):
+                    shape.SetColor(item.color.wrapped.GetRGB())
+                    shape.SetTransparency(item.color.wrapped.Alpha())
+                ais_shapes.append(shape)
+                continue
+
+        raise ValueError(f"Unable to extract shape from {type(item)}!")
+
+    return ais_shapes
 
 
 class DisplayObject:
@@ -128,15 +152,53 @@ class DisplayObject:
         if color := options.get("color"):
             if isinstance(color, str):
                 options["color"] = color_str_to_quantity_color(color)
+            elif isinstance(color, tuple):
+                options["color"] = Quantity_Color(*color, Quantity_TOC_RGB)
 
         self.options = options
+        self.conversion_time: Optional[float] = None
+        self._ais_objects: Optional[list[AIS_InteractiveObject]] = None
+        self._ais_objects_source = None
+        self._shape_indexes: Optional[list[Optional[ShapeIndex]]] = None
+        self._shape_indexes_source = None
+
+    @property
+    def _conversion_source(self):
+        """The object whose identity decides if cached AIS objects are still valid"""
+        return self.obj
 
     @property
     def ais_objects(self) -> list[AIS_InteractiveObject]:
-        if isinstance(self.obj, AIS_InteractiveObject):
-            return [self.obj]
+        source = self._conversion_source
+        if self._ais_objects is None or source is not self._ais_objects_source:
+            start = time.perf_counter()
+            if isinstance(self.obj, AIS_InteractiveObject):
+                self._ais_objects = [self.obj]
+            else:
+                self._ais_objects = extract_ais_shapes(self.obj)
+            self._ais_objects_source = source
+            self.conversion_time = time.perf_counter() - start
+            logger.debug(
+                "Converted %s to %d AIS objects in %.1f ms",
+                self.name,
+                len(self._ais_objects),
+                self.conversion_time * 1000,
+            )
+        return self._ais_objects
 
-        return extract_ais_shapes(self.obj)
+    @property
+    def shape_indexes(self) -> list[Optional[ShapeIndex]]:
+        """Sub-shape index of each AIS object, None for non-shapes"""
+        ais_objects = self.ais_objects
+        if self._shape_indexes is None or self._shape_indexes_source is not ais_objects:
+            self._shape_indexes = [
+                ShapeIndex(ais_object.Shape())
+                if isinstance(ais_object, AIS_Shape)
+                else None
+                for ais_object in ais_objects
+            ]
+            self._shape_indexes_source = ais_objects
+        return self._shape_indexes
 
     @property
     def sketch(self):
@@ -165,6 +227,12 @@ class B123dBuildPart(DisplayObject):
 
     def __init__(self, context, obj, name, **options):
         super().__init__(context, obj, name, **options)
+        self._sketch_cache = PendingSketchCache()
+
+    @property
+    def _conversion_source(self):
+        # The builder itself is mutated in place, the built part is replaced
+        return getattr(self.obj, "_obj", None)
 
     @property
     def _failed_sketch_build(self) -> Optional["b3d.Builder"]:
@@ -179,10 +247,8 @@ class B123dBuildPart(DisplayObject):
         return None
 
     @property
-    def sketch(
-        self,
-    ) -> Optional[list[tuple[list[TopoDS_Face], list[TopoDS_Compound], list[gp_Pln]]]]:
-        return collect_b3d_builder_pending(self.obj)
+    def sketch(self) -> Optional[PendingSketch]:
+        return self._sketch_cache.get(self.obj)
 
 
 class ExecutionContext:
@@ -193,12 +259,32 @@ class ExecutionContext:
         self.bp_autosketch = True
         self.pre_sketch_projection = None
         self.config = {}
+        # Values returned by param(), set for parameter sweep variants
+        self.parameters: dict = {}
+        # Pushed over cq_viewer.ipc, these survive re-executing the file
+        self.remote_objects: dict[str, DisplayObject] = {}
 
     def add_display_object(self, cq_obj: DisplayObject):
         self.display_objects.append(cq_obj)
 
     def reset(self):
-        self.display_objects = []
+        self.display_objects = list(self.remote_objects.values())
+
+    def set_remote_object(self, dp_obj: DisplayObject):
+        previous = self.remote_objects.get(dp_obj.name)
+        self.remote_objects[dp_obj.name] = dp_obj
+        if previous in self.display_objects:
+            self.display_objects[self.display_objects.index(previous)] = dp_obj
+        else:
+            self.display_objects.append(dp_obj)
+
+    def remove_remote_object(self, name: str):
+        if (dp_obj := self.remote_objects.pop(name, None)) is not None:
+            self.display_objects.remove(dp_obj)
+
+    def clear_remote_objects(self):
+        for name in list(self.remote_objects):
+            self.remove_remote_object(name)
 
     @property
     def cq_wp_objects(self) -> list[CQWorkplane]:
@@ -273,8 +359,46 @@ def show_object(obj, name=None, options=None, **kwargs):
     execution_context.add_display_object(cq_obj)
 
 
-def setup(*, projection: Literal["orthographic", "perspective"] = None):
-    execution_context.config = (lambda **kwargs: {**kwargs})(projection=projection)
+def setup(
+    *,
+    projection: Literal["orthographic", "perspective"] = None,
+    render_quality: Optional[dict] = None,
+    interaction_quality: Optional[dict] = None,
+    process_tessellation: bool = False,
+    parameters: Optional[dict[str, Sequence]] = None,
+    sweep_measurements: Optional[Sequence[str]] = None,
+    min_wall_thickness: Optional[float] = None,
+):
+    """
+    render_quality and interaction_quality override fields of
+    cq_viewer.quality.RenderQuality, the latter is used while
+    rotating, panning or zooming.
+
+    process_tessellation meshes shapes in worker processes, which pays
+    off for large models.
+
+    parameters declares the values to sweep, e.g. {"wall": [1, 2, 3]}.
+    Read them in the model with param(). sweep_measurements picks the
+    mass properties (volume, surface_area, length, obb, ...) that are
+    tabulated per variant.
+
+    min_wall_thickness is highlighted by the wall thickness analysis,
+    by default the thinnest tenth of the wall is.
+    """
+    execution_context.config = (lambda **kwargs: {**kwargs})(
+        projection=projection,
+        render_quality=render_quality,
+        interaction_quality=interaction_quality,
+        process_tessellation=process_tessellation,
+        parameters=parameters,
+        sweep_measurements=sweep_measurements,
+        min_wall_thickness=min_wall_thickness,
+    )
+
+
+def param(name: str, default):
+    """Value of a swept parameter, default outside of a sweep"""
+    return execution_context.parameters.get(name, default)
 
 
 def exec_file(file_path):
@@ -0,0 +1,266 @@
+"""
+Local socket endpoint for pushing shapes into a running viewer
+
+A notebook or an editor can send shapes without the viewer executing
+anything:
+
+    from cq_viewer.ipc import push_object
+    push_object(result, name="bracket", options={"color": "red"})
+
+Shapes travel as binary BRep in chunks so that large shapes do not
+have to be pickled in one piece.
+
+The socket lives in the runtime directory of the user. Connections are
+authenticated with a key that the viewer writes next to the socket,
+readable by the user only, so other local users can neither send shapes
+nor make the viewer unpickle their messages.
+"""
+import io
+import logging
+import os
+import secrets
+import socket
+import tempfile
+import threading
+import uuid
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import (
+    Client,
+    Connection,
+    Listener,
+    answer_challenge,
+    deliver_challenge,
+)
+from typing import Callable, Optional
+
+from OCP.BinTools import BinTools
+from OCP.TopoDS import TopoDS_Shape
+
+from cq_viewer.interface import extract_shape
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1 << 20
+
+
+def default_address() -> str:
+    if runtime_dir := os.environ.get("XDG_RUNTIME_DIR"):
+        return os.path.join(runtime_dir, "cq-viewer.sock")
+    return os.path.join(tempfile.gettempdir(), f"cq-viewer-{os.getuid()}.sock")
+
+
+def key_path(address: str) -> str:
+    return f"{address}.key"
+
+
+def write_auth_key(address: str) -> bytes:
+    key = secrets.token_bytes(32)
+    tmp_path = f"{key_path(address)}.{os.getpid()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    os.replace(tmp_path, key_path(address))
+    return key
+
+
+def read_auth_key(address: str) -> bytes:
+    with open(key_path(address), "rb") as f:
+        return f.read()
+
+
+def is_listening(address: str) -> bool:
+    with socket.socket(socket.AF_UNIX) as s:
+        try:
+            s.connect(address)
+        except OSError:
+            return False
+    return True
+
+
+def shape_to_bytes(shape: TopoDS_Shape) -> bytes:
+    stream = io.BytesIO()
+    BinTools.Write_s(shape, stream)
+    return stream.getvalue()
+
+
+def bytes_to_shape(data: bytes) -> TopoDS_Shape:
+    shape = TopoDS_Shape()
+    BinTools.Read_s(shape, io.BytesIO(data))
+    return shape
+
+
+class ViewerServer:
+    """
+    Accepts show_object, remove and clear messages. The callbacks are
+    called from the connection threads.
+    """
+
+    def __init__(
+        self,
+        on_object: Callable[[str, TopoDS_Shape, dict], None],
+        on_remove: Callable[[str], None],
+        on_clear: Callable[[], None],
+        address: Optional[str] = None,
+    ):
+        self.address = address or default_address()
+        self.on_object = on_object
+        self.on_remove = on_remove
+        self.on_clear = on_clear
+        self.listener: Optional[Listener] = None
+        self.authkey = b""
+
+    def start(self):
+        if os.path.exists(self.address):
+            if is_listening(self.address):
+                raise OSError(f"Another viewer is listening on {self.address}")
+            # Left behind by a viewer that did not exit cleanly
+            os.unlink(self.address)
+        self.authkey = write_auth_key(self.address)
+        # The socket must never be accessible to others, not even briefly
+        umask = os.umask(0o177)
+        try:
+            self.listener = Listener(self.address, family="AF_UNIX")
+        finally:
+            os.umask(umask)
+        threading.Thread(target=self._accept, daemon=True).start()
+        logger.info("Listening for shapes on %s", self.address)
+
+    def stop(self):
+        if self.listener:
+            self.listener.close()
+            self.listener = None
+            try:
+                os.unlink(key_path(self.address))
+            except OSError:
+                pass
+
+    def _accept(self):
+        while self.listener:
+            try:
+                connection = self.listener.accept()
+            except OSError:
+                return
+            threading.Thread(
+                target=self._serve, args=(connection,), daemon=True
+            ).start()
+
+    def _serve(self, connection: Connection):
+        # Message id -> (header, received chunks)
+        incoming: dict[str, tuple[dict, list[bytes]]] = {}
+        with connection:
+            # Here rather than in accept, a client that does not answer
+            # must not hold up the others
+            try:
+                deliver_challenge(connection, self.authkey)
+                answer_challenge(connection, self.authkey)
+            except AuthenticationError as ex:
+                logger.warning("Rejected client: %s", ex)
+                return
+            except (EOFError, OSError):
+                # Such as the probe of a viewer checking for this one
+                return
+            while True:
+                try:
+                    message = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    self._handle(message, incoming)
+                except Exception as ex:
+                    logger.warning("Bad message from client: %s", ex)
+
+    def _handle(self, message: dict, incoming: dict[str, tuple[dict, list[bytes]]]):
+        message_type = message["type"]
+        if message_type == "show_object":
+            size = message["size"]
+            if not isinstance(size, int) or size < 0:
+                raise ValueError(f"Invalid size {size!r}")
+            incoming[message["id"]] = (message, [])
+        elif message_type == "chunk":
+            header, chunks = incoming[message["id"]]
+            received = sum(len(chunk) for chunk in chunks) + len(message["data"])
+            if received > header["size"]:
+                del incoming[message["id"]]
+                raise ValueError(f"More than the announced {header['size']} bytes")
+            chunks.append(message["data"])
+        elif message_type == "end":
+            header, chunks = incoming.pop(message["id"])
+            data = b"".join(chunks)
+            if len(data) != header["size"]:
+                raise ValueError(f"Got {len(data)} of {header['size']} bytes")
+            shape = bytes_to_shape(data)
+            self.on_object(header["name"], shape, header["options"])
+        elif message_type == "remove":
+            self.on_remove(message["name"])
+        elif message_type == "clear":
+            self.on_clear()
+        else:
+            raise ValueError(f"Unknown message type {message_type}")
+
+
+class ViewerClient:
+    def __init__(self, address: Optional[str] = None):
+        address = address or default_address()
+        self.connection = Client(
+            address, family="AF_UNIX", authkey=read_auth_key(address)
+        )
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def show_object(
+        self,
+        obj,
+        name: Optional[str] = None,
+        options: Optional[dict] = None,
+        chunk_size: int = CHUNK_SIZE,
+    ):
+        """
+        Options must be picklable, give colors as names or RGB tuples
+        """
+        shape = extract_shape(obj)
+        if shape is None:
+            raise ValueError("Nothing to show")
+        data = shape_to_bytes(shape)
+        message_id = uuid.uuid4().hex
+        self.connection.send(
+            {
+                "type": "show_object",
+                "id": message_id,
+                "name": name or f"remote-{message_id[:8]}",
+                "options": options or {},
+                "size": len(data),
+            }
+        )
+        view = memoryview(data)
+        for offset in range(0, len(data), chunk_size):
+            self.connection.send(
+                {
+                    "type": "chunk",
+                    "id": message_id,
+                    "data": bytes(view[offset : offset + chunk_size]),
+                }
+            )
+        self.connection.send({"type": "end", "id": message_id})
+
+    def remove(self, name: str):
+        self.connection.send({"type": "remove", "name": name})
+
+    def clear(self):
+        self.connection.send({"type": "clear"})
+
+
+def push_object(
+    obj,
+    name: Optional[str] = None,
+    options: Optional[dict] = None,
+    address: Optional[str] = None,
+):
+    with ViewerClient(address) as client:
+        client.show_object(obj, name, options)
@@ -0,0 +1,181 @@
+"""
+Mass properties (volume, area, center of mass, inertia, oriented bounding box)
+
+Computed on the background executor and cached per shape so that
+growing a multi-selection only computes the new members.
+"""
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from OCP.Bnd import Bnd_OBB
+from OCP.BRepBndLib import BRepBndLib
+from OCP.BRepGProp import BRepGProp
+from OCP.GProp import GProp_GProps
+from OCP.TopAbs import TopAbs_EDGE, TopAbs_FACE, TopAbs_SOLID
+from OCP.TopExp import TopExp_Explorer
+from OCP.TopoDS import TopoDS_Shape
+
+from cq_viewer.workers import background_executor
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MassProperties:
+    volume: Optional[GProp_GProps]
+    surface: Optional[GProp_GProps]
+    linear: Optional[GProp_GProps]
+    obb: Bnd_OBB
+
+
+def contains(shape: TopoDS_Shape, shape_type) -> bool:
+    return TopExp_Explorer(shape, shape_type).More()
+
+
+def compute_mass_properties(shape: TopoDS_Shape) -> MassProperties:
+    volume = None
+    surface = None
+    linear = None
+    if contains(shape, TopAbs_SOLID):
+        volume = GProp_GProps()
+        BRepGProp.VolumeProperties_s(shape, volume)
+    if contains(shape, TopAbs_FACE):
+        surface = GProp_GProps()
+        BRepGProp.SurfaceProperties_s(shape, surface)
+    elif contains(shape, TopAbs_EDGE):
+        linear = GProp_GProps()
+        BRepGProp.LinearProperties_s(shape, linear)
+
+    obb = Bnd_OBB()
+    BRepBndLib.AddOBB_s(shape, obb, True, False, False)
+    return MassProperties(volume, surface, linear, obb)
+
+
+def sum_props(props: list[Optional[GProp_GProps]]) -> Optional[GProp_GProps]:
+    props = [p for p in props if p is not None]
+    if not props:
+        return None
+    total = GProp_GProps()
+    for p in props:
+        total.Add(p)
+    return total
+
+
+def point_str(point) -> str:
+    return f"({point.X():.4g}, {point.Y():.4g}, {point.Z():.4g})"
+
+
+def mass_properties_measurements(
+    mass_properties: list[MassProperties],
+) -> dict[str, str | float]:
+    measurements = {}
+    volume = sum_props([mp.volume for mp in mass_properties])
+    surface = sum_props([mp.surface for mp in mass_properties])
+    linear = sum_props([mp.linear for mp in mass_properties])
+
+    if volume is not None:
+        measurements["volume"] = volume.Mass()
+    if surface is not None:
+        measurements["surface_area"] = surface.Mass()
+    if linear is not None:
+        measurements["length"] = linear.Mass()
+
+    # Center of mass and inertia of the highest dimension available
+    if dominant := volume or surface or linear:
+        measurements["center_of_mass"] = point_str(dominant.CentreOfMass())
+        inertia = dominant.MatrixOfInertia()
+        measurements["Ixx"] = inertia.Value(1, 1)
+        measurements["Iyy"] = inertia.Value(2, 2)
+        measurements["Izz"] = inertia.Value(3, 3)
+
+    obb = Bnd_OBB()
+    for mp in mass_properties:
+        obb.Add(mp.obb)
+    if not obb.IsVoid():
+        measurements["obb"] = (
+            f"{obb.XHSize() * 2:.4g} x {obb.YHSize() * 2:.4g} x {obb.ZHSize() * 2:.4g}"
+        )
+    return measurements
+
+
+# Cached for shapes whose properties could not be computed
+FAILED = object()
+
+
+class MassPropertiesCache:
+    def __init__(self, size: int = 64):
+        self.size = size
+        self._lock = threading.Lock()
+        # HashCode -> [(shape, properties)], IsSame resolves collisions
+        self._cache: OrderedDict[int, list[tuple[TopoDS_Shape, object]]] = OrderedDict()
+        self._pending: dict[int, list[TopoDS_Shape]] = {}
+
+    @staticmethod
+    def _key(shape: TopoDS_Shape) -> int:
+        return shape.HashCode(sys.maxsize)
+
+    def get(self, shape: TopoDS_Shape) -> object:
+        """MassProperties, FAILED or None if not computed yet"""
+        with self._lock:
+            for cached_shape, mass_properties in self._cache.get(self._key(shape), []):
+                if cached_shape.IsSame(shape):
+                    return mass_properties
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _is_pending(self, shape: TopoDS_Shape) -> bool:
+        return any(
+            pending.IsSame(shape) for pending in self._pending.get(self._key(shape), [])
+        )
+
+    def _compute(self, shape: TopoDS_Shape, on_ready: Optional[Callable[[], None]]):
+        key = self._key(shape)
+        try:
+            mass_properties = compute_mass_properties(shape)
+        except Exception as ex:
+            logger.warning("Mass properties failed: %s", ex)
+            mass_properties = FAILED
+
+        with self._lock:
+            pending = self._pending.get(key, [])
+            self._pending[key] = [p for p in pending if not p.IsSame(shape)]
+            self._cache.setdefault(key, []).append((shape, mass_properties))
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.size:
+                self._cache.popitem(last=False)
+        if on_ready:
+            on_ready()
+
+    def request(
+        self,
+        shapes: list[TopoDS_Shape],
+        on_ready: Optional[Callable[[], None]] = None,
+    ) -> list[object]:
+        """
+        Return the cached properties of each shape, FAILED for the ones
+        that could not be computed and None for the ones that are not ready
+        yet. Those are computed in the background and on_ready is called
+        from the worker thread for each finished one.
+        """
+        results = []
+        for shape in shapes:
+            mass_properties = self.get(shape)
+            if mass_properties is None:
+                with self._lock:
+                    if self._is_pending(shape):
+                        results.append(None)
+                        continue
+                    self._pending.setdefault(self._key(shape), []).append(shape)
+                background_executor().submit(self._compute, shape, on_ready)
+            results.append(mass_properties)
+        return results
+
+
+mass_properties_cache = MassPropertiesCache()
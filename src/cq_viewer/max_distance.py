@@ -0,0 +1,305 @@
+"""
+Global maximum distance between two shapes
+
+A single local optimization from the center of the parameter space
+finds a local maximum at best. Instead the farthest pair of mesh nodes
+is found first (only the convex hull vertices can be part of it) and
+the best few candidates are then refined on the exact geometry.
+
+Parameters are normalized to [0, 1] the same way as in
+measurement.face_position_factory and measurement.edge_position_factory.
+"""
+import logging
+import math
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import numpy as np
+from OCP.BRep import BRep_Tool
+from OCP.BRepAdaptor import BRepAdaptor_Curve
+from OCP.BRepBuilderAPI import BRepBuilderAPI_Copy
+from OCP.BRepMesh import BRepMesh_IncrementalMesh
+from OCP.BRepTools import BRepTools
+from OCP.GCPnts import GCPnts_AbscissaPoint
+from OCP.gp import gp_Pnt
+from OCP.ShapeAnalysis import ShapeAnalysis_Surface
+from OCP.TopAbs import TopAbs_EDGE, TopAbs_FACE, TopAbs_VERTEX
+from OCP.TopLoc import TopLoc_Location
+from OCP.TopoDS import TopoDS, TopoDS_Edge, TopoDS_Face, TopoDS_Shape
+from scipy.optimize import minimize
+from scipy.spatial import ConvexHull
+
+from cq_viewer.face_classifier import face_classifier
+
+logger = logging.getLogger(__name__)
+
+EDGE_SAMPLES = 64
+REFINED_CANDIDATES = 4
+MESH_LINEAR_DEFLECTION = 0.1
+MESH_ANGULAR_DEFLECTION = 0.5
+# Samples per direction for faces that do not mesh
+SURFACE_GRID = 16
+SAMPLE_CACHE_SIZE = 256
+
+
+@dataclass
+class ShapeSamples:
+    points: np.ndarray  # (n, 3)
+    params: Optional[np.ndarray]  # (n, d) normalized parameters, None for vertices
+    position: Callable[..., gp_Pnt]
+    contains: Callable[..., bool]  # Takes the same parameters as position
+    # Upper bound for the distance from any point of the shape to a sample
+    radius: float = 0.0
+
+
+def pnt_to_tuple(pnt: gp_Pnt) -> tuple[float, float, float]:
+    return pnt.X(), pnt.Y(), pnt.Z()
+
+
+def transformed(points: np.ndarray, location: TopLoc_Location) -> np.ndarray:
+    trsf = location.Transformation()
+    # The 3 x 4 matrix of the transformation, scale included
+    matrix = np.array(
+        [[trsf.Value(row, col) for col in range(1, 5)] for row in range(1, 4)]
+    )
+    return points @ matrix[:, :3].T + matrix[:, 3]
+
+
+def face_samples(face: TopoDS_Face) -> ShapeSamples:
+    # Late import, measurement imports this module
+    from cq_viewer.measurement import face_position_factory
+
+    # Meshing the displayed face or updating its UV points from a pool
+    # thread would race with the UI, both happen on a copy
+    copy = TopoDS.Face_s(BRepBuilderAPI_Copy(face, False, True).Shape())
+    location = TopLoc_Location()
+    triangulation = BRep_Tool.Triangulation_s(copy, location)
+    if triangulation is None:
+        BRepMesh_IncrementalMesh(
+            copy, MESH_LINEAR_DEFLECTION, False, MESH_ANGULAR_DEFLECTION, True
+        )
+        triangulation = BRep_Tool.Triangulation_s(copy, location)
+    if triangulation is None or triangulation.NbNodes() == 0:
+        logger.debug("Face did not mesh, sampling its surface")
+        return surface_samples(face)
+
+    # OCP has no buffer access to the node arrays, one call per node
+    # builds them and numpy does the rest
+    nb_nodes = triangulation.NbNodes()
+    nodes = np.array(
+        [pnt_to_tuple(triangulation.Node(i)) for i in range(1, nb_nodes + 1)]
+    )
+    points = transformed(nodes, location)
+    nb_triangles = triangulation.NbTriangles()
+    triangles = np.array(
+        [triangulation.Triangle(i).Get() for i in range(1, nb_triangles + 1)],
+        dtype=int,
+    ).reshape(-1, 3)
+    triangles -= 1
+    corners = points[triangles]
+    edge_lengths = np.linalg.norm(corners - np.roll(corners, 1, axis=1), axis=2)
+    # Half the longest triangle edge plus the sag of the mesh
+    radius = 0.0
+    if len(triangles):
+        radius = edge_lengths.max() / 2 + triangulation.Deflection()
+
+    BRepTools.UpdateFaceUVPoints_s(copy)
+    u_min, u_max, v_min, v_max = BRepTools.UVBounds_s(copy)
+    if triangulation.HasUVNodes():
+        uv_nodes = map(triangulation.UVNode, range(1, nb_nodes + 1))
+    else:
+        surface_analysis = ShapeAnalysis_Surface(BRep_Tool.Surface_s(copy))
+        uv_nodes = (
+            surface_analysis.ValueOfUV(gp_Pnt(*point), 1e-6) for point in points
+        )
+    uv = np.array([(uv_node.X(), uv_node.Y()) for uv_node in uv_nodes])
+
+    params = np.column_stack(
+        (
+            (uv[:, 0] - u_min) / ((u_max - u_min) or 1),
+            (uv[:, 1] - v_min) / ((v_max - v_min) or 1),
+        )
+    )
+
+    return ShapeSamples(
+        points,
+        np.clip(params, 0, 1),
+        face_position_factory(face),
+        face_classifier(face).contains_normalized,
+        radius,
+    )
+
+
+def surface_samples(face: TopoDS_Face) -> ShapeSamples:
+    """A grid over the parameter space, without the points outside the face"""
+    from cq_viewer.measurement import face_position_factory
+
+    fpf = face_position_factory(face)
+    classifier = face_classifier(face)
+    grid = np.linspace(0, 1, SURFACE_GRID)
+    params = np.array([(u, v) for u in grid for v in grid])
+    points = np.array([pnt_to_tuple(fpf(u, v)) for u, v in params])
+
+    # Half the longest diagonal of a grid cell
+    cells = points.reshape(SURFACE_GRID, SURFACE_GRID, 3)
+    diagonals = np.concatenate(
+        (
+            np.linalg.norm(cells[1:, 1:] - cells[:-1, :-1], axis=2).ravel(),
+            np.linalg.norm(cells[1:, :-1] - cells[:-1, 1:], axis=2).ravel(),
+        )
+    )
+    radius = float(diagonals.max()) / 2
+
+    inside = np.array([classifier.contains_normalized(u, v) for u, v in params])
+    if inside.any():
+        params = params[inside]
+        points = points[inside]
+    return ShapeSamples(points, params, fpf, classifier.contains_normalized, radius)
+
+
+def edge_samples(edge: TopoDS_Edge) -> ShapeSamples:
+    from cq_viewer.measurement import edge_position_factory
+
+    epf = edge_position_factory(edge)
+    params = np.linspace(0, 1, EDGE_SAMPLES).reshape(-1, 1)
+    points = np.array([pnt_to_tuple(epf(d)) for d in params[:, 0]])
+    # Chords are never longer than the arcs between the samples
+    arc_length = GCPnts_AbscissaPoint.Length_s(BRepAdaptor_Curve(edge))
+    radius = arc_length / (EDGE_SAMPLES - 1) / 2
+    return ShapeSamples(points, params, epf, lambda d: True, radius)
+
+
+def vertex_samples(vertex) -> ShapeSamples:
+    point = BRep_Tool.Pnt_s(vertex)
+    return ShapeSamples(
+        np.array([pnt_to_tuple(point)]), None, lambda: point, lambda: True
+    )
+
+
+def create_shape_samples(shape: TopoDS_Shape) -> ShapeSamples:
+    shape_type = shape.ShapeType()
+    if shape_type == TopAbs_FACE:
+        return face_samples(shape)
+    elif shape_type == TopAbs_EDGE:
+        return edge_samples(shape)
+    elif shape_type == TopAbs_VERTEX:
+        return vertex_samples(shape)
+    raise ValueError(f"Unsupported shape type for max distance: {shape_type}")
+
+
+_lock = threading.Lock()
+# HashCode -> [(shape, samples)], IsEqual resolves collisions
+_sample_cache: OrderedDict[int, list[tuple[TopoDS_Shape, ShapeSamples]]] = OrderedDict()
+
+
+def shape_samples(shape: TopoDS_Shape) -> ShapeSamples:
+    """
+    Sampling loops over the mesh nodes in Python, so the samples of the
+    recently measured shapes are kept
+    """
+    key = shape.HashCode(sys.maxsize)
+    with _lock:
+        for cached_shape, samples in _sample_cache.get(key, []):
+            if cached_shape.IsEqual(shape):
+                _sample_cache.move_to_end(key)
+                return samples
+
+    samples = create_shape_samples(shape)
+    with _lock:
+        _sample_cache.setdefault(key, []).append((shape, samples))
+        _sample_cache.move_to_end(key)
+        while len(_sample_cache) > SAMPLE_CACHE_SIZE:
+            _sample_cache.popitem(last=False)
+    return samples
+
+
+def hull_indices(points: np.ndarray) -> np.ndarray:
+    """
+    The farthest point from anything is always a vertex of the convex hull
+    """
+    if len(points) < 5:
+        return np.arange(len(points))
+    try:
+        # Joggle so that planar point sets do not fail
+        return ConvexHull(points, qhull_options="QJ").vertices
+    except Exception as ex:
+        logger.debug("Convex hull failed, using all points: %s", ex)
+        return np.arange(len(points))
+
+
+def farthest_candidates(
+    points1: np.ndarray, points2: np.ndarray, count: int
+) -> list[tuple[int, int, float]]:
+    hull1 = hull_indices(points1)
+    hull2 = hull_indices(points2)
+    diff = points1[hull1][:, None, :] - points2[hull2][None, :, :]
+    distances_squared = np.einsum("ijk,ijk->ij", diff, diff).ravel()
+
+    count = min(count, distances_squared.size)
+    top = np.argpartition(-distances_squared, count - 1)[:count]
+    top = top[np.argsort(-distances_squared[top])]
+    return [
+        (
+            int(hull1[k // len(hull2)]),
+            int(hull2[k % len(hull2)]),
+            math.sqrt(distances_squared[k]),
+        )
+        for k in top
+    ]
+
+
+def split_params(samples1: ShapeSamples, x: np.ndarray):
+    n1 = 0 if samples1.params is None else samples1.params.shape[1]
+    return x[:n1], x[n1:]
+
+
+def positions(samples1: ShapeSamples, samples2: ShapeSamples, x: np.ndarray):
+    x1, x2 = split_params(samples1, x)
+    return samples1.position(*x1), samples2.position(*x2)
+
+
+def refine(
+    samples1: ShapeSamples, samples2: ShapeSamples, i1: int, i2: int
+) -> Optional[tuple[gp_Pnt, gp_Pnt, float]]:
+    x0 = []
+    if samples1.params is not None:
+        x0 += list(samples1.params[i1])
+    if samples2.params is not None:
+        x0 += list(samples2.params[i2])
+    if not x0:
+        return None
+
+    def negative_distance_squared(x):
+        p1, p2 = positions(samples1, samples2, x)
+        return -p1.SquareDistance(p2)
+
+    # Trimming is checked only on the result, an infinite
+    # objective outside of the face would derail the optimizer
+    result = minimize(negative_distance_squared, x0=x0, bounds=[(0, 1)] * len(x0))
+    x1, x2 = split_params(samples1, result.x)
+    if not (samples1.contains(*x1) and samples2.contains(*x2)):
+        return None
+    p1, p2 = positions(samples1, samples2, result.x)
+    return p1, p2, p1.Distance(p2)
+
+
+def max_distance(
+    shape1: TopoDS_Shape, shape2: TopoDS_Shape
+) -> tuple[gp_Pnt, gp_Pnt, float]:
+    samples1 = shape_samples(shape1)
+    samples2 = shape_samples(shape2)
+
+    candidates = farthest_candidates(
+        samples1.points, samples2.points, REFINED_CANDIDATES
+    )
+    i1, i2, distance = candidates[0]
+    best = (gp_Pnt(*samples1.points[i1]), gp_Pnt(*samples2.points[i2]), distance)
+
+    for i1, i2, _ in candidates:
+        refined = refine(samples1, samples2, i1, i2)
+        if refined and refined[2] > best[2]:
+            best = refined
+    return best
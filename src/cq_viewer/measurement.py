@@ -1,12 +1,18 @@
 """
 OCCT claims to support calculating maximum extrema
 but either the feature was never quite finished or it
-has been removed. So only minimum distances.
+has been removed. So only minimum distances, maximum
+distances come from cq_viewer.max_distance.
 
 """
 
+import logging
 import math
 import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from typing import Callable, Optional
 
 import cadquery as cq
@@ -15,7 +21,6 @@ from OCP.AIS import AIS_InteractiveObject, AIS_Line, AIS_Shape
 from OCP.Aspect import Aspect_TOL_DASH, Aspect_TOL_DOT
 from OCP.BRep import BRep_Tool
 from OCP.BRepAdaptor import BRepAdaptor_Curve, BRepAdaptor_Surface
-from OCP.BRepClass import BRepClass_FaceClassifier
 from OCP.BRepExtrema import (
     BRepExtrema_DistShapeShape,
     BRepExtrema_ExtCC,
@@ -42,8 +47,6 @@ from OCP.TopAbs import (
     TopAbs_COMPSOLID,
     TopAbs_EDGE,
     TopAbs_FACE,
-    TopAbs_IN,
-    TopAbs_ON,
     TopAbs_SHELL,
     TopAbs_SOLID,
     TopAbs_VERTEX,
@@ -51,6 +54,32 @@ from OCP.TopAbs import (
 )
 from OCP.TopoDS import TopoDS, TopoDS_Edge, TopoDS_Face, TopoDS_Shape, TopoDS_Vertex
 from scipy.optimize import minimize
+from scipy.spatial import cKDTree
+
+from cq_viewer.face_classifier import face_classifier
+from cq_viewer.mass_properties import (
+    FAILED,
+    mass_properties_cache,
+    mass_properties_measurements,
+)
+from cq_viewer.max_distance import (
+    ShapeSamples,
+    farthest_candidates,
+    max_distance,
+    shape_samples,
+)
+from cq_viewer.pairwise import (
+    FULL_MATRIX_LIMIT,
+    PENDING,
+    all_pairs,
+    closest_pairs,
+    distance_table,
+    min_distance,
+    nearest_neighbours,
+)
+from cq_viewer.workers import background_executor
+
+logger = logging.getLogger(__name__)
 
 min_line_aspect = Prs3d_LineAspect(
     Quantity_Color(Quantity_NOC_LIMEGREEN), Aspect_TOL_DASH, 1
@@ -85,16 +114,53 @@ def face_area(face: TopoDS_Face) -> float:
     return Properties.Mass()
 
 
+class MeasuredValue(float):
+    """
+    A float that knows how far off it may be, error None means converged
+    """
+
+    def __new__(cls, value: float, error: Optional[float] = None):
+        obj = super().__new__(cls, value)
+        obj.error = error
+        return obj
+
+    @property
+    def converged(self) -> bool:
+        return self.error is None
+
+    def __str__(self):
+        if self.converged:
+            return str(float(self))
+        return f"{float(self):.4g} ±{self.error:.2g}"
+
+    def __eq__(self, other):
+        if not isinstance(other, (int, float)):
+            return NotImplemented
+        return float(self) == float(other) and self.error == getattr(
+            other, "error", None
+        )
+
+    def __ne__(self, other):
+        # float.__ne__ would ignore the error
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash((float(self), self.error))
+
+
 class Measurement:
     def __init__(
         self,
         base_shapes: set[TopoDS_Shape],
         measurements: Optional[dict[str, str | int | float]] = None,
         ais_shapes: Optional[list[AIS_Shape | AIS_InteractiveObject]] = None,
+        table: Optional[list[list[str]]] = None,
     ):
         self.base_shapes = set(base_shapes)
         self.measurements: dict[str, str | int | float] = measurements or {}
         self.ais_shapes: Optional[list[AIS_Shape]] = ais_shapes or []
+        self.table = table
 
     def __hash__(self):
         return tuple(shape.HashCode(sys.maxsize) for shape in self.base_shapes)
@@ -107,6 +173,7 @@ class Measurement:
             self.base_shapes | other.base_shapes,
             {**self.measurements, **other.measurements},
             self.ais_shapes + other.ais_shapes,
+            self.table or other.table,
         )
 
     def __bool__(self):
@@ -129,19 +196,40 @@ downcast_LUT = {
 }
 
 
-def create_measurement(*shapes: TopoDS_Shape):
+# Seconds to wait for an exact distance before showing a coarse one
+ANYTIME_BUDGET = 0.01
+
+MASS_PROPERTY_TYPES = {TopAbs_SOLID, TopAbs_COMPSOLID, TopAbs_SHELL, TopAbs_COMPOUND}
+
+
+def create_measurement(
+    *shapes: TopoDS_Shape, on_update: Optional[Callable[[], None]] = None
+):
+    """
+    on_update is called from a worker thread when a background
+    computation finishes and the measurement should be recreated.
+    """
     downcasted_shapes = [downcast_LUT[shape.ShapeType()](shape) for shape in shapes]
-    return measure_generic(*downcasted_shapes)
+    return measure_generic(*downcasted_shapes, on_update=on_update)
+
+
+def measure_mass_properties(
+    shapes: list[TopoDS_Shape], on_update: Optional[Callable[[], None]] = None
+) -> Measurement:
+    mass_properties = mass_properties_cache.request(shapes, on_update)
+    if any(mp is FAILED for mp in mass_properties):
+        return Measurement(set(), {"mass_properties": "failed, see the log"}, [])
+    if any(mp is None for mp in mass_properties):
+        return Measurement(set(), {"mass_properties": "computing..."}, [])
+    return Measurement(set(), mass_properties_measurements(mass_properties), [])
 
 
 # TODO reimplement!
 def measure_edges(*edges: TopoDS_Edge) -> Measurement:
     measurements = {}
     ais_shapes = []
-    print("Bonk edges", edges)
     if len(edges) == 1:
         # Measure edge length or radius/circumference
-        print("EDGES", edges)
         edge = cq.Edge(edges[0])
         if edge.geomType() == "CIRCLE":
             circle: gp_Circ = edge._geomAdaptor().Circle()
@@ -155,10 +243,303 @@ def measure_edges(*edges: TopoDS_Edge) -> Measurement:
         return Measurement(set(edges), measurements, ais_shapes)
 
 
-def measure_generic(*shapes: TopoDS_Shape) -> Measurement:
-    print("Measure generic")
+def measure_pairwise(
+    shapes: list[TopoDS_Shape], on_update: Optional[Callable[[], None]] = None
+) -> Measurement:
+    """
+    Memoized per pair. With on_update the missing pairs are computed in
+    the background and the known ones are shown in the meantime.
+    """
+
+    def lookup(i: int, j: int):
+        if on_update is None:
+            return pair_distance_cache.compute(shapes[i], shapes[j])
+        result = pair_distance_cache.get(shapes[i], shapes[j])
+        if result is CACHE_MISS:
+            pair_distance_cache.submit(shapes[i], shapes[j], on_update)
+            return PENDING
+        # Failed pairs are None to the matrix, like pairs without a solution
+        return None if result is FAILED else result
+
+    if len(shapes) > FULL_MATRIX_LIMIT:
+        distances, complete = nearest_neighbours(shapes, lookup)
+    else:
+        distances, complete = all_pairs(len(shapes), lookup)
+    if not distances:
+        if complete:
+            return Measurement.blank()
+        return Measurement(set(), {"min_distance": "computing..."})
+
+    ais_shapes = [
+        min_ais_line(
+            Geom_CartesianPoint(distances[pair][0]),
+            Geom_CartesianPoint(distances[pair][1]),
+        )
+        for pair in closest_pairs(distances, len(shapes))
+        if distances[pair][2] > 0
+    ]
+    min_distance_value = min(result[2] for result in distances.values())
+    return Measurement(
+        set(),
+        {
+            "min_distance": min_distance_value
+            if complete
+            else f"{min_distance_value:.4g} computing..."
+        },
+        ais_shapes,
+        distance_table(distances, len(shapes)),
+    )
+
+
+def measure_distances_exact(*shapes: TopoDS_Shape) -> Measurement:
+    measurement = Measurement.blank()
+    type_set = set([shape.ShapeType() for shape in shapes])
+    if type_set == {TopAbs_FACE}:
+        measurement += optimization_result_to_measurement(
+            *optimize_face_face(shapes[0], shapes[1]), False
+        )
+        measurement += optimization_result_to_measurement(
+            *max_distance(shapes[0], shapes[1]), True
+        )
+
+    elif type_set == {TopAbs_FACE, TopAbs_EDGE}:
+        face, edge = (
+            (shapes[0], shapes[1])
+            if shapes[0].ShapeType() == TopAbs_FACE
+            else (shapes[1], shapes[0])
+        )
+        measurement += optimization_result_to_measurement(
+            *optimize_face_edge(face, edge), False
+        )
+        measurement += optimization_result_to_measurement(
+            *max_distance(face, edge), True
+        )
+
+    elif type_set == {TopAbs_FACE, TopAbs_VERTEX}:
+        face, vertex = (
+            (shapes[0], shapes[1])
+            if shapes[0].ShapeType() == TopAbs_FACE
+            else (shapes[1], shapes[0])
+        )
+        measurement += optimization_result_to_measurement(
+            *optimize_face_vertex(face, vertex), False
+        )
+        measurement += optimization_result_to_measurement(
+            *max_distance(face, vertex), True
+        )
+
+    elif type_set == {TopAbs_EDGE}:
+        measurement += optimization_result_to_measurement(
+            *optimize_edge_edge(shapes[0], shapes[1]), False
+        )
+        measurement += optimization_result_to_measurement(
+            *max_distance(shapes[0], shapes[1]), True
+        )
+
+    elif type_set == {TopAbs_EDGE, TopAbs_VERTEX}:
+        edge, vertex = (
+            (shapes[0], shapes[1])
+            if shapes[0].ShapeType() == TopAbs_EDGE
+            else (shapes[1], shapes[0])
+        )
+
+        measurement += optimization_result_to_measurement(
+            *optimize_edge_vertex(edge, vertex), False
+        )
+        measurement += optimization_result_to_measurement(
+            *max_distance(edge, vertex), True
+        )
+
+    elif type_set == {TopAbs_VERTEX}:
+        p1 = BRep_Tool.Pnt_s(shapes[0])
+        p2 = BRep_Tool.Pnt_s(shapes[1])
+
+        measurement += optimization_result_to_measurement(
+            p1, p2, math.sqrt(p1.SquareDistance(p2)), False
+        )
+
+    return measurement
+
+
+def measure_distances_coarse(
+    samples1: ShapeSamples, samples2: ShapeSamples
+) -> Measurement:
+    """
+    Distances between the mesh samples of the shapes, only good to the
+    sampling radius of both but fast enough for hovering.
+    """
+    error = samples1.radius + samples2.radius
+
+    distances, indices = cKDTree(samples2.points).query(samples1.points)
+    i1 = int(distances.argmin())
+    i2 = int(indices[i1])
+    measurement = optimization_result_to_measurement(
+        gp_Pnt(*samples1.points[i1]),
+        gp_Pnt(*samples2.points[i2]),
+        float(distances[i1]),
+        False,
+        error,
+    )
+
+    i1, i2, distance = farthest_candidates(samples1.points, samples2.points, 1)[0]
+    measurement += optimization_result_to_measurement(
+        gp_Pnt(*samples1.points[i1]),
+        gp_Pnt(*samples2.points[i2]),
+        distance,
+        True,
+        error,
+    )
+    return measurement
+
+
+# Returned by DistanceCache.get for pairs that have not been computed
+CACHE_MISS = object()
+
+
+class DistanceCache:
+    """
+    Results of a function of a shape pair, computed in the background.
+    Symmetric caches treat (a, b) and (b, a) as the same pair.
+    """
+
+    def __init__(
+        self,
+        compute: Callable[[TopoDS_Shape, TopoDS_Shape], object],
+        size: int = 64,
+        symmetric: bool = False,
+    ):
+        self.compute_fn = compute
+        self.size = size
+        self.symmetric = symmetric
+        self._lock = threading.Lock()
+        self._results: OrderedDict[
+            tuple[int, int], list[tuple[TopoDS_Shape, TopoDS_Shape, object]]
+        ] = OrderedDict()
+        self._pending: dict[
+            tuple[int, int], list[tuple[TopoDS_Shape, TopoDS_Shape, Future]]
+        ] = {}
+
+    def _key(self, shape1: TopoDS_Shape, shape2: TopoDS_Shape) -> tuple[int, int]:
+        key = shape1.HashCode(sys.maxsize), shape2.HashCode(sys.maxsize)
+        return tuple(sorted(key)) if self.symmetric else key
+
+    def _matches(self, s1, s2, shape1: TopoDS_Shape, shape2: TopoDS_Shape) -> bool:
+        if s1.IsSame(shape1) and s2.IsSame(shape2):
+            return True
+        return self.symmetric and s1.IsSame(shape2) and s2.IsSame(shape1)
+
+    def get(self, shape1: TopoDS_Shape, shape2: TopoDS_Shape) -> object:
+        """The cached result, which may be None or FAILED, or CACHE_MISS"""
+        with self._lock:
+            for s1, s2, result in self._results.get(self._key(shape1, shape2), []):
+                if self._matches(s1, s2, shape1, shape2):
+                    return result
+        return CACHE_MISS
+
+    def _store(self, shape1: TopoDS_Shape, shape2: TopoDS_Shape, result: object):
+        key = self._key(shape1, shape2)
+        with self._lock:
+            self._results.setdefault(key, []).append((shape1, shape2, result))
+            self._results.move_to_end(key)
+            while len(self._results) > self.size:
+                self._results.popitem(last=False)
+
+    def compute(self, shape1: TopoDS_Shape, shape2: TopoDS_Shape) -> object:
+        """Cached result or computed on the calling thread"""
+        if (result := self.get(shape1, shape2)) is CACHE_MISS:
+            result = self.compute_fn(shape1, shape2)
+            self._store(shape1, shape2, result)
+        return result
+
+    def _compute(self, shape1, shape2, on_update: Callable[[], None]) -> object:
+        """Failures are stored as FAILED so that the pair is not resubmitted"""
+        key = self._key(shape1, shape2)
+        try:
+            try:
+                result = self.compute_fn(shape1, shape2)
+            except Exception:
+                logger.exception("Background distance computation failed")
+                result = FAILED
+            self._store(shape1, shape2, result)
+        finally:
+            with self._lock:
+                self._pending[key] = [
+                    (s1, s2, future)
+                    for s1, s2, future in self._pending.get(key, [])
+                    if not self._matches(s1, s2, shape1, shape2)
+                ]
+        on_update()
+        return result
+
+    def submit(
+        self, shape1: TopoDS_Shape, shape2: TopoDS_Shape, on_update: Callable[[], None]
+    ) -> Future:
+        key = self._key(shape1, shape2)
+        with self._lock:
+            for s1, s2, future in self._pending.get(key, []):
+                if self._matches(s1, s2, shape1, shape2):
+                    return future
+            future = background_executor().submit(
+                self._compute, shape1, shape2, on_update
+            )
+            self._pending.setdefault(key, []).append((shape1, shape2, future))
+        return future
+
+
+distance_cache = DistanceCache(measure_distances_exact)
+# Sampling is too slow for the UI thread, the coarse result waits for it
+sample_cache = DistanceCache(lambda s1, s2: (shape_samples(s1), shape_samples(s2)))
+# Room for the full matrix of FULL_MATRIX_LIMIT shapes several times over
+pair_distance_cache = DistanceCache(min_distance, size=256, symmetric=True)
+
+
+def measure_distances(
+    shape1: TopoDS_Shape,
+    shape2: TopoDS_Shape,
+    on_update: Optional[Callable[[], None]] = None,
+) -> Measurement:
+    """
+    Anytime distance measurement. Without on_update the exact result is
+    computed right away. Otherwise the exact result is computed in the
+    background and if it does not arrive within ANYTIME_BUDGET seconds a
+    coarse result with error bounds is returned in the meantime, once the
+    samples for it have been computed in the background as well.
+    """
+    type_set = {shape1.ShapeType(), shape2.ShapeType()}
+    if on_update is None or type_set == {TopAbs_VERTEX}:
+        return measure_distances_exact(shape1, shape2)
+
+    exact = distance_cache.get(shape1, shape2)
+    if exact is CACHE_MISS:
+        future = distance_cache.submit(shape1, shape2, on_update)
+        try:
+            exact = future.result(timeout=ANYTIME_BUDGET)
+        except FutureTimeoutError:
+            pass
+    if exact is FAILED:
+        return Measurement(set(), {"min_distance": "failed, see the log"})
+    if exact is not CACHE_MISS:
+        return exact
+
+    if not type_set <= {TopAbs_FACE, TopAbs_EDGE, TopAbs_VERTEX}:
+        return Measurement.blank()
+    samples = sample_cache.get(shape1, shape2)
+    if samples is CACHE_MISS:
+        sample_cache.submit(shape1, shape2, on_update)
+        return Measurement(set(), {"min_distance": "computing..."})
+    if samples is FAILED:
+        return Measurement(set(), {"min_distance": "failed, see the log"})
+    return measure_distances_coarse(*samples)
+
+
+def measure_generic(
+    *shapes: TopoDS_Shape, on_update: Optional[Callable[[], None]] = None
+) -> Measurement:
     measurement = Measurement.blank(shapes)
     type_set = set([shape.ShapeType() for shape in shapes])
+    if type_set & MASS_PROPERTY_TYPES:
+        measurement += measure_mass_properties(list(shapes), on_update)
+
     if len(shapes) == 1:
         if type_set == {TopAbs_VERTEX}:
             point = BRep_Tool.Pnt_s(shapes[0])
@@ -173,69 +554,10 @@ def measure_generic(*shapes: TopoDS_Shape) -> Measurement:
             )
     elif len(shapes) == 2:
         # Distance measurements can be performed on two shapes
-        if type_set == {TopAbs_FACE}:
-            measurement += optimization_result_to_measurement(
-                *optimize_face_face(shapes[0], shapes[1], maximize=False), False
-            )
-            measurement += optimization_result_to_measurement(
-                *optimize_face_face(shapes[0], shapes[1], maximize=True), True
-            )
-
-        elif type_set == {TopAbs_FACE, TopAbs_EDGE}:
-            face, edge = (
-                (shapes[0], shapes[1])
-                if shapes[0].ShapeType() == TopAbs_FACE
-                else (shapes[1], shapes[0])
-            )
-            measurement += optimization_result_to_measurement(
-                *optimize_face_edge(face, edge, maximize=False), False
-            )
-            measurement += optimization_result_to_measurement(
-                *optimize_face_edge(face, edge, maximize=True), True
-            )
-
-        elif type_set == {TopAbs_FACE, TopAbs_VERTEX}:
-            face, vertex = (
-                (shapes[0], shapes[1])
-                if shapes[0].ShapeType() == TopAbs_FACE
-                else (shapes[1], shapes[0])
-            )
-            measurement += optimization_result_to_measurement(
-                *optimize_face_vertex(face, vertex, maximize=False), False
-            )
-            measurement += optimization_result_to_measurement(
-                *optimize_face_vertex(face, vertex, maximize=True), True
-            )
-
-        elif type_set == {TopAbs_EDGE}:
-            measurement += optimization_result_to_measurement(
-                *optimize_edge_edge(shapes[0], shapes[1], maximize=False), False
-            )
-            measurement += optimization_result_to_measurement(
-                *optimize_edge_edge(shapes[0], shapes[1], maximize=True), True
-            )
-
-        elif type_set == {TopAbs_EDGE, TopAbs_VERTEX}:
-            edge, vertex = (
-                (shapes[0], shapes[1])
-                if shapes[0].ShapeType() == TopAbs_EDGE
-                else (shapes[1], shapes[0])
-            )
-
-            measurement += optimization_result_to_measurement(
-                *optimize_edge_vertex(edge, vertex, maximize=False), False
-            )
-            measurement += optimization_result_to_measurement(
-                *optimize_edge_vertex(edge, vertex, maximize=True), True
-            )
-
-        elif type_set == {TopAbs_VERTEX}:
-            p1 = BRep_Tool.Pnt_s(shapes[0])
-            p2 = BRep_Tool.Pnt_s(shapes[1])
+        measurement += measure_distances(shapes[0], shapes[1], on_update)
+    else:
+        measurement += measure_pairwise(list(shapes), on_update)
 
-            measurement += optimization_result_to_measurement(
-                p1, p2, math.sqrt(p1.SquareDistance(p2)), False
-            )
     if type_set == {TopAbs_FACE}:
         measurement += Measurement(
             set(), {"area": sum([face_area(shape) for shape in shapes])}, []
@@ -277,85 +599,58 @@ def face_position_factory(face: TopoDS_Face):
 
 
 def edge_edge_distance_squared(
-    params,
-    epf1: Callable[[float], gp_Pnt],
-    epf2: Callable[[float], gp_Pnt],
-    maximize=False,
+    params, epf1: Callable[[float], gp_Pnt], epf2: Callable[[float], gp_Pnt]
 ):
     param1, param2 = params
     point1 = epf1(param1)
     point2 = epf2(param2)
-
-    if maximize:
-        return -point1.SquareDistance(point2)
     return point1.SquareDistance(point2)
 
 
 def face_edge_distance_squared_factory(face: TopoDS_Face):
+    classifier = face_classifier(face)
+
     def face_edge_distance_squared(
-        params,
-        fpf: Callable[[float, float], gp_Pnt],
-        epf: Callable[[float], gp_Pnt],
-        maximize=False,
+        params, fpf: Callable[[float, float], gp_Pnt], epf: Callable[[float], gp_Pnt]
     ):
         up, uv, p = params
-        face_point = fpf(up, uv)
-        classifier = BRepClass_FaceClassifier(face, face_point, 1e-7)
-        edge_point = epf(p)
-        if maximize:
-            if classifier.State() not in [TopAbs_IN, TopAbs_ON]:
-                return inf
-            return -face_point.SquareDistance(edge_point)
-        if classifier.State() not in [TopAbs_IN, TopAbs_ON]:
-            return -inf
-        return face_point.SquareDistance(edge_point)
+        # Points outside of the trimmed face must not be the minimum
+        if not classifier.contains_normalized(up, uv):
+            return inf
+        return fpf(up, uv).SquareDistance(epf(p))
 
     return face_edge_distance_squared
 
 
 def face_face_distance_squared_factory(face1: TopoDS_Face, face2: TopoDS_Face):
+    classifier1 = face_classifier(face1)
+    classifier2 = face_classifier(face2)
+
     def face_face_distance_squared(
         params,
         fpf1: Callable[[float, float], gp_Pnt],
         fpf2: Callable[[float, float], gp_Pnt],
-        maximize=False,
     ):
         up1, uv1, up2, uv2 = params
-        face1_point = fpf1(up1, uv1)
-        face2_point = fpf2(up2, uv2)
-
-        classifier1 = BRepClass_FaceClassifier(face1, face1_point, 1e-7)
-        classifier2 = BRepClass_FaceClassifier(face2, face2_point, 1e-7)
-        face1_point_within_face1 = classifier1.State() in [TopAbs_IN, TopAbs_ON]
-        face2_point_within_face2 = classifier2.State() in [TopAbs_IN, TopAbs_ON]
-
-        if maximize:
-            if not (face1_point_within_face1 and face2_point_within_face2):
-                return inf
-            return -face1_point.SquareDistance(face2_point)
-        if not (face1_point_within_face1 and face2_point_within_face2):
-            return -inf
-        return face1_point.SquareDistance(face2_point)
+        if not (
+            classifier1.contains_normalized(up1, uv1)
+            and classifier2.contains_normalized(up2, uv2)
+        ):
+            return inf
+        return fpf1(up1, uv1).SquareDistance(fpf2(up2, uv2))
 
     return face_face_distance_squared
 
 
 def face_vertex_distance_squared_factory(face: TopoDS_Face, vertex: TopoDS_Vertex):
     point = BRep_Tool.Pnt_s(vertex)
+    classifier = face_classifier(face)
 
-    def face_vertex_distance_squared(
-        params, fpf: Callable[[float, float], gp_Pnt], maximize=False
-    ):
+    def face_vertex_distance_squared(params, fpf: Callable[[float, float], gp_Pnt]):
         up, uv = params
-        face_point = fpf(up, uv)
-        classifier = BRepClass_FaceClassifier(face, face_point, 1e-7)
-        if maximize:
-            if classifier.State() not in [TopAbs_IN, TopAbs_ON]:
-                return inf
-            return -face_point.SquareDistance(point)
-        if classifier.State() not in [TopAbs_IN, TopAbs_ON]:
-            return -inf
-        return face_point.SquareDistance(point)
+        if not classifier.contains_normalized(up, uv):
+            return inf
+        return fpf(up, uv).SquareDistance(point)
 
     return face_vertex_distance_squared, point
 
@@ -363,19 +658,13 @@ def face_vertex_distance_squared_factory(face: TopoDS_Face, vertex: TopoDS_Verte
 def edge_vertex_distance_squared_factory(vertex: TopoDS_Vertex):
     point = BRep_Tool.Pnt_s(vertex)
 
-    def edge_vertex_distance_squared(
-        params, epf: Callable[[float], gp_Pnt], maximize=False
-    ):
-        p = params[0]
-        edge_point = epf(p)
-        if maximize:
-            return -edge_point.SquareDistance(point)
-        return edge_point.SquareDistance(point)
+    def edge_vertex_distance_squared(params, epf: Callable[[float], gp_Pnt]):
+        return epf(params[0]).SquareDistance(point)
 
     return edge_vertex_distance_squared, point
 
 
-def optimize_face_face(face1: TopoDS_Face, face2: TopoDS_Face, maximize=False):
+def optimize_face_face(face1: TopoDS_Face, face2: TopoDS_Face):
     face_face_distance_squared = face_face_distance_squared_factory(face1, face2)
 
     param_bounds = [(0, 1), (0, 1), (0, 1), (0, 1)]
@@ -389,7 +678,7 @@ def optimize_face_face(face1: TopoDS_Face, face2: TopoDS_Face, maximize=False):
         face_face_distance_squared,
         x0=initial_guess,
         bounds=param_bounds,
-        args=(fpf1, fpf2, maximize),
+        args=(fpf1, fpf2),
     )
 
     distance = math.sqrt(abs(result.fun))
@@ -400,7 +689,7 @@ def optimize_face_face(face1: TopoDS_Face, face2: TopoDS_Face, maximize=False):
 
 
 def optimize_face_edge(
-    face: TopoDS_Face, edge: TopoDS_Edge, maximize=False
+    face: TopoDS_Face, edge: TopoDS_Edge
 ) -> tuple[gp_Pnt, gp_Pnt, float]:
     face_edge_distance_squared = face_edge_distance_squared_factory(face)
     param_bounds = [(0, 1), (0, 1), (0, 1)]
@@ -414,7 +703,7 @@ def optimize_face_edge(
         face_edge_distance_squared,
         x0=initial_guess,
         bounds=param_bounds,
-        args=(fpf, epf, maximize),
+        args=(fpf, epf),
     )
 
     distance = math.sqrt(abs(result.fun))
@@ -424,7 +713,7 @@ def optimize_face_edge(
     return p1, p2, distance
 
 
-def optimize_edge_edge(edge1: TopoDS_Edge, edge2: TopoDS_Edge, maximize=False):
+def optimize_edge_edge(edge1: TopoDS_Edge, edge2: TopoDS_Edge):
     param_bounds = [(0, 1), (0, 1)]
 
     initial_guess = [0.5, 0.5]
@@ -436,19 +725,19 @@ def optimize_edge_edge(edge1: TopoDS_Edge, edge2: TopoDS_Edge, maximize=False):
         edge_edge_distance_squared,
         x0=initial_guess,
         bounds=param_bounds,
-        args=(epf1, epf2, maximize),
+        args=(epf1, epf2),
     )
 
     distance = math.sqrt(abs(result.fun))
     p1 = epf1(result.x[0])
     p2 = epf2(result.x[1])
 
-    print(result)
+    logger.debug("Edge-edge optimization %s", result)
 
     return p1, p2, distance
 
 
-def optimize_face_vertex(face: TopoDS_Face, vertex: TopoDS_Vertex, maximize=False):
+def optimize_face_vertex(face: TopoDS_Face, vertex: TopoDS_Vertex):
     face_vertex_distance_squared, p2 = face_vertex_distance_squared_factory(
         face, vertex
     )
@@ -462,17 +751,17 @@ def optimize_face_vertex(face: TopoDS_Face, vertex: TopoDS_Vertex, maximize=Fals
         face_vertex_distance_squared,
         x0=initial_guess,
         bounds=param_bounds,
-        args=(fpf, maximize),
+        args=(fpf,),
     )
 
     distance = math.sqrt(abs(result.fun))
-    print("result uv", result.x[0], result.x[1])
+    logger.debug("Face-vertex optimization uv %s %s", result.x[0], result.x[1])
     p1 = fpf(result.x[0], result.x[1])
 
     return p1, p2, distance
 
 
-def optimize_edge_vertex(edge: TopoDS_Edge, vertex: TopoDS_Vertex, maximize=False):
+def optimize_edge_vertex(edge: TopoDS_Edge, vertex: TopoDS_Vertex):
     edge_vertex_distance_squared, p2 = edge_vertex_distance_squared_factory(vertex)
     param_bounds = [(0, 1)]
 
@@ -484,7 +773,7 @@ def optimize_edge_vertex(edge: TopoDS_Edge, vertex: TopoDS_Vertex, maximize=Fals
         edge_vertex_distance_squared,
         x0=initial_guess,
         bounds=param_bounds,
-        args=(epf, maximize),
+        args=(epf,),
     )
 
     distance = math.sqrt(abs(result.fun))
@@ -494,7 +783,11 @@ def optimize_edge_vertex(edge: TopoDS_Edge, vertex: TopoDS_Vertex, maximize=Fals
 
 
 def optimization_result_to_measurement(
-    p1: gp_Pnt, p2: gp_Pnt, distance: float, maximize: bool
+    p1: gp_Pnt,
+    p2: gp_Pnt,
+    distance: float,
+    maximize: bool,
+    error: Optional[float] = None,
 ) -> Measurement:
     if distance == 0:
         return Measurement.blank()
@@ -508,7 +801,7 @@ def optimization_result_to_measurement(
 
     return Measurement(
         set(),
-        {measurement_k: distance},
+        {measurement_k: MeasuredValue(distance, error)},
         [ais_f(Geom_CartesianPoint(p1), Geom_CartesianPoint(p2))],
     )
 
@@ -517,4 +810,4 @@ if __name__ == "__main__":
     e1 = cq.Edge.makeLine((0, 0), (1, 0)).wrapped
     e2 = cq.Edge.makeLine((7, 2), (13, -5)).wrapped
 
-    optimize_edge_edge(e1, e2, maximize=False)
+    optimize_edge_edge(e1, e2)
@@ -0,0 +1,129 @@
+"""
+Memory accounting for displayed objects
+
+Rough numbers only: mesh sizes are estimated from the
+triangulation counts, not measured from the allocator.
+"""
+import os
+import resource
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+from OCP.AIS import AIS_Shape
+from OCP.BRep import BRep_Tool
+from OCP.TopAbs import TopAbs_EDGE, TopAbs_FACE, TopAbs_VERTEX
+from OCP.TopExp import TopExp
+from OCP.TopLoc import TopLoc_Location
+from OCP.TopoDS import TopoDS
+from OCP.TopTools import TopTools_IndexedMapOfShape
+
+if TYPE_CHECKING:
+    from cq_viewer.interface import DisplayObject
+
+# Per node: xyz doubles + normal floats, per triangle: three int indices
+NODE_BYTES = 3 * 8 + 3 * 4
+UV_NODE_BYTES = 2 * 8
+TRIANGLE_BYTES = 3 * 4
+
+
+@dataclass
+class DisplayObjectStats:
+    name: str
+    faces: int = 0
+    edges: int = 0
+    triangles: int = 0
+    nodes: int = 0
+    mesh_bytes: int = 0
+    sensitive_entities: int = 0
+    history_objects: int = 0
+    conversion_time: Optional[float] = None
+
+
+def process_rss() -> int:
+    """Resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Peak instead of current, but better than nothing
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def format_bytes(n: int) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(n) < 1024:
+            return f"{n:.0f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GiB"
+
+
+def count_sub_shapes(shape, shape_type) -> int:
+    shape_map = TopTools_IndexedMapOfShape()
+    TopExp.MapShapes_s(shape, shape_type, shape_map)
+    return shape_map.Extent()
+
+
+def count_triangulation(shape) -> tuple[int, int, int]:
+    """Return (nodes, triangles, estimated bytes) of the existing triangulation"""
+    nodes = 0
+    triangles = 0
+    mesh_bytes = 0
+    face_map = TopTools_IndexedMapOfShape()
+    TopExp.MapShapes_s(shape, TopAbs_FACE, face_map)
+    for i in range(1, face_map.Extent() + 1):
+        face = TopoDS.Face_s(face_map.FindKey(i))
+        triangulation = BRep_Tool.Triangulation_s(face, TopLoc_Location())
+        if triangulation is None:
+            continue
+        nb_nodes = triangulation.NbNodes()
+        nb_triangles = triangulation.NbTriangles()
+        nodes += nb_nodes
+        triangles += nb_triangles
+        mesh_bytes += nb_nodes * NODE_BYTES + nb_triangles * TRIANGLE_BYTES
+        if triangulation.HasUVNodes():
+            mesh_bytes += nb_nodes * UV_NODE_BYTES
+    return nodes, triangles, mesh_bytes
+
+
+def count_sensitive_entities(ais_shape: AIS_Shape) -> int:
+    count = 0
+    for shape_type in (TopAbs_VERTEX, TopAbs_EDGE, TopAbs_FACE):
+        mode = AIS_Shape.SelectionMode_s(shape_type)
+        if ais_shape.HasSelection(mode):
+            count += ais_shape.Selection(mode).Entities().Size()
+    return count
+
+
+def count_history_objects(dp_obj: "DisplayObject") -> int:
+    if wp_history := getattr(dp_obj, "wp_history", None):
+        return len(wp_history)
+
+    # build123d builders keep their child builders alive
+    count = 0
+    builders = list(getattr(dp_obj.obj, "builder_children", []))
+    while builders:
+        builder = builders.pop()
+        count += 1
+        builders.extend(getattr(builder, "builder_children", []))
+    return count
+
+
+def display_object_stats(dp_obj: "DisplayObject") -> DisplayObjectStats:
+    stats = DisplayObjectStats(
+        name=dp_obj.name, history_objects=count_history_objects(dp_obj)
+    )
+    ais_objects = dp_obj.ais_objects
+    stats.conversion_time = dp_obj.conversion_time
+    for ais_object in ais_objects:
+        if not isinstance(ais_object, AIS_Shape):
+            continue
+        shape = ais_object.Shape()
+        stats.faces += count_sub_shapes(shape, TopAbs_FACE)
+        stats.edges += count_sub_shapes(shape, TopAbs_EDGE)
+        nodes, triangles, mesh_bytes = count_triangulation(shape)
+        stats.nodes += nodes
+        stats.triangles += triangles
+        stats.mesh_bytes += mesh_bytes
+        stats.sensitive_entities += count_sensitive_entities(ais_object)
+    return stats
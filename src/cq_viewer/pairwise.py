@@ -0,0 +1,125 @@
+"""
+Pairwise minimum distances between N shapes
+
+The algorithms ask a lookup for the distance of a pair, which lets the
+caller serve memoized results and compute missing ones in the background.
+"""
+from typing import Callable, Optional
+
+from OCP.Bnd import Bnd_Box
+from OCP.BRepBndLib import BRepBndLib
+from OCP.BRepExtrema import BRepExtrema_DistShapeShape
+from OCP.gp import gp_Pnt
+from OCP.TopoDS import TopoDS_Shape
+
+# Above this only the nearest neighbours of each shape are computed
+FULL_MATRIX_LIMIT = 12
+
+DistanceResult = tuple[gp_Pnt, gp_Pnt, float]
+
+
+def bounding_box(shape: TopoDS_Shape) -> Bnd_Box:
+    box = Bnd_Box()
+    BRepBndLib.Add_s(shape, box, True)
+    return box
+
+
+def min_distance(
+    shape1: TopoDS_Shape, shape2: TopoDS_Shape
+) -> Optional[DistanceResult]:
+    dist = BRepExtrema_DistShapeShape(shape1, shape2)
+    if not dist.IsDone() or dist.NbSolution() == 0:
+        return None
+    return dist.PointOnShape1(1), dist.PointOnShape2(1), dist.Value()
+
+
+# Returned by a lookup whose distance is still being computed
+PENDING = object()
+
+# (i, j) -> the distance of the shapes, None if it failed, or PENDING
+DistanceLookup = Callable[[int, int], object]
+Distances = dict[tuple[int, int], DistanceResult]
+
+
+def all_pairs(shape_count: int, lookup: DistanceLookup) -> tuple[Distances, bool]:
+    """Distances that are known and whether every pair is known"""
+    distances = {}
+    complete = True
+    for i in range(shape_count):
+        for j in range(i + 1, shape_count):
+            result = lookup(i, j)
+            if result is PENDING:
+                complete = False
+            elif result is not None:
+                distances[(i, j)] = result
+    return distances, complete
+
+
+def nearest_neighbours(
+    shapes: list[TopoDS_Shape], lookup: DistanceLookup
+) -> tuple[Distances, bool]:
+    """
+    Exact distance only for the pairs that can still beat the best
+    distance found so far, the bounding box distance is a lower bound.
+    A pending pair stops the search of that shape, the bound is not
+    known past it.
+    """
+    boxes = [bounding_box(shape) for shape in shapes]
+    known: dict[tuple[int, int], object] = {}
+    complete = True
+    for i in range(len(shapes)):
+        candidates = sorted(
+            (boxes[i].Distance(boxes[j]), j) for j in range(len(shapes)) if j != i
+        )
+        best: Optional[float] = None
+        for lower_bound, j in candidates:
+            if best is not None and lower_bound > best:
+                break
+            pair = (min(i, j), max(i, j))
+            if pair not in known:
+                known[pair] = lookup(*pair)
+            result = known[pair]
+            if result is PENDING:
+                complete = False
+                break
+            if result is not None and (best is None or result[2] < best):
+                best = result[2]
+
+    distances = {
+        pair: result
+        for pair, result in known.items()
+        if result is not None and result is not PENDING
+    }
+    return distances, complete
+
+
+def closest_pairs(
+    distances: dict[tuple[int, int], DistanceResult], shape_count: int
+) -> set[tuple[int, int]]:
+    """The pair to the nearest neighbour of each shape"""
+    closest = set()
+    for i in range(shape_count):
+        own = [
+            (result[2], pair) for pair, result in distances.items() if i in pair
+        ]
+        if own:
+            closest.add(min(own)[1])
+    return closest
+
+
+def distance_table(
+    distances: dict[tuple[int, int], DistanceResult], shape_count: int
+) -> list[list[str]]:
+    header = [""] + [str(i + 1) for i in range(shape_count)]
+    rows = [header]
+    for i in range(shape_count):
+        row = [str(i + 1)]
+        for j in range(shape_count):
+            if i == j:
+                row.append("-")
+            elif result := distances.get((min(i, j), max(i, j))):
+                row.append(f"{result[2]:.4g}")
+            else:
+                row.append("")
+        rows.append(row)
+    return rows
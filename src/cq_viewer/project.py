@@ -0,0 +1,217 @@
+"""
+Project mode: several model files shown together
+
+Each file is executed in its own worker process and its objects come
+back as binary BRep with their display options. Object names are
+prefixed with the file name. When a file changes, only that file and
+the project files that import it, directly or through other local
+modules, are executed again.
+"""
+import ast
+import logging
+import pathlib
+import traceback
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Sequence
+
+from cq_viewer.export import collect_export_items
+from cq_viewer.interface import DisplayObject, exec_file, execution_context
+from cq_viewer.ipc import bytes_to_shape, shape_to_bytes
+from cq_viewer.mass_properties import (
+    compute_mass_properties,
+    mass_properties_measurements,
+)
+from cq_viewer.snapshot import SnapshotItem, snapshot_item_options
+from cq_viewer.util import quantity_to_tuple
+from cq_viewer.workers import process_executor
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FileResult:
+    file_path: pathlib.Path
+    items: list[tuple[SnapshotItem, bytes]]
+    config: dict
+    error: Optional[str] = None
+    # Chosen mass property measurements over all objects of the file
+    measurements: dict[str, str | float] = field(default_factory=dict)
+
+
+def execute_file(
+    file_path: pathlib.Path,
+    parameters: Optional[dict] = None,
+    measurements: Sequence[str] = (),
+) -> FileResult:
+    """
+    Runs in a worker process that is reused between files.
+    parameters are returned by param() during the execution.
+    """
+    execution_context.reset()
+    execution_context.config = {}
+    execution_context.parameters = parameters or {}
+    try:
+        exec_file(str(file_path))
+        export_items = collect_export_items(execution_context.display_objects)
+        items = [
+            (
+                SnapshotItem(
+                    item.name,
+                    quantity_to_tuple(item.color) if item.color else None,
+                    item.transparency,
+                ),
+                shape_to_bytes(item.shape),
+            )
+            for item in export_items
+        ]
+        measured = {}
+        if measurements:
+            all_measurements = mass_properties_measurements(
+                [compute_mass_properties(item.shape) for item in export_items]
+            )
+            measured = {
+                name: all_measurements[name]
+                for name in measurements
+                if name in all_measurements
+            }
+    except Exception:
+        return FileResult(file_path, [], {}, traceback.format_exc())
+    finally:
+        execution_context.parameters = {}
+    return FileResult(file_path, items, execution_context.config, None, measured)
+
+
+def local_imports(file_path: pathlib.Path) -> set[pathlib.Path]:
+    """
+    Modules next to the file that it imports, exec_file puts
+    the directory of the file on sys.path
+    """
+    directory = file_path.parent
+    try:
+        tree = ast.parse(file_path.read_text(), str(file_path))
+    except (OSError, SyntaxError):
+        return set()
+
+    module_names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            module_names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            module_names.add(node.module)
+            # from package import module
+            module_names.update(f"{node.module}.{alias.name}" for alias in node.names)
+
+    imports = set()
+    for module_name in module_names:
+        base = directory.joinpath(*module_name.split("."))
+        for candidate in (base.with_suffix(".py"), base / "__init__.py"):
+            if candidate.is_file():
+                imports.add(candidate.resolve())
+    return imports
+
+
+class Project:
+    def __init__(self, file_paths: list[pathlib.Path]):
+        self.file_paths = [file_path.resolve() for file_path in file_paths]
+        self.display_objects: dict[pathlib.Path, list[DisplayObject]] = {}
+        self.errors: dict[pathlib.Path, str] = {}
+        self.configs: dict[pathlib.Path, dict] = {}
+        self.import_graph: dict[pathlib.Path, set[pathlib.Path]] = {}
+        self.update_import_graph()
+
+    def update_import_graph(self):
+        """Transitive local imports of every project file"""
+        direct: dict[pathlib.Path, set[pathlib.Path]] = {}
+        pending = list(self.file_paths)
+        while pending:
+            file_path = pending.pop()
+            if file_path in direct:
+                continue
+            direct[file_path] = local_imports(file_path)
+            pending.extend(direct[file_path])
+
+        self.import_graph = {}
+        for file_path in self.file_paths:
+            seen = set()
+            stack = list(direct[file_path])
+            while stack:
+                dependency = stack.pop()
+                if dependency not in seen:
+                    seen.add(dependency)
+                    stack.extend(direct.get(dependency, ()))
+            self.import_graph[file_path] = seen
+
+    @property
+    def watched_paths(self) -> set[pathlib.Path]:
+        paths = set(self.file_paths)
+        for dependencies in self.import_graph.values():
+            paths |= dependencies
+        return paths
+
+    def affected(self, changed: set[pathlib.Path]) -> list[pathlib.Path]:
+        changed = {file_path.resolve() for file_path in changed}
+        return [
+            file_path
+            for file_path in self.file_paths
+            if file_path in changed or self.import_graph[file_path] & changed
+        ]
+
+    def namespace(self, file_path: pathlib.Path) -> str:
+        return file_path.stem
+
+    def execute(
+        self,
+        file_paths: list[pathlib.Path],
+        on_result: Callable[[FileResult], None],
+    ):
+        """
+        Submit the files to the process pool, on_result is called
+        from a pool thread once per file
+        """
+        for file_path in file_paths:
+            logger.info("Executing %s in a worker", file_path)
+            future = process_executor().submit(execute_file, file_path)
+
+            def done(future: Future, file_path=file_path):
+                if exception := future.exception():
+                    on_result(FileResult(file_path, [], {}, str(exception)))
+                else:
+                    on_result(future.result())
+
+            future.add_done_callback(done)
+
+    def apply_result(self, result: FileResult):
+        """Replace the objects of one file, UI thread"""
+        if result.error:
+            logger.warning("%s failed:\n%s", result.file_path, result.error)
+            self.errors[result.file_path] = result.error
+            # Keep showing the last good result
+            return
+        self.errors.pop(result.file_path, None)
+        self.configs[result.file_path] = result.config
+        namespace = self.namespace(result.file_path)
+        self.display_objects[result.file_path] = [
+            DisplayObject(
+                execution_context,
+                bytes_to_shape(data),
+                f"{namespace}/{item.name}",
+                **snapshot_item_options(item),
+            )
+            for item, data in result.items
+        ]
+
+    @property
+    def config(self) -> dict:
+        """setup() of the first file that has run decides the scene settings"""
+        for file_path in self.file_paths:
+            if file_path in self.configs:
+                return self.configs[file_path]
+        return {}
+
+    def merged_display_objects(self) -> list[DisplayObject]:
+        return [
+            dp_obj
+            for file_path in self.file_paths
+            for dp_obj in self.display_objects.get(file_path, [])
+        ]
@@ -0,0 +1,27 @@
+import dataclasses
+from dataclasses import dataclass
+from typing import Optional
+
+# Full quality is restored after this long without drag or zoom events
+IDLE_DELAY_MS = 200
+
+
+@dataclass(frozen=True)
+class RenderQuality:
+    msaa_samples: int = 8
+    face_boundaries: bool = True
+    transparency: bool = True
+
+    @classmethod
+    def from_config(
+        cls, config: Optional[dict], default: "RenderQuality"
+    ) -> "RenderQuality":
+        if not config:
+            return default
+        return dataclasses.replace(default, **config)
+
+
+FULL_QUALITY = RenderQuality()
+INTERACTION_QUALITY = RenderQuality(
+    msaa_samples=0, face_boundaries=False, transparency=False
+)
@@ -0,0 +1,197 @@
+"""
+Recording and replay of interaction sessions
+
+A session is a JSON lines file: a header with the model file, its hash,
+the canvas size and the camera, then one line per pointer or key event
+with the seconds since the first event. Replaying feeds the events to
+the same canvas and frame methods that the wx handlers call and times
+each of them, so two builds can be compared on the same session.
+"""
+import dataclasses
+import hashlib
+import json
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Optional, TextIO
+
+from cq_viewer.snapshot import CameraState
+from cq_viewer.tracing import percentile
+
+logger = logging.getLogger(__name__)
+
+SESSION_VERSION = 1
+# How often a real time replay lets the event loop run while waiting
+REALTIME_POLL = 0.005
+
+
+def file_hash(file_path: str) -> str:
+    with open(file_path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+@dataclass
+class SessionEvent:
+    t: float
+    kind: str
+    args: dict
+
+
+@dataclass
+class Session:
+    model: Optional[str]
+    model_hash: Optional[str]
+    size: tuple[int, int]
+    camera: Optional[CameraState]
+    events: list[SessionEvent]
+
+    @classmethod
+    def read(cls, file_path: str) -> "Session":
+        with open(file_path) as f:
+            header = json.loads(f.readline())
+            if header.get("version") != SESSION_VERSION:
+                raise ValueError(f"Unsupported session version {header.get('version')}")
+            events = [SessionEvent(**json.loads(line)) for line in f if line.strip()]
+        camera = header.get("camera")
+        return cls(
+            header.get("model"),
+            header.get("model_hash"),
+            tuple(header["size"]),
+            CameraState(**camera) if camera else None,
+            events,
+        )
+
+    def mismatches(self, model: Optional[str], size: tuple[int, int]) -> list[str]:
+        """Differences that make the replay hit different things"""
+        problems = []
+        if self.model_hash and model and file_hash(model) != self.model_hash:
+            problems.append(f"{model} has changed since the recording")
+        if tuple(size) != self.size:
+            problems.append(f"canvas is {size}, recorded at {self.size}")
+        return problems
+
+
+class SessionRecorder:
+    """The header is written with the first event"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.file: Optional[TextIO] = None
+        self.start = 0.0
+
+    @property
+    def started(self) -> bool:
+        return self.file is not None
+
+    def begin(self, model: Optional[str], size: tuple[int, int], camera: CameraState):
+        self.file = open(self.file_path, "w")
+        header = {
+            "version": SESSION_VERSION,
+            "model": model,
+            "model_hash": file_hash(model) if model else None,
+            "size": list(size),
+            "camera": dataclasses.asdict(camera),
+        }
+        self.file.write(json.dumps(header) + "\n")
+        self.start = time.perf_counter()
+        logger.info("Recording session to %s", self.file_path)
+
+    def record(self, kind: str, **args):
+        t = time.perf_counter() - self.start
+        self.file.write(json.dumps({"t": round(t, 6), "kind": kind, "args": args}))
+        self.file.write("\n")
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+@dataclass
+class ReplayReport:
+    latencies: dict[str, list[float]]
+    skipped: int = 0
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        return {
+            kind: {
+                "count": len(values),
+                "p50": percentile(values, 50),
+                "p90": percentile(values, 90),
+                "p99": percentile(values, 99),
+                "max": max(values),
+            }
+            for kind, values in self.latencies.items()
+        }
+
+    def format_summary(self) -> str:
+        lines = [
+            f"{'event':<16}{'count':>8}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}"
+        ]
+        for kind, stats in sorted(self.summary().items()):
+            lines.append(
+                f"{kind:<16}{stats['count']:>8}"
+                + "".join(
+                    f"{stats[k] * 1000:>8.2f}ms" for k in ("p50", "p90", "p99", "max")
+                )
+            )
+        if self.skipped:
+            lines.append(f"{self.skipped} events without a handler were skipped")
+        return "\n".join(lines)
+
+
+class Replayer:
+    """
+    Pointer events go to the canvas method of the same name, key events
+    to key_down. Latency is the time spent in the handler.
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        canvas,
+        key_down: Optional[Callable[[int], None]] = None,
+    ):
+        self.session = session
+        self.canvas = canvas
+        self.key_down = key_down
+
+    def handle(self, event: SessionEvent, report: ReplayReport):
+        if event.kind == "key":
+            handler = self.key_down
+        else:
+            handler = getattr(self.canvas, event.kind, None)
+        if handler is None:
+            report.skipped += 1
+            return
+        start = time.perf_counter()
+        handler(**event.args)
+        report.latencies[event.kind].append(time.perf_counter() - start)
+
+    def run(
+        self,
+        realtime: bool = False,
+        between: Optional[Callable[[], None]] = None,
+    ) -> ReplayReport:
+        """
+        between runs after every event and while waiting in real time,
+        it should let deferred work such as wx.CallAfter calls run
+        """
+        if self.session.camera:
+            self.session.camera.apply(self.canvas.view.Camera())
+            self.canvas.view.Redraw()
+
+        report = ReplayReport(defaultdict(list))
+        start = time.perf_counter()
+        for event in self.session.events:
+            if realtime:
+                while (delay := start + event.t - time.perf_counter()) > 0:
+                    if between:
+                        between()
+                    time.sleep(min(delay, REALTIME_POLL))
+            self.handle(event, report)
+            if between:
+                between()
+        report.latencies = dict(report.latencies)
+        return report
@@ -0,0 +1,149 @@
+"""
+Indexed sub-shapes of displayed objects
+
+Each AIS shape of a display object gets lazily built indexed maps of its
+solids, faces, edges and vertices. A selected sub-shape is remembered as
+a SubShapeRef (object name, AIS object, type, map index) together with a
+geometric signature, which lets a selection be found again after the file
+has been executed anew and every TopoDS object has been replaced.
+"""
+from dataclasses import dataclass
+from typing import Hashable, Optional
+
+from OCP.AIS import AIS_Shape
+from OCP.BRep import BRep_Tool
+from OCP.BRepAdaptor import BRepAdaptor_Curve, BRepAdaptor_Surface
+from OCP.BRepGProp import BRepGProp
+from OCP.GProp import GProp_GProps
+from OCP.SelectMgr import SelectMgr_EntityOwner
+from OCP.StdSelect import StdSelect_BRepOwner
+from OCP.TopAbs import TopAbs_EDGE, TopAbs_FACE, TopAbs_ShapeEnum, TopAbs_VERTEX
+from OCP.TopExp import TopExp
+from OCP.TopoDS import TopoDS, TopoDS_Shape
+from OCP.TopTools import TopTools_IndexedMapOfShape
+
+SIGNATURE_DIGITS = 6
+
+
+class ShapeIndex:
+    def __init__(self, shape: TopoDS_Shape):
+        self.shape = shape
+        self._maps: dict[TopAbs_ShapeEnum, TopTools_IndexedMapOfShape] = {}
+
+    def map(self, shape_type: TopAbs_ShapeEnum) -> TopTools_IndexedMapOfShape:
+        if (shape_map := self._maps.get(shape_type)) is None:
+            shape_map = TopTools_IndexedMapOfShape()
+            TopExp.MapShapes_s(self.shape, shape_type, shape_map)
+            self._maps[shape_type] = shape_map
+        return shape_map
+
+    def find(self, sub_shape: TopoDS_Shape) -> int:
+        """1-based index of the sub-shape regardless of orientation, 0 if absent"""
+        return self.map(sub_shape.ShapeType()).FindIndex(sub_shape)
+
+    def sub_shape(
+        self, shape_type: TopAbs_ShapeEnum, index: int
+    ) -> Optional[TopoDS_Shape]:
+        shape_map = self.map(shape_type)
+        if 1 <= index <= shape_map.Extent():
+            return shape_map.FindKey(index)
+        return None
+
+    def sub_shapes(self, shape_type: TopAbs_ShapeEnum) -> list[TopoDS_Shape]:
+        shape_map = self.map(shape_type)
+        return [shape_map.FindKey(i) for i in range(1, shape_map.Extent() + 1)]
+
+
+def signature(shape: TopoDS_Shape) -> tuple[Hashable, ...]:
+    """
+    Geometry kind, size and centre rounded so that an unchanged
+    sub-shape gets the same signature after re-execution
+    """
+    shape_type = shape.ShapeType()
+    if shape_type == TopAbs_VERTEX:
+        point = BRep_Tool.Pnt_s(TopoDS.Vertex_s(shape))
+        kind, mass, centre = None, 0.0, point
+    else:
+        props = GProp_GProps()
+        if shape_type == TopAbs_EDGE:
+            BRepGProp.LinearProperties_s(shape, props)
+            kind = BRepAdaptor_Curve(TopoDS.Edge_s(shape)).GetType()
+        elif shape_type == TopAbs_FACE:
+            BRepGProp.SurfaceProperties_s(shape, props)
+            kind = BRepAdaptor_Surface(TopoDS.Face_s(shape)).GetType()
+        else:
+            BRepGProp.VolumeProperties_s(shape, props)
+            kind = None
+        mass, centre = props.Mass(), props.CentreOfMass()
+
+    return (
+        shape_type,
+        kind,
+        round(mass, SIGNATURE_DIGITS),
+        round(centre.X(), SIGNATURE_DIGITS),
+        round(centre.Y(), SIGNATURE_DIGITS),
+        round(centre.Z(), SIGNATURE_DIGITS),
+    )
+
+
+@dataclass(frozen=True)
+class SubShapeRef:
+    object_name: str
+    ais_index: int
+    shape_type: TopAbs_ShapeEnum
+    index: int
+    signature: tuple[Hashable, ...]
+
+
+def locate(display_objects, shape: TopoDS_Shape) -> Optional[SubShapeRef]:
+    for dp_obj in display_objects:
+        for ais_index, shape_index in enumerate(dp_obj.shape_indexes):
+            if shape_index and (index := shape_index.find(shape)):
+                return SubShapeRef(
+                    dp_obj.name, ais_index, shape.ShapeType(), index, signature(shape)
+                )
+    return None
+
+
+def resolve(
+    display_objects, ref: SubShapeRef
+) -> Optional[tuple[AIS_Shape, TopoDS_Shape]]:
+    """
+    Find the sub-shape a reference points to in new display objects.
+
+    The same index with the same signature is the common case. Failing
+    that an identical signature elsewhere in the object means that the
+    topology was renumbered. A sub-shape whose signature changed is not
+    restored, guessing would move the selection onto another shape.
+    """
+    dp_obj = next((d for d in display_objects if d.name == ref.object_name), None)
+    if dp_obj is None or ref.ais_index >= len(dp_obj.shape_indexes):
+        return None
+    ais_shape = dp_obj.ais_objects[ref.ais_index]
+    shape_index = dp_obj.shape_indexes[ref.ais_index]
+    if shape_index is None:
+        return None
+
+    candidate = shape_index.sub_shape(ref.shape_type, ref.index)
+    if candidate and signature(candidate) == ref.signature:
+        return ais_shape, candidate
+
+    for sub_shape in shape_index.sub_shapes(ref.shape_type):
+        if signature(sub_shape) == ref.signature:
+            return ais_shape, sub_shape
+    return None
+
+
+def find_owner(
+    ais_shape: AIS_Shape, sub_shape: TopoDS_Shape
+) -> Optional[SelectMgr_EntityOwner]:
+    """The owner of the sub-shape in an activated selection mode of the shape"""
+    selection = ais_shape.Selection(AIS_Shape.SelectionMode_s(sub_shape.ShapeType()))
+    if selection is None:
+        return None
+    entities = selection.Entities()
+    for i in range(entities.Size()):
+        owner = entities.Value(i).BaseSensitive().OwnerId()
+        if isinstance(owner, StdSelect_BRepOwner) and owner.Shape().IsSame(sub_shape):
+            return owner
+    return None
@@ -0,0 +1,123 @@
+"""
+Binary BRep in shared memory
+
+Shapes go to the process pool and come back from it as binary BRep in a
+SharedMemory block, only the name of the block is pickled. BinTools
+writes and parses the block in C++, nodes, normals and triangles of the
+triangulations included, so no Python loop touches a mesh on the way.
+
+A block lives until release() unlinks it, which is up to whoever
+received the SharedBRep last. Spawned workers share the resource tracker
+of the viewer, blocks that are never released are unlinked on exit.
+"""
+import io
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+
+from OCP.BinTools import BinTools, BinTools_FormatVersion_CURRENT
+from OCP.TopoDS import TopoDS_Shape
+
+logger = logging.getLogger(__name__)
+
+SHAPE_CACHE_SIZE = 16
+
+_shape_cache: OrderedDict[str, TopoDS_Shape] = OrderedDict()
+
+
+@dataclass(frozen=True)
+class SharedBRep:
+    name: str
+    size: int
+
+
+class BufferReader(io.RawIOBase):
+    """Lets BinTools read a buffer without copying all of it first"""
+
+    def __init__(self, buffer):
+        self.view = memoryview(buffer)
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += len(self.view)
+        self.position = min(max(offset, 0), len(self.view))
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        count = min(len(buffer), len(self.view) - self.position)
+        buffer[:count] = self.view[self.position : self.position + count]
+        self.position += count
+        return count
+
+    def close(self):
+        # SharedMemory.close() fails while views of its buffer exist
+        self.view.release()
+        super().close()
+
+
+def share_shape(shape: TopoDS_Shape, triangulation: bool = False) -> SharedBRep:
+    """Triangulations are only written with triangulation, normals included"""
+    stream = io.BytesIO()
+    BinTools.Write_s(
+        shape, stream, triangulation, triangulation, BinTools_FormatVersion_CURRENT
+    )
+    size = stream.tell()
+    shm = SharedMemory(create=True, size=max(size, 1))
+    try:
+        with stream.getbuffer() as data:
+            shm.buf[:size] = data
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    shm.close()
+    return SharedBRep(shm.name, size)
+
+
+def read_shape(shared: SharedBRep) -> TopoDS_Shape:
+    shm = SharedMemory(shared.name)
+    try:
+        shape = TopoDS_Shape()
+        with shm.buf[: shared.size] as view, BufferReader(view) as reader:
+            BinTools.Read_s(shape, reader)
+        return shape
+    finally:
+        shm.close()
+
+
+def cached_shape(shared: SharedBRep) -> TopoDS_Shape:
+    """
+    For tasks in worker processes that get the same shapes over and over,
+    each worker reads a block once. Block names are not reused.
+    """
+    shape = _shape_cache.get(shared.name)
+    if shape is None:
+        shape = _shape_cache[shared.name] = read_shape(shared)
+        while len(_shape_cache) > SHAPE_CACHE_SIZE:
+            _shape_cache.popitem(last=False)
+    else:
+        _shape_cache.move_to_end(shared.name)
+    return shape
+
+
+def release(shared: SharedBRep):
+    try:
+        shm = SharedMemory(shared.name)
+    except FileNotFoundError:
+        logger.debug("Shared BRep %s is already released", shared.name)
+        return
+    shm.close()
+    shm.unlink()
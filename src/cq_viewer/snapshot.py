@@ -0,0 +1,164 @@
+"""
+Display snapshots for instant reopen
+
+After a successful display the shown shapes are written as a single
+binary BRep (including their triangulation) next to a small JSON file
+holding names, colors and the camera. On startup the snapshot is
+memory-mapped and displayed before the model file is executed.
+
+The JSON file holds the hash of the BRep it belongs to, a snapshot whose
+files come from different writes is ignored.
+"""
+import hashlib
+import io
+import json
+import logging
+import mmap
+import os
+import tempfile
+import threading
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from OCP.BinTools import BinTools
+from OCP.gp import gp_Dir, gp_Pnt
+from OCP.Graphic3d import Graphic3d_Camera
+from OCP.Quantity import Quantity_Color, Quantity_TOC_RGB
+from OCP.TopoDS import TopoDS_Iterator, TopoDS_Shape
+
+from cq_viewer.export import ExportItem
+from cq_viewer.interface import make_compound
+from cq_viewer.util import quantity_to_tuple
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 2
+
+# Saves are submitted after every display and may overlap
+_write_lock = threading.Lock()
+
+
+@dataclass
+class CameraState:
+    eye: tuple[float, float, float]
+    center: tuple[float, float, float]
+    up: tuple[float, float, float]
+    scale: float
+    orthographic: bool
+
+    @classmethod
+    def from_camera(cls, camera: Graphic3d_Camera) -> "CameraState":
+        eye = camera.Eye()
+        center = camera.Center()
+        up = camera.Up()
+        return cls(
+            eye=(eye.X(), eye.Y(), eye.Z()),
+            center=(center.X(), center.Y(), center.Z()),
+            up=(up.X(), up.Y(), up.Z()),
+            scale=camera.Scale(),
+            orthographic=camera.ProjectionType()
+            == Graphic3d_Camera.Projection_Orthographic,
+        )
+
+    def apply(self, camera: Graphic3d_Camera):
+        camera.SetProjectionType(
+            Graphic3d_Camera.Projection_Orthographic
+            if self.orthographic
+            else Graphic3d_Camera.Projection_Perspective
+        )
+        camera.SetEye(gp_Pnt(*self.eye))
+        camera.SetCenter(gp_Pnt(*self.center))
+        camera.SetUp(gp_Dir(*self.up))
+        camera.SetScale(self.scale)
+
+
+@dataclass
+class SnapshotItem:
+    name: str
+    color: Optional[tuple[float, float, float]]
+    transparency: Optional[float]
+
+
+class Snapshot:
+    def __init__(self, snapshot_dir: str, file_path: str):
+        key = hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()
+        self.brep_path = os.path.join(snapshot_dir, f"{key}.bin")
+        self.meta_path = os.path.join(snapshot_dir, f"{key}.json")
+
+    def write(self, items: list[ExportItem], camera: CameraState):
+        """
+        Replace the snapshot atomically, safe to call from a worker thread
+        """
+        stream = io.BytesIO()
+        BinTools.Write_s(make_compound([item.shape for item in items]), stream)
+        brep = stream.getvalue()
+        meta = {
+            "version": SNAPSHOT_VERSION,
+            "brep_hash": hashlib.sha1(brep).hexdigest(),
+            "camera": asdict(camera),
+            "items": [
+                asdict(
+                    SnapshotItem(
+                        name=item.name,
+                        color=quantity_to_tuple(item.color) if item.color else None,
+                        transparency=item.transparency,
+                    )
+                )
+                for item in items
+            ],
+        }
+        snapshot_dir = os.path.dirname(self.brep_path)
+        os.makedirs(snapshot_dir, exist_ok=True)
+        with _write_lock:
+            with tempfile.NamedTemporaryFile(
+                "wb", dir=snapshot_dir, suffix=".tmp", delete=False
+            ) as f:
+                f.write(brep)
+            os.replace(f.name, self.brep_path)
+            with tempfile.NamedTemporaryFile(
+                "w", dir=snapshot_dir, suffix=".tmp", delete=False
+            ) as f:
+                json.dump(meta, f)
+            os.replace(f.name, self.meta_path)
+
+    def read(
+        self,
+    ) -> Optional[tuple[list[tuple[SnapshotItem, TopoDS_Shape]], CameraState]]:
+        try:
+            with open(self.meta_path, "r") as f:
+                meta = json.load(f)
+            if meta.get("version") != SNAPSHOT_VERSION:
+                return None
+
+            compound = TopoDS_Shape()
+            with open(self.brep_path, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    if hashlib.sha1(mapped).hexdigest() != meta.get("brep_hash"):
+                        logger.warning("Snapshot is inconsistent, ignoring it")
+                        return None
+                    BinTools.Read_s(compound, mapped)
+        except (OSError, ValueError) as ex:
+            logger.debug("No usable snapshot: %s", ex)
+            return None
+
+        shapes = []
+        iterator = TopoDS_Iterator(compound)
+        while iterator.More():
+            shapes.append(iterator.Value())
+            iterator.Next()
+
+        items = [SnapshotItem(**item) for item in meta["items"]]
+        if len(items) != len(shapes):
+            logger.warning("Snapshot is inconsistent, ignoring it")
+            return None
+
+        return list(zip(items, shapes)), CameraState(**meta["camera"])
+
+
+def snapshot_item_options(item: SnapshotItem) -> dict:
+    options = {}
+    if item.color is not None:
+        options["color"] = Quantity_Color(*item.color, Quantity_TOC_RGB)
+    if item.transparency is not None:
+        options["transparency"] = item.transparency
+    return options
@@ -0,0 +1,135 @@
+"""
+Parameter sweeps
+
+Every combination of the parameters declared with setup(parameters=...)
+is executed in the process pool. Results are kept per file content and
+parameter values, so sweeping an unchanged file again is instant and
+flipping between variants only displays already converted objects.
+"""
+import hashlib
+import itertools
+import logging
+import pathlib
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Optional, Sequence
+
+from cq_viewer.interface import DisplayObject, execution_context
+from cq_viewer.ipc import bytes_to_shape
+from cq_viewer.project import FileResult, execute_file
+from cq_viewer.snapshot import snapshot_item_options
+from cq_viewer.workers import process_executor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEASUREMENTS = ("volume", "surface_area", "obb")
+RESULT_CACHE_SIZE = 256
+
+# (source hash, variant key, measurements) -> result, UI thread only
+_result_cache: OrderedDict[tuple, FileResult] = OrderedDict()
+
+
+def variants(parameters: dict[str, Sequence]) -> list[dict]:
+    names = list(parameters)
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*(parameters[name] for name in names))
+    ]
+
+
+def variant_label(variant: dict) -> str:
+    return ", ".join(f"{name}={value}" for name, value in variant.items())
+
+
+def variant_key(variant: dict) -> tuple:
+    return tuple((name, repr(value)) for name, value in sorted(variant.items()))
+
+
+class Sweep:
+    def __init__(
+        self,
+        file_path: pathlib.Path,
+        parameters: dict[str, Sequence],
+        measurements: Optional[Sequence[str]] = None,
+    ):
+        self.file_path = file_path
+        self.parameter_names = list(parameters)
+        self.variants = variants(parameters)
+        self.measurements = tuple(measurements or DEFAULT_MEASUREMENTS)
+        self.source_hash = hashlib.sha1(file_path.read_bytes()).hexdigest()
+        self.results: dict[int, FileResult] = {}
+        self.current = 0
+        self._display_objects: dict[int, list[DisplayObject]] = {}
+
+    def cache_key(self, index: int) -> tuple:
+        return self.source_hash, variant_key(self.variants[index]), self.measurements
+
+    def run(self, on_result: Callable[[int, FileResult], None]):
+        """
+        Cached variants are reported right away, the rest from
+        pool threads as they finish
+        """
+        for index, variant in enumerate(self.variants):
+            if cached := _result_cache.get(self.cache_key(index)):
+                on_result(index, cached)
+                continue
+
+            future = process_executor().submit(
+                execute_file, self.file_path, variant, self.measurements
+            )
+
+            def done(future: Future, index=index):
+                if exception := future.exception():
+                    on_result(index, FileResult(self.file_path, [], {}, str(exception)))
+                else:
+                    on_result(index, future.result())
+
+            future.add_done_callback(done)
+
+    def apply_result(self, index: int, result: FileResult):
+        """UI thread"""
+        self.results[index] = result
+        if not result.error:
+            key = self.cache_key(index)
+            _result_cache[key] = result
+            _result_cache.move_to_end(key)
+            while len(_result_cache) > RESULT_CACHE_SIZE:
+                _result_cache.popitem(last=False)
+
+    @property
+    def done(self) -> int:
+        return len(self.results)
+
+    def display_objects(self, index: int) -> Optional[list[DisplayObject]]:
+        result = self.results.get(index)
+        if result is None or result.error:
+            return None
+        if index not in self._display_objects:
+            self._display_objects[index] = [
+                DisplayObject(
+                    execution_context,
+                    bytes_to_shape(data),
+                    item.name,
+                    **snapshot_item_options(item),
+                )
+                for item, data in result.items
+            ]
+        return self._display_objects[index]
+
+    def table(self) -> list[list[str]]:
+        """Header and one row per variant"""
+        rows = [self.parameter_names + list(self.measurements)]
+        for index, variant in enumerate(self.variants):
+            row = [str(variant[name]) for name in self.parameter_names]
+            result = self.results.get(index)
+            for name in self.measurements:
+                if result is None:
+                    row.append("...")
+                elif result.error:
+                    row.append("failed")
+                elif isinstance(value := result.measurements.get(name, ""), float):
+                    row.append(f"{value:.4g}")
+                else:
+                    row.append(str(value))
+            rows.append(row)
+        return rows
@@ -0,0 +1,110 @@
+"""
+Tessellation in worker processes
+
+BRepMesh runs in the process pool. The shape goes to the worker and the
+meshed shape comes back as binary BRep in shared memory, triangulations
+and normals included, so only the names of the blocks are pickled and
+BinTools fills the Poly_Triangulation arrays in C++. Parsing happens on
+the thread that completes the future, the UI thread only hands the
+triangulations of its faces to the faces of ais_shape.Shape() itself,
+one UpdateFace per face. AIS_Shape then finds the shape already
+tessellated and builds its triangle arrays in C++, while picking and
+measurement keep working on the real faces.
+
+Shapes that are being meshed are displayed in wireframe, which does not
+tessellate the faces, and switch to shaded once their mesh arrived.
+"""
+import logging
+from typing import Callable, Iterator, Optional
+
+from OCP.AIS import AIS_Shape
+from OCP.BRep import BRep_Builder, BRep_Tool
+from OCP.BRepLib import BRepLib_ToolTriangulatedShape
+from OCP.BRepMesh import BRepMesh_IncrementalMesh
+from OCP.BRepTools import BRepTools
+from OCP.StdPrs import StdPrs_ToolTriangulatedShape
+from OCP.TopAbs import TopAbs_FACE
+from OCP.TopExp import TopExp_Explorer
+from OCP.TopLoc import TopLoc_Location
+from OCP.TopoDS import TopoDS, TopoDS_Face, TopoDS_Shape
+
+from cq_viewer.shared_brep import SharedBRep, read_shape, release, share_shape
+from cq_viewer.workers import process_executor
+
+logger = logging.getLogger(__name__)
+
+
+def explore_faces(shape: TopoDS_Shape) -> Iterator[TopoDS_Face]:
+    # The order is the same in the worker and in the UI
+    # because both shapes come from the same BRep
+    explorer = TopExp_Explorer(shape, TopAbs_FACE)
+    while explorer.More():
+        yield TopoDS.Face_s(explorer.Current())
+        explorer.Next()
+
+
+def tessellate(
+    shared: SharedBRep, linear_deflection: float, angular_deflection: float
+) -> SharedBRep:
+    """Runs in a worker process, the caller releases both blocks"""
+    shape = read_shape(shared)
+    BRepMesh_IncrementalMesh(shape, linear_deflection, False, angular_deflection, False)
+    for face in explore_faces(shape):
+        triangulation = BRep_Tool.Triangulation_s(face, TopLoc_Location())
+        if triangulation is not None and not triangulation.HasNormals():
+            BRepLib_ToolTriangulatedShape.ComputeNormals_s(face, triangulation)
+    return share_shape(shape, triangulation=True)
+
+
+def attach_triangulations(shape: TopoDS_Shape, meshed: TopoDS_Shape):
+    """Triangulations stay in the local coordinates of the faces"""
+    builder = BRep_Builder()
+    for face, meshed_face in zip(explore_faces(shape), explore_faces(meshed)):
+        triangulation = BRep_Tool.Triangulation_s(meshed_face, TopLoc_Location())
+        if triangulation is not None:
+            builder.UpdateFace(face, triangulation)
+
+
+def tessellate_ais_shapes(
+    ais_shapes: list[AIS_Shape],
+    on_meshed: Callable[[AIS_Shape, Optional[TopoDS_Shape]], None],
+) -> list[AIS_Shape]:
+    """
+    Submit the shapes that are not tessellated for their display
+    deflection yet and return them. on_meshed is called from a pool
+    thread with the meshed copy, or None if meshing failed and AIS
+    has to mesh the shape itself.
+    """
+    submitted = []
+    for ais_shape in ais_shapes:
+        shape = ais_shape.Shape()
+        drawer = ais_shape.Attributes()
+        deflection = StdPrs_ToolTriangulatedShape.GetDeflection_s(shape, drawer)
+        if BRepTools.Triangulation_s(shape, deflection):
+            continue
+
+        shared = share_shape(shape)
+
+        def done(future, ais_shape=ais_shape, shared=shared):
+            release(shared)
+            try:
+                meshed_shared = future.result()
+            except Exception as ex:
+                logger.warning("Tessellation in worker failed: %s", ex)
+                on_meshed(ais_shape, None)
+                return
+            try:
+                meshed = read_shape(meshed_shared)
+            except Exception as ex:
+                logger.warning("Reading the worker mesh failed: %s", ex)
+                meshed = None
+            finally:
+                release(meshed_shared)
+            on_meshed(ais_shape, meshed)
+
+        future = process_executor().submit(
+            tessellate, shared, deflection, drawer.DeviationAngle()
+        )
+        future.add_done_callback(done)
+        submitted.append(ais_shape)
+    return submitted
@@ -0,0 +1,294 @@
+"""
+Wall thickness analysis
+
+A ray is cast inward from every triangulation node of a solid and the
+first hit on the far side is the local wall thickness. IntCurvesFace
+holds the GIL, so meshing and ray casting run in the process pool on
+copies of the solid. The solid goes to the workers once through shared
+memory, the batches only carry the name of the block. The rays are cast
+in one batch per worker, and each worker keeps the
+IntCurvesFace_ShapeIntersector of the last solid. The result is shown
+as an AIS_Triangulation with a colour per node.
+"""
+import logging
+import math
+import os
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import numpy as np
+from OCP.AIS import AIS_Triangulation
+from OCP.Aspect import Aspect_POM_Fill
+from OCP.BRep import BRep_Tool
+from OCP.BRepLib import BRepLib_ToolTriangulatedShape
+from OCP.gp import gp_Dir, gp_Lin, gp_Pnt
+from OCP.IntCurveSurface import IntCurveSurface_Tangent
+from OCP.IntCurvesFace import IntCurvesFace_ShapeIntersector
+from OCP.Poly import Poly_Triangle, Poly_Triangulation
+from OCP.TColStd import TColStd_HArray1OfInteger
+from OCP.TopAbs import TopAbs_FACE, TopAbs_REVERSED
+from OCP.TopExp import TopExp_Explorer
+from OCP.TopLoc import TopLoc_Location
+from OCP.TopoDS import TopoDS, TopoDS_Shape
+
+from cq_viewer.export import ensure_triangulation
+from cq_viewer.measurement import MeasuredValue
+from cq_viewer.shared_brep import SharedBRep, read_shape, release, share_shape
+from cq_viewer.workers import process_executor
+
+logger = logging.getLogger(__name__)
+
+# Smallest batch, each batch is a task of its own
+RAY_BATCH_SIZE = 2048
+# Rays start this far inside so that they do not hit their own face
+RAY_START_OFFSET = 1e-5
+INTERSECTOR_TOLERANCE = 1e-7
+# Without a configured threshold, the thinnest tenth is highlighted
+DEFAULT_THRESHOLD_PERCENTILE = 10
+
+THIN_COLOR = (1.0, 0.0, 0.0)
+THICK_COLOR = (0.0, 0.3, 1.0)
+MEDIUM_COLOR = (1.0, 1.0, 0.0)
+NO_HIT_COLOR = (0.5, 0.5, 0.5)
+
+
+@dataclass
+class MeshSamples:
+    points: np.ndarray  # (n, 3)
+    normals: np.ndarray  # (n, 3) outward
+    triangles: np.ndarray  # (m, 3) 1-based into points
+    deflection: float
+
+
+def mesh_samples(shape: TopoDS_Shape) -> MeshSamples:
+    ensure_triangulation(shape)
+    points, normals, triangles = [], [], []
+    deflection = 0.0
+    explorer = TopExp_Explorer(shape, TopAbs_FACE)
+    while explorer.More():
+        face = TopoDS.Face_s(explorer.Current())
+        explorer.Next()
+        location = TopLoc_Location()
+        triangulation = BRep_Tool.Triangulation_s(face, location)
+        if triangulation is None:
+            continue
+        if not triangulation.HasNormals():
+            BRepLib_ToolTriangulatedShape.ComputeNormals_s(face, triangulation)
+        transformation = location.Transformation()
+        reversed_face = face.Orientation() == TopAbs_REVERSED
+        offset = len(points)
+        for i in range(1, triangulation.NbNodes() + 1):
+            node = triangulation.Node(i).Transformed(transformation)
+            normal = triangulation.Normal(i).Transformed(transformation)
+            if reversed_face:
+                normal.Reverse()
+            points.append((node.X(), node.Y(), node.Z()))
+            normals.append((normal.X(), normal.Y(), normal.Z()))
+        for i in range(1, triangulation.NbTriangles() + 1):
+            n1, n2, n3 = triangulation.Triangle(i).Get()
+            if reversed_face:
+                n2, n3 = n3, n2
+            triangles.append((n1 + offset, n2 + offset, n3 + offset))
+        deflection = max(deflection, triangulation.Deflection())
+
+    return MeshSamples(
+        np.array(points).reshape(-1, 3),
+        np.array(normals).reshape(-1, 3),
+        np.array(triangles, dtype=int).reshape(-1, 3),
+        deflection,
+    )
+
+
+def thickness_samples(shared: SharedBRep) -> MeshSamples:
+    """Runs in a worker process, which meshes its own copy of the solid"""
+    return mesh_samples(read_shape(shared))
+
+
+# (block name, intersector) of the last solid in this worker process
+_intersector: Optional[tuple[str, IntCurvesFace_ShapeIntersector]] = None
+
+
+def process_intersector(shared: SharedBRep) -> IntCurvesFace_ShapeIntersector:
+    """Block names are not reused, the name is the key of the solid"""
+    global _intersector
+    if _intersector is None or _intersector[0] != shared.name:
+        intersector = IntCurvesFace_ShapeIntersector()
+        intersector.Load(read_shape(shared), INTERSECTOR_TOLERANCE)
+        _intersector = (shared.name, intersector)
+    return _intersector[1]
+
+
+def cast_rays(
+    shared: SharedBRep, points: np.ndarray, directions: np.ndarray
+) -> np.ndarray:
+    """
+    Runs in a worker process. Distance to the first hit along each
+    direction, nan for no hit. Rays from nodes on edges run along the
+    neighbouring face, grazing hits on it are not the far side.
+    """
+    intersector = process_intersector(shared)
+    distances = np.full(len(points), np.nan)
+    for i, (point, direction) in enumerate(zip(points.tolist(), directions.tolist())):
+        intersector.Perform(
+            gp_Lin(gp_Pnt(*point), gp_Dir(*direction)),
+            RAY_START_OFFSET,
+            float("inf"),
+        )
+        if not intersector.IsDone():
+            continue
+        hits = [
+            intersector.WParameter(j)
+            for j in range(1, intersector.NbPnt() + 1)
+            if intersector.Transition(j) != IntCurveSurface_Tangent
+        ]
+        if hits:
+            distances[i] = min(hits)
+    return distances
+
+
+@dataclass
+class ThicknessResult:
+    samples: MeshSamples
+    thickness: np.ndarray  # per node, nan where the ray escaped
+    threshold: float
+
+    @property
+    def minimum(self) -> Optional[MeasuredValue]:
+        if np.all(np.isnan(self.thickness)):
+            return None
+        # Nodes lie within the mesh deflection of the surface
+        return MeasuredValue(
+            float(np.nanmin(self.thickness)), 2 * self.samples.deflection
+        )
+
+    @property
+    def thin_count(self) -> int:
+        return int(np.sum(self.thickness < self.threshold))
+
+
+def analyze_thickness(
+    shape: TopoDS_Shape,
+    on_done: Callable[[ThicknessResult], None],
+    threshold: Optional[float] = None,
+):
+    """
+    Meshing and the rays run in the process pool. on_done is called from
+    a pool thread, with no samples if the solid could not be meshed.
+    """
+    shared = share_shape(shape)
+
+    def sampled(future: Future):
+        try:
+            samples = future.result()
+        except Exception as ex:
+            logger.warning("Thickness sampling failed: %s", ex)
+            samples = MeshSamples(
+                np.empty((0, 3)), np.empty((0, 3)), np.empty((0, 3), dtype=int), 0.0
+            )
+        cast_batches(shared, samples, on_done, threshold)
+
+    process_executor().submit(thickness_samples, shared).add_done_callback(sampled)
+
+
+def cast_batches(
+    shared: SharedBRep,
+    samples: MeshSamples,
+    on_done: Callable[[ThicknessResult], None],
+    threshold: Optional[float],
+):
+    """Releases the block once the last batch is done"""
+    directions = -samples.normals
+    batch_size = max(
+        RAY_BATCH_SIZE, math.ceil(len(samples.points) / (os.cpu_count() or 1))
+    )
+    batches = range(0, len(samples.points), batch_size)
+    thickness = np.full(len(samples.points), np.nan)
+    remaining = len(batches)
+    lock = threading.Lock()
+
+    def finish():
+        release(shared)
+        limit = threshold
+        if limit is None:
+            hits = thickness[~np.isnan(thickness)]
+            limit = (
+                float(np.percentile(hits, DEFAULT_THRESHOLD_PERCENTILE))
+                if len(hits)
+                else 0.0
+            )
+        on_done(ThicknessResult(samples, thickness, limit))
+
+    if not remaining:
+        finish()
+        return
+
+    def batch_done(future: Future, start: int):
+        nonlocal remaining
+        try:
+            thickness[start : start + batch_size] = future.result()
+        except Exception as ex:
+            logger.warning("Thickness batch failed: %s", ex)
+        with lock:
+            remaining -= 1
+            last = remaining == 0
+        if last:
+            finish()
+
+    for start in batches:
+        end = start + batch_size
+        future = process_executor().submit(
+            cast_rays, shared, samples.points[start:end], directions[start:end]
+        )
+        future.add_done_callback(lambda future, start=start: batch_done(future, start))
+
+
+def pack_color(color: tuple[float, float, float]) -> int:
+    """AIS_Triangulation colors are 0xAABBGGRR"""
+    r, g, b = (int(round(c * 255)) for c in color)
+    return r | g << 8 | b << 16
+
+
+def thickness_colors(result: ThicknessResult) -> list[int]:
+    thickness = result.thickness
+    hits = thickness[~np.isnan(thickness)]
+    high = float(hits.max()) if len(hits) else 1.0
+    low = result.threshold
+    colors = []
+    for value in thickness.tolist():
+        if np.isnan(value):
+            colors.append(pack_color(NO_HIT_COLOR))
+        elif value < low:
+            colors.append(pack_color(THIN_COLOR))
+        else:
+            t = (value - low) / ((high - low) or 1)
+            colors.append(
+                pack_color(
+                    tuple(m + (k - m) * t for m, k in zip(MEDIUM_COLOR, THICK_COLOR))
+                )
+            )
+    return colors
+
+
+def thickness_presentation(result: ThicknessResult) -> AIS_Triangulation:
+    samples = result.samples
+    triangulation = Poly_Triangulation(
+        len(samples.points), len(samples.triangles), False
+    )
+    for i, point in enumerate(samples.points.tolist(), 1):
+        triangulation.SetNode(i, gp_Pnt(*point))
+    for i, triangle in enumerate(samples.triangles.tolist(), 1):
+        triangulation.SetTriangle(i, Poly_Triangle(*triangle))
+
+    colors = TColStd_HArray1OfInteger(1, len(samples.points))
+    for i, color in enumerate(thickness_colors(result), 1):
+        colors.SetValue(i, color)
+
+    ais_triangulation = AIS_Triangulation(triangulation)
+    ais_triangulation.SetColors(colors)
+    # Drawn over the analysed shape instead of fighting with it
+    ais_triangulation.Attributes().ShadingAspect().Aspect().SetPolygonOffsets(
+        Aspect_POM_Fill, -1.0, -1.0
+    )
+    return ais_triangulation
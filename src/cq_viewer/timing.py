@@ -0,0 +1,31 @@
+import time
+from contextlib import contextmanager
+
+from cq_viewer.tracing import tracer
+
+
+class Timings:
+    """
+    Duration of the latest run of each named stage of event handling,
+    also recorded as a tracing span when tracing is enabled
+    """
+
+    def __init__(self):
+        self.last: dict[str, float] = {}
+
+    @contextmanager
+    def measure(self, name: str):
+        start = time.perf_counter()
+        try:
+            with tracer.span(name):
+                yield
+        finally:
+            self.last[name] = time.perf_counter() - start
+
+    def summary(self) -> str:
+        return " | ".join(
+            f"{name} {duration * 1000:.1f} ms" for name, duration in self.last.items()
+        )
+
+
+timings = Timings()
@@ -0,0 +1,204 @@
+"""
+Span tracing for viewer internals
+
+Spans are off by default and then cost a level comparison. Enable with
+the CQ_VIEWER_TRACE environment variable ("info" or "debug") or at
+runtime with tracer.enable(). Collected spans can be written as a
+Chrome trace (chrome://tracing, Perfetto) or summarized as percentiles.
+"""
+import cProfile
+import io
+import json
+import logging
+import math
+import os
+import pstats
+import threading
+import time
+from collections import defaultdict, deque
+from enum import IntEnum
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Level(IntEnum):
+    OFF = 0
+    INFO = 1
+    DEBUG = 2
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return None
+
+    def end(self):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.tracer.events.append(
+            (
+                self.name,
+                self.start,
+                time.perf_counter() - self.start,
+                threading.get_ident(),
+                self.args,
+            )
+        )
+        return None
+
+    def end(self):
+        """For spans that end in a callback, possibly on another thread"""
+        self.__exit__(None, None, None)
+
+
+class Tracer:
+    def __init__(self, level: Level = Level.OFF, max_events: int = 100_000):
+        self.level = level
+        # (name, start, duration, thread id, args), deque appends are thread safe
+        self.events: deque[tuple[str, float, float, int, dict]] = deque(
+            maxlen=max_events
+        )
+
+    def span(self, name: str, level: Level = Level.INFO, **args):
+        if level > self.level:
+            return NULL_SPAN
+        return Span(self, name, args)
+
+    def begin(self, name: str, level: Level = Level.INFO, **args):
+        """A started span that has to be ended with end()"""
+        return self.span(name, level, **args).__enter__()
+
+    @property
+    def enabled(self) -> bool:
+        return self.level > Level.OFF
+
+    def enable(self, level: Level = Level.INFO):
+        self.level = level
+
+    def disable(self):
+        self.level = Level.OFF
+
+    def clear(self):
+        self.events.clear()
+
+    def chrome_trace(self) -> dict:
+        pid = os.getpid()
+        return {
+            "traceEvents": [
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": start * 1e6,
+                    "dur": duration * 1e6,
+                    "pid": pid,
+                    "tid": tid,
+                    "args": args,
+                }
+                for name, start, duration, tid, args in list(self.events)
+            ]
+        }
+
+    def write_chrome_trace(self, file_path: str):
+        with open(file_path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        durations = defaultdict(list)
+        for name, _, duration, _, _ in list(self.events):
+            durations[name].append(duration)
+        return {
+            name: {
+                "count": len(values),
+                "p50": percentile(values, 50),
+                "p90": percentile(values, 90),
+                "p99": percentile(values, 99),
+                "max": max(values),
+            }
+            for name, values in durations.items()
+        }
+
+    def format_summary(self) -> str:
+        lines = [f"{'span':<16}{'count':>8}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}"]
+        for name, stats in sorted(self.summary().items()):
+            lines.append(
+                f"{name:<16}{stats['count']:>8}"
+                + "".join(
+                    f"{stats[k] * 1000:>8.2f}ms" for k in ("p50", "p90", "p99", "max")
+                )
+            )
+        return "\n".join(lines)
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest rank percentile"""
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class ProfileCapture:
+    """cProfile capture that is started and stopped with the same call"""
+
+    def __init__(self):
+        self.profile: Optional[cProfile.Profile] = None
+
+    @property
+    def running(self) -> bool:
+        return self.profile is not None
+
+    def toggle(self, directory: str = ".") -> Optional[str]:
+        """Start a capture or stop the running one and return its file path"""
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+            return None
+
+        self.profile.disable()
+        file_path = os.path.join(
+            directory, time.strftime("cq-viewer-%Y%m%d-%H%M%S.prof")
+        )
+        self.profile.dump_stats(file_path)
+        stream = io.StringIO()
+        pstats.Stats(self.profile, stream=stream).sort_stats("cumulative").print_stats(
+            20
+        )
+        logger.info("Profile written to %s\n%s", file_path, stream.getvalue())
+        self.profile = None
+        return file_path
+
+
+def level_from_env() -> Level:
+    value = os.environ.get("CQ_VIEWER_TRACE", "").lower()
+    if value in ("1", "info"):
+        return Level.INFO
+    if value == "debug":
+        return Level.DEBUG
+    return Level.OFF
+
+
+tracer = Tracer(level_from_env())
+span = tracer.span
+profile_capture = ProfileCapture()
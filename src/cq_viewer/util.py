@@ -1,4 +1,5 @@
-from typing import Union
+import logging
+from typing import Optional, Union
 
 import cadquery as cq
 from cadquery.occ_impl.shapes import downcast_LUT
@@ -11,6 +12,8 @@ try:
 except ImportError:
     b3d = None
 
+logger = logging.getLogger(__name__)
+
 
 def downcast(shape: TopoDS_Shape):
     return downcast_LUT[shape.ShapeType()](shape)
@@ -52,9 +55,90 @@ def color_str_to_quantity_color(color: str) -> Quantity_Color:
     raise ValueError(f"Unknown color {color}")
 
 
+PendingSketch = list[tuple[list[TopoDS_Face], list[TopoDS_Compound], list[gp_Pln]]]
+
+
+def b3d_builder_state(builder: "b3d.Builder") -> tuple[tuple, list]:
+    """
+    Cheap fingerprint of everything collect_b3d_builder_pending depends on.
+
+    Returns the key and the objects whose ids are in it. The objects
+    must be kept alive alongside the key so that the ids are not reused.
+    """
+    pending_faces = getattr(builder, "pending_faces", [])
+    pending_edges = getattr(builder, "pending_edges", [])
+    workplanes = builder.workplanes_context.workplanes
+    children = getattr(builder, "builder_children", [])
+
+    refs = [builder, *pending_faces, *pending_edges, *workplanes]
+    child_keys = []
+    for child in children:
+        child_key, child_refs = b3d_builder_state(child)
+        child_keys.append(child_key)
+        refs += child_refs
+
+    key = (
+        id(builder),
+        tuple(id(face) for face in pending_faces),
+        tuple(id(edge) for edge in pending_edges),
+        tuple(id(workplane) for workplane in workplanes),
+        tuple(child_keys),
+    )
+    return key, refs
+
+
+class PendingSketchCache:
+    """
+    Memoizes collect_b3d_builder_pending for one builder.
+
+    The result is recomputed only when the builder state changes and
+    even then the edge compounds transformed to each workplane are reused.
+    """
+
+    def __init__(self):
+        self._key = None
+        self._refs = []
+        self._pending: PendingSketch = []
+        self._edge_compounds: dict[tuple, tuple[list, "b3d.Compound"]] = {}
+        self._used_edge_compounds: set[tuple] = set()
+
+    def get(self, builder: "b3d.Builder") -> PendingSketch:
+        key, refs = b3d_builder_state(builder)
+        if key != self._key:
+            self._used_edge_compounds = set()
+            self._pending = collect_b3d_builder_pending(builder, self)
+            self._edge_compounds = {
+                k: v
+                for k, v in self._edge_compounds.items()
+                if k in self._used_edge_compounds
+            }
+            self._key = key
+            self._refs = refs
+        return self._pending
+
+    def transformed_edge_compounds(
+        self, pending_edges: list, workplanes: list
+    ) -> list["b3d.Compound"]:
+        edge_ids = tuple(id(edge) for edge in pending_edges)
+        compounds = []
+        edge_compound = None
+        for workplane in workplanes:
+            key = (edge_ids, id(workplane))
+            self._used_edge_compounds.add(key)
+            if cached := self._edge_compounds.get(key):
+                compounds.append(cached[1])
+                continue
+            if edge_compound is None:
+                edge_compound = b3d.Compound.make_compound(pending_edges)
+            compound = workplane.from_local_coords(edge_compound)
+            self._edge_compounds[key] = ([*pending_edges, workplane], compound)
+            compounds.append(compound)
+        return compounds
+
+
 def collect_b3d_builder_pending(
-    builder: "b3d.Builder",
-) -> list[tuple[list[TopoDS_Face], list[TopoDS_Compound], list[gp_Pln]]]:
+    builder: "b3d.Builder", cache: Optional[PendingSketchCache] = None
+) -> PendingSketch:
     pending = []
     pending_faces = getattr(builder, "pending_faces", [])
     pending_edges = getattr(builder, "pending_edges", [])
@@ -62,13 +146,13 @@ def collect_b3d_builder_pending(
 
     # Edges need to be transformed from local to global
     if pending_edges:
-        edge_compound = b3d.Compound.make_compound(pending_edges)
-        workplane_edge_compounds = []
-
-        for workplane in builder.workplanes_context.workplanes:
-            workplane_edge_compounds.append(workplane.from_local_coords(edge_compound))
-
-        pending_edges = workplane_edge_compounds
+        if cache is not None:
+            pending_edges = cache.transformed_edge_compounds(pending_edges, workplanes)
+        else:
+            edge_compound = b3d.Compound.make_compound(pending_edges)
+            pending_edges = [
+                workplane.from_local_coords(edge_compound) for workplane in workplanes
+            ]
 
     if pending_faces or pending_edges:
         if pending_edges:
@@ -83,7 +167,7 @@ def collect_b3d_builder_pending(
                     for plane in builder_children[-1].workplanes_context.workplanes
                 ]
             else:
-                print("Could not find planes!")
+                logger.debug("Could not find planes!")
                 planes = []
 
         pending = [
@@ -97,16 +181,14 @@ def collect_b3d_builder_pending(
         pending = []
 
     for child in getattr(builder, "builder_children", []):
-        child_pending = collect_b3d_builder_pending(child)
+        child_pending = collect_b3d_builder_pending(child, cache)
         if child_pending:
             pending += child_pending
 
     return pending
 
 
-def pending_contains_edges(
-    pending: list[tuple[list[TopoDS_Face], list[TopoDS_Compound], list[gp_Pln]]]
-):
+def pending_contains_edges(pending: PendingSketch):
     for _, edges, _ in pending:
         if edges:
             return True
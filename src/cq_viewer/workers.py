@@ -0,0 +1,35 @@
+import atexit
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+_background_executor: Optional[ThreadPoolExecutor] = None
+_process_executor: Optional[ProcessPoolExecutor] = None
+
+
+def background_executor() -> ThreadPoolExecutor:
+    """
+    Shared thread pool for work that must not block the UI thread.
+
+    Results have to be handed back to the UI with wx.CallAfter.
+    """
+    global _background_executor
+    if _background_executor is None:
+        _background_executor = ThreadPoolExecutor(thread_name_prefix="cq-viewer")
+        atexit.register(_background_executor.shutdown, wait=False)
+    return _background_executor
+
+
+def process_executor() -> ProcessPoolExecutor:
+    """
+    Shared process pool for CPU bound OCCT work that holds the GIL.
+
+    Workers are spawned, forking a process that runs wx is not safe.
+    """
+    global _process_executor
+    if _process_executor is None:
+        _process_executor = ProcessPoolExecutor(
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        atexit.register(_process_executor.shutdown, wait=False, cancel_futures=True)
+    return _process_executor
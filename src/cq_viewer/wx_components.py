@@ -1,3 +1,5 @@
+import logging
+import pathlib
 import typing
 
 import wx
@@ -23,9 +25,16 @@ from OCP.Prs3d import Prs3d_Drawer
 from OCP.Quantity import Quantity_Color, Quantity_NOC_GREEN, Quantity_NOC_RED
 from OCP.V3d import V3d_Viewer
 
+from cq_viewer.interface import execution_context
+from cq_viewer.memory import display_object_stats, format_bytes
+from cq_viewer.quality import FULL_QUALITY, IDLE_DELAY_MS
+from cq_viewer.timing import timings
+
 if typing.TYPE_CHECKING:
     from cq_viewer.app import CQViewerContext
 
+logger = logging.getLogger(__name__)
+
 
 class KeyboardHandlerMixin:
     def __init__(self, *args, **kwargs):
@@ -36,7 +45,144 @@ class KeyboardHandlerMixin:
         self.Parent.on_key_down(event)
 
 
-class V3dPanel(KeyboardHandlerMixin, wx.Panel):
+def configure_context(ctx: AIS_InteractiveContext):
+    ctx.SetAutoActivateSelection(False)
+    # Build selection BVHs on background threads as soon as
+    # shapes are activated instead of on the first hover
+    ctx.MainSelector().SetToPrebuildBVH(True)
+    ctx.SetDisplayMode(AIS_DisplayMode.AIS_Shaded, True)
+    ctx.DefaultDrawer().SetFaceBoundaryDraw(True)
+
+
+class PickingMixin:
+    """
+    Hover and selection at pixel coordinates, shared by V3dPanel and the
+    headless canvas. Expects view, viewer, context and cq_viewer_ctx.
+    """
+
+    def hover(self, x: int, y: int):
+        if not self.cq_viewer_ctx.selection_ready:
+            return
+        with timings.measure("pick"):
+            self.context.MoveTo(x, y, self.view, True)
+        self.context.InitDetected()
+        all_detected = []
+        while self.context.MoreDetected():
+            if self.context.HasDetectedShape():
+                all_detected.append(self.context.DetectedShape())
+            else:
+                logger.debug("Detected was not a shape")
+
+            self.context.NextDetected()
+        if all_detected:
+            self.cq_viewer_ctx.update_measurement(all_detected)
+            self.cq_viewer_ctx.update_midpoint(all_detected[0])
+        else:
+            self.cq_viewer_ctx.update_measurement(None)
+            self.cq_viewer_ctx.update_midpoint(None)
+
+        if self.cq_viewer_ctx.render_stats_enabled:
+            self.cq_viewer_ctx.main_frame.set_status(timings.summary())
+
+    def click(self, shift: bool = False):
+        """Select what the last hover detected"""
+        with timings.measure("select"):
+            if shift:
+                self.context.SelectDetected(AIS_SelectionScheme_Remove)
+            else:
+                self.context.SelectDetected(AIS_SelectionScheme_Add)
+            self.context.InitSelected()
+
+            if self.context.NbSelected() and self.context.HasDetected():
+                selected = []
+                while self.context.MoreSelected():
+                    selected.append(self.context.SelectedShape())
+                    self.context.NextSelected()
+                self.cq_viewer_ctx.select(selected)
+
+                self.cq_viewer_ctx.update_measurement()
+                self.cq_viewer_ctx.clean_up_selected_midpoints()
+                self.viewer.Update()
+
+            elif self.cq_viewer_ctx.selected_shapes:
+                self.cq_viewer_ctx.select([])
+                self.context.ClearSelected(True)
+                self.cq_viewer_ctx.update_measurement()
+                self.cq_viewer_ctx.clean_up_selected_midpoints()
+                self.viewer.Update()
+
+
+class PointerMixin(PickingMixin):
+    """
+    Mouse handling on plain values so that recorded sessions replay
+    through the same code. Expects begin_interaction on top of what
+    PickingMixin expects.
+    """
+
+    _left_down_pos = (0, 0)
+    _left_dragged = False
+    _middle_down_pos = (0, 0)
+    _right_down_pos = (0, 0)
+
+    def pointer_event(self, kind: str, **args):
+        self.cq_viewer_ctx.record_event(kind, **args)
+        getattr(self, kind)(**args)
+
+    def left_down(self, x: int, y: int):
+        self._left_down_pos = (x, y)
+        self._left_dragged = False
+        self.view.StartRotation(x, y)
+
+    def left_up(self, shift: bool = False):
+        if not self._left_dragged:
+            self.click(shift)
+
+    def middle_down(self, x: int, y: int):
+        self._middle_down_pos = (x, y)
+
+    def right_down(self, x: int, y: int):
+        self._right_down_pos = (x, y)
+        self.view.StartZoomAtPoint(x, y)
+
+    def wheel(self, x: int, y: int, rotation: int):
+        self.begin_interaction()
+        ZOOM_STEP = 0.9
+        factor = ZOOM_STEP if rotation < 0 else 1 / ZOOM_STEP
+        delta_factor = 10
+        x_step = x + delta_factor if rotation > 0 else x - delta_factor
+        # self.view.SetZoom(factor)
+        self.view.StartZoomAtPoint(x, y)
+        self.view.ZoomAtPoint(x, y, x_step, y)
+
+    def motion(
+        self,
+        x: int,
+        y: int,
+        left: bool = False,
+        middle: bool = False,
+        right: bool = False,
+    ):
+        if left or middle or right:
+            self.begin_interaction()
+            if left:
+                self._left_dragged = True
+                self._left_down_pos = (x, y)
+                self.view.Rotation(x, y)
+
+            if middle:
+                mx, my = self._middle_down_pos
+                self._middle_down_pos = (x, y)
+                self.view.Pan(x - mx, my - y)
+
+            if right:
+                ox, oy = self._right_down_pos
+                self._right_down_pos = (x, y)
+                self.view.ZoomAtPoint(ox, -oy, x, -y)
+        else:
+            self.hover(x, y)
+
+
+class V3dPanel(KeyboardHandlerMixin, PointerMixin, wx.Panel):
     def __init__(self, parent, cq_viewer_ctx: "CQViewerContext"):
         super().__init__(parent)
         self.cq_viewer_ctx = cq_viewer_ctx
@@ -47,8 +193,8 @@ class V3dPanel(KeyboardHandlerMixin, wx.Panel):
         self.context = AIS_InteractiveContext(self.viewer)
 
         params = self.view.ChangeRenderingParams()
-        params.NbMsaaSamples = 8
-        params.IsAntialiasingEnabled = True
+        params.NbMsaaSamples = FULL_QUALITY.msaa_samples
+        params.IsAntialiasingEnabled = FULL_QUALITY.msaa_samples > 0
 
         self.view.TriedronDisplay(
             Aspect_TypeOfTriedronPosition.Aspect_TOTP_RIGHT_LOWER, Quantity_Color(), 0.1
@@ -60,9 +206,7 @@ class V3dPanel(KeyboardHandlerMixin, wx.Panel):
         viewer.SetLightOn()
 
         ctx = self.context
-        ctx.SetAutoActivateSelection(False)
-        ctx.SetDisplayMode(AIS_DisplayMode.AIS_Shaded, True)
-        ctx.DefaultDrawer().SetFaceBoundaryDraw(True)
+        configure_context(ctx)
         # style: Prs3d_Drawer = ctx.SelectionStyle()
         style = Prs3d_Drawer()
         style.SetColor(Quantity_Color(Quantity_NOC_GREEN))
@@ -97,102 +241,50 @@ class V3dPanel(KeyboardHandlerMixin, wx.Panel):
         self.Bind(wx.EVT_MIDDLE_DOWN, self.evt_middle_down)
         self.Bind(wx.EVT_RIGHT_DOWN, self.evt_right_down)
 
-        self._left_down_pos = False
-        self._left_dragged = False
-        self._middle_down_pos = False
-        self._right_down_pos = False
-
         self.Bind(wx.EVT_MOUSEWHEEL, self.evt_mousewheel)
         self.Bind(wx.EVT_MOTION, self.evt_motion)
 
-    def evt_left_down(self, event):
-        self._left_down_pos = event.GetPosition()
-        self._left_dragged = False
-        x, y = self._left_down_pos
-        self.view.StartRotation(x, y)
+        self.interaction_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_interaction_timer, self.interaction_timer)
 
-    def evt_left_up(self, event: wx.KeyEvent):
-        if not self._left_dragged:
-            if event.ShiftDown():
-                self.context.SelectDetected(AIS_SelectionScheme_Remove)
-            else:
-                self.context.SelectDetected(AIS_SelectionScheme_Add)
-            self.context.InitSelected()
+    def begin_interaction(self):
+        self.cq_viewer_ctx.set_interacting(True)
+        self.interaction_timer.StartOnce(IDLE_DELAY_MS)
 
-            if self.context.NbSelected() and self.context.HasDetected():
-                self.cq_viewer_ctx.selected_shapes = []
-                while self.context.MoreSelected():
-                    self.cq_viewer_ctx.selected_shapes.append(
-                        self.context.SelectedShape()
-                    )
-                    self.context.NextSelected()
+    def on_interaction_timer(self, event):
+        self.cq_viewer_ctx.set_interacting(False)
+        self.view.Redraw()
 
-                self.cq_viewer_ctx.update_measurement()
-                self.cq_viewer_ctx.clean_up_selected_midpoints()
-                self.viewer.Update()
+    def evt_left_down(self, event):
+        x, y = event.GetPosition()
+        self.pointer_event("left_down", x=x, y=y)
 
-            elif self.cq_viewer_ctx.selected_shapes:
-                self.cq_viewer_ctx.selected_shapes = []
-                self.context.ClearSelected(True)
-                self.cq_viewer_ctx.update_measurement()
-                self.cq_viewer_ctx.clean_up_selected_midpoints()
-                self.viewer.Update()
+    def evt_left_up(self, event: wx.KeyEvent):
+        self.pointer_event("left_up", shift=event.ShiftDown())
 
     def evt_middle_down(self, event):
-        self._middle_down_pos = event.GetPosition()
+        x, y = event.GetPosition()
+        self.pointer_event("middle_down", x=x, y=y)
 
     def evt_right_down(self, event):
-        self._right_down_pos = event.GetPosition()
-        x, y = self._right_down_pos
-        self.view.StartZoomAtPoint(x, y)
+        x, y = event.GetPosition()
+        self.pointer_event("right_down", x=x, y=y)
 
     def evt_mousewheel(self, event):
-        x, y = event.GetPosition()
-        delta = event.GetWheelRotation()
         if event.GetWheelAxis() == wx.MOUSE_WHEEL_VERTICAL:
-            ZOOM_STEP = 0.9
-            factor = ZOOM_STEP if delta < 0 else 1 / ZOOM_STEP
-            delta_factor = 10
-            x_step = x + delta_factor if delta > 0 else x - delta_factor
-            # self.view.SetZoom(factor)
-            self.view.StartZoomAtPoint(x, y)
-            self.view.ZoomAtPoint(x, y, x_step, y)
+            x, y = event.GetPosition()
+            self.pointer_event("wheel", x=x, y=y, rotation=event.GetWheelRotation())
 
     def evt_motion(self, event):
-        pos = event.GetPosition()
-        x, y = pos
-        if event.Dragging():
-            if event.LeftIsDown():
-                self._left_dragged = True
-                self._left_down_pos = pos
-                self.view.Rotation(x, y)
-
-            if event.MiddleIsDown():
-                dx, dy = pos - self._middle_down_pos
-                self._middle_down_pos = pos
-                self.view.Pan(dx, -dy)
-
-            if event.RightIsDown():
-                ox, oy = self._right_down_pos
-                self._right_down_pos = pos
-                self.view.ZoomAtPoint(ox, -oy, x, -y)
-        else:
-            self.context.MoveTo(x, y, self.view, True)
-            self.context.InitDetected()
-            all_detected = []
-            while self.context.MoreDetected():
-                if self.context.HasDetectedShape():
-                    all_detected.append(self.context.DetectedShape())
-                else:
-                    print("!!! Detected was NOT a shape")
-
-                self.context.NextDetected()
-            if all_detected:
-                self.cq_viewer_ctx.update_measurement(all_detected)
-                self.cq_viewer_ctx.update_midpoint(all_detected[0])
-            else:
-                self.cq_viewer_ctx.update_measurement(None)
-                self.cq_viewer_ctx.update_midpoint(None)
+        x, y = event.GetPosition()
+        self.pointer_event(
+            "motion",
+            x=x,
+            y=y,
+            left=event.LeftIsDown(),
+            middle=event.MiddleIsDown(),
+            right=event.RightIsDown(),
+        )
 
     def get_win_id(self):
         return self.GetHandle()
@@ -216,9 +308,17 @@ class InfoPanel(wx.Panel):
         self.text_elements: list[wx.StaticText] = []
 
     def update_info(self):
-        measurements = self.cq_viewer_ctx.measurement.measurements
-        measurements_hash = hash(frozenset(measurements.items()))
+        measurement = self.cq_viewer_ctx.panel_measurement
+        measurements = measurement.measurements
+        table = measurement.table
+        measurements_hash = hash(
+            (
+                frozenset(measurements.items()),
+                tuple(tuple(row) for row in table) if table else None,
+            )
+        )
         if measurements_hash != self.measurements_hash:
+            self.measurements_hash = measurements_hash
             self.sizer.Clear()
             for t in self.text_elements:
                 t.Destroy()
@@ -228,9 +328,107 @@ class InfoPanel(wx.Panel):
                 t = wx.StaticText(self, label=f"{k}: {v}")
                 self.text_elements.append(t)
                 self.sizer.Add(t)
+
+            if table:
+                grid = wx.FlexGridSizer(cols=len(table[0]), hgap=8, vgap=2)
+                for row in table:
+                    for cell in row:
+                        t = wx.StaticText(self, label=cell)
+                        self.text_elements.append(t)
+                        grid.Add(t, flag=wx.ALIGN_RIGHT)
+                self.sizer.Add(grid)
             self.SetSizerAndFit(self.sizer)
 
 
+class MemoryStatsFrame(wx.Frame):
+    COLUMNS = (
+        "name",
+        "faces",
+        "edges",
+        "triangles",
+        "mesh",
+        "sensitive",
+        "history",
+        "convert ms",
+    )
+
+    def __init__(self, parent, cq_viewer_ctx: "CQViewerContext"):
+        super().__init__(parent, title="Memory", size=wx.Size(600, 300))
+        self.cq_viewer_ctx = cq_viewer_ctx
+        self.rss_text = wx.StaticText(self)
+        self.list_ctrl = wx.ListCtrl(self, style=wx.LC_REPORT)
+        for i, column in enumerate(self.COLUMNS):
+            self.list_ctrl.InsertColumn(i, column)
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(self.rss_text, 0, flag=wx.EXPAND | wx.ALL, border=4)
+        sizer.Add(self.list_ctrl, 1, flag=wx.EXPAND | wx.ALL)
+        self.SetSizer(sizer)
+        self.Bind(wx.EVT_CLOSE, self.on_close)
+
+    def on_close(self, event):
+        self.Hide()
+
+    def update_stats(self):
+        rss_before = self.cq_viewer_ctx.rss_before_reload
+        rss_after = self.cq_viewer_ctx.rss_after_reload
+        if rss_before is not None and rss_after is not None:
+            self.rss_text.SetLabel(
+                f"RSS before reload {format_bytes(rss_before)}, "
+                f"after reload {format_bytes(rss_after)} "
+                f"({format_bytes(rss_after - rss_before)})"
+            )
+
+        self.list_ctrl.DeleteAllItems()
+        for dp_obj in execution_context.display_objects:
+            stats = display_object_stats(dp_obj)
+            self.list_ctrl.Append(
+                (
+                    stats.name,
+                    stats.faces,
+                    stats.edges,
+                    stats.triangles,
+                    format_bytes(stats.mesh_bytes),
+                    stats.sensitive_entities,
+                    stats.history_objects,
+                    f"{stats.conversion_time * 1000:.1f}"
+                    if stats.conversion_time is not None
+                    else "",
+                )
+            )
+
+
+class SweepFrame(wx.Frame):
+    def __init__(self, parent, cq_viewer_ctx: "CQViewerContext"):
+        super().__init__(parent, title="Sweep", size=wx.Size(600, 300))
+        self.cq_viewer_ctx = cq_viewer_ctx
+        self.list_ctrl = wx.ListCtrl(self, style=wx.LC_REPORT | wx.LC_SINGLE_SEL)
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(self.list_ctrl, 1, flag=wx.EXPAND | wx.ALL)
+        self.SetSizer(sizer)
+        self.Bind(wx.EVT_CLOSE, self.on_close)
+        self.list_ctrl.Bind(wx.EVT_LIST_ITEM_ACTIVATED, self.on_item_activated)
+
+    def on_close(self, event):
+        self.Hide()
+
+    def on_item_activated(self, event: wx.ListEvent):
+        self.cq_viewer_ctx.show_variant(event.GetIndex())
+
+    def update_table(self):
+        self.list_ctrl.ClearAll()
+        sweep = self.cq_viewer_ctx.sweep
+        if sweep is None:
+            return
+        header, *rows = sweep.table()
+        for i, column in enumerate(header):
+            self.list_ctrl.InsertColumn(i, column)
+        for row in rows:
+            self.list_ctrl.Append(row)
+        if sweep.variants:
+            self.list_ctrl.Select(sweep.current)
+
+
 class MainFrame(wx.Frame):
     def __init__(self, *args, cq_viewer_ctx: "CQViewerContext", **kwargs):
         super().__init__(
@@ -248,12 +446,14 @@ class MainFrame(wx.Frame):
         self.sizer.Add(self.canvas, 1, flag=wx.EXPAND | wx.ALL)
         self.sizer.Add(self.info_panel, 0, flag=wx.EXPAND | wx.ALL)
         self.SetSizerAndFit(self.sizer)
+        self.status_bar = self.CreateStatusBar()
         self.Show()
         self.canvas.set_window()
         self.Layout()
         self.resize_timer = wx.Timer(self)
         self.startup_timer = wx.Timer(self)
         self.file_reload_timer = wx.Timer(self)
+        self.render_stats_timer = wx.Timer(self)
 
         self.Bind(wx.EVT_SIZE, self.on_size)
         self.Bind(wx.EVT_TIMER, self.on_timer)
@@ -262,6 +462,8 @@ class MainFrame(wx.Frame):
         self.startup_timer.StartOnce(1)
 
         self.file_system_watcher = None
+        self.memory_stats_frame: typing.Optional[MemoryStatsFrame] = None
+        self.sweep_frame: typing.Optional[SweepFrame] = None
 
     def on_timer(self, event):
         if event.GetTimer() == self.resize_timer:
@@ -270,6 +472,8 @@ class MainFrame(wx.Frame):
             self.startup()
         elif event.GetTimer() == self.file_reload_timer:
             self.cq_viewer_ctx.exec_and_display()
+        elif event.GetTimer() == self.render_stats_timer:
+            self.cq_viewer_ctx.log_render_stats()
 
     def startup(self):
         self.file_system_watcher = wx.FileSystemWatcher()
@@ -277,7 +481,18 @@ class MainFrame(wx.Frame):
 
         if self.cq_viewer_ctx.file_path:
             self.cq_viewer_ctx.watch_file()
-            self.cq_viewer_ctx.exec_and_display(fit=True, reset_projection=True)
+            # Show the last session right away, execution replaces it when done
+            from_snapshot = self.cq_viewer_ctx.show_snapshot()
+            wx.CallAfter(
+                self.cq_viewer_ctx.exec_and_display,
+                fit=not from_snapshot,
+                reset_projection=not from_snapshot,
+            )
+        elif self.cq_viewer_ctx.project:
+            self.cq_viewer_ctx.watch_file()
+            wx.CallAfter(
+                self.cq_viewer_ctx.exec_and_display, fit=True, reset_projection=True
+            )
 
     def on_size(self, event: wx.SizeEvent):
         self.resize_timer.Stop()
@@ -286,16 +501,60 @@ class MainFrame(wx.Frame):
 
     def on_fs_watcher(self, event: wx.FileSystemWatcherEvent):
         if event.GetChangeType() == wx.FSW_EVENT_MODIFY:
+            self.cq_viewer_ctx.changed_paths.add(
+                pathlib.Path(event.GetPath().GetFullPath())
+            )
             self.file_reload_timer.Stop()
             self.file_reload_timer.StartOnce(50)
         else:
-            print("Unknown event type", event.GetChangeType())
+            logger.debug("Unhandled file system event %s", event.GetChangeType())
+
+    def set_status(self, text: str):
+        self.status_bar.SetStatusText(text)
+
+    def toggle_memory_stats(self):
+        if self.memory_stats_frame is None:
+            self.memory_stats_frame = MemoryStatsFrame(self, self.cq_viewer_ctx)
+        if self.memory_stats_frame.IsShown():
+            self.memory_stats_frame.Hide()
+        else:
+            self.memory_stats_frame.update_stats()
+            self.memory_stats_frame.Show()
+
+    def update_memory_stats(self):
+        if self.memory_stats_frame and self.memory_stats_frame.IsShown():
+            self.memory_stats_frame.update_stats()
+
+    def toggle_sweep_table(self):
+        if self.sweep_frame is None:
+            self.sweep_frame = SweepFrame(self, self.cq_viewer_ctx)
+        if self.sweep_frame.IsShown():
+            self.sweep_frame.Hide()
+        else:
+            self.sweep_frame.update_table()
+            self.sweep_frame.Show()
+
+    def update_sweep_table(self):
+        if self.sweep_frame and self.sweep_frame.IsShown():
+            self.sweep_frame.update_table()
 
     def on_key_down(self, event: wx.KeyEvent):
-        # ctrl+o
         code = event.GetKeyCode()
-        if event.ControlDown() and code == 79:
+        if not event.ControlDown():
+            # Ctrl combinations open dialogs, those are not replayable
+            self.cq_viewer_ctx.record_event("key", code=code)
+        self.key_down(code, event.ControlDown())
+
+    def key_down(self, code: int, ctrl: bool = False):
+        # ctrl+o
+        if ctrl and code == 79:
             self.cq_viewer_ctx.open_file()
+        elif ctrl and code == 80:
+            # ctrl+p
+            self.cq_viewer_ctx.open_project()
+        elif ctrl and code == 69:
+            # ctrl+e
+            self.cq_viewer_ctx.export_file()
         elif code == 90:
             # z
             self.cq_viewer_ctx.increment_wp_render_index()
@@ -305,5 +564,34 @@ class MainFrame(wx.Frame):
         elif code == 82:
             # r
             self.cq_viewer_ctx.reset_view()
+        elif code == 77:
+            # m
+            self.toggle_memory_stats()
+        elif code == 83:
+            # s
+            self.cq_viewer_ctx.toggle_solid_selection()
+        elif code == 67:
+            # c
+            self.cq_viewer_ctx.detect_clashes()
+        elif code == 84:
+            # t
+            self.cq_viewer_ctx.toggle_thickness()
+        elif code == 70:
+            # f
+            self.cq_viewer_ctx.toggle_render_stats()
+        elif code == wx.WXK_F5:
+            self.cq_viewer_ctx.start_sweep()
+        elif code == wx.WXK_F6:
+            self.toggle_sweep_table()
+        elif code == wx.WXK_PAGEDOWN:
+            self.cq_viewer_ctx.next_variant(1)
+        elif code == wx.WXK_PAGEUP:
+            self.cq_viewer_ctx.next_variant(-1)
+        elif code == wx.WXK_F7:
+            self.cq_viewer_ctx.toggle_tracing()
+        elif code == wx.WXK_F8:
+            self.cq_viewer_ctx.dump_trace()
+        elif code == wx.WXK_F9:
+            self.cq_viewer_ctx.toggle_profiling()
         else:
-            print(event.GetKeyCode())
+            logger.debug("Unhandled key code %s", code)
@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+import cadquery as cq
+from OCP.AIS import AIS_Shape
+from OCP.Aspect import Aspect_TOL_EMPTY, Aspect_TOL_SOLID
+from OCP.Prs3d import Prs3d_Drawer
+from OCP.Quantity import Quantity_Color, Quantity_TOC_RGB
+
+from cq_viewer.ais import StylePalette
+from cq_viewer.quality import INTERACTION_QUALITY
+
+default_drawer = Prs3d_Drawer()
+ctx = SimpleNamespace(DefaultDrawer=lambda: default_drawer)
+
+
+def color(r, g, b):
+    return Quantity_Color(r, g, b, Quantity_TOC_RGB)
+
+
+def test_styles_are_interned():
+    palette = StylePalette()
+    style = palette.style(ctx, color(1, 0, 0), None, True)
+
+    assert palette.style(ctx, color(1, 0, 0), None, True) is style
+    assert palette.style(ctx, color(1, 0, 0), 0.5, True) is not style
+    assert palette.style(ctx, color(1, 0, 0), None, False).highlight is None
+    assert len(palette) == 3
+
+
+def test_quality_is_applied_once_per_style():
+    palette = StylePalette()
+    opaque = palette.style(ctx, color(0, 1, 0), None, True)
+    transparent = palette.style(ctx, color(0, 1, 0), 0.5, True)
+
+    palette.apply_quality(INTERACTION_QUALITY)
+    assert opaque.drawer.FaceBoundaryAspect().Aspect().LineType() == Aspect_TOL_EMPTY
+    assert transparent.drawer.ShadingAspect().Transparency() == 0
+
+    # Styles created later follow the current quality
+    late = palette.style(ctx, color(0, 0, 1), None, True)
+    assert late.drawer.FaceBoundaryAspect().Aspect().LineType() == Aspect_TOL_EMPTY
+
+    palette.apply_quality(StylePalette().quality)
+    assert opaque.drawer.FaceBoundaryAspect().Aspect().LineType() == Aspect_TOL_SOLID
+    assert transparent.drawer.ShadingAspect().Transparency() == 0.5
+
+
+def test_apply_keeps_the_colour_of_the_shape():
+    palette = StylePalette()
+    ais_shape = AIS_Shape(cq.Solid.makeBox(1, 1, 1).wrapped)
+    ais_shape.SetColor(color(1, 0, 0))
+    ais_shape.SetTransparency(0.5)
+
+    palette.apply(ctx, ais_shape, color(1, 0, 0), 0.5, True)
+    palette.apply(ctx, ais_shape, color(1, 0, 0), 0.5, True)
+
+    assert ais_shape.HasColor()
+    assert ais_shape.Transparency() == 0.5
+    assert len(palette) == 1
+    # The shape follows quality changes of its style
+    palette.apply_quality(INTERACTION_QUALITY)
+    assert ais_shape.Attributes().ShadingAspect().Transparency() == 0
+
+    palette.clear()
+    assert len(palette) == 0
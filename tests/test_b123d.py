@@ -125,3 +125,34 @@ def test_b123d_collect_pending(knife_build123d):
     assert len(result[0][0]) == 1
     assert len(result[0][1]) == 0
     assert len(result[0][2]) == 1
+
+
+def test_b123d_sketch_cached(knife_build123d):
+    context = ExecutionContext()
+    with BuildPart() as part:
+        dp_obj = B123dBuildPart(context, part, "test")
+        assert not dp_obj.sketch
+        with BuildSketch():
+            Circle(radius=5)
+        sketch = dp_obj.sketch
+        assert sketch
+        assert dp_obj.sketch is sketch
+        extrude(amount=5)
+        assert not dp_obj.sketch
+
+
+def test_b123d_sketch_cache_reuses_edge_compounds(knife_build123d):
+    from cq_viewer.util import PendingSketchCache
+
+    cache = PendingSketchCache()
+    with BuildPart() as part:
+        with BuildSketch():
+            with BuildLine():
+                Line((0, 0), (1, 1))
+
+    first = cache.get(part)
+    part.builder_children.append(part.builder_children[0])
+    second = cache.get(part)
+    assert first is not second
+    assert len(second) == 2
+    assert second[0][1][0].IsSame(first[0][1][0])
@@ -0,0 +1,57 @@
+import threading
+
+from build123d import Box, Pos
+
+from cq_viewer.clash import ClashSolid, broad_phase, detect_clashes, narrow_phase
+
+
+def solid(name, obj):
+    return ClashSolid(name, obj.wrapped)
+
+
+def test_broad_phase_prunes_distant_pairs():
+    solids = [
+        solid("a", Box(1, 1, 1)),
+        solid("b", Pos(0.5, 0, 0) * Box(1, 1, 1)),
+        solid("c", Pos(10, 0, 0) * Box(1, 1, 1)),
+    ]
+    assert broad_phase(solids) == [(0, 1)]
+
+
+def test_narrow_phase_measures_common_volume():
+    clash = narrow_phase(
+        solid("a", Box(1, 1, 1)), solid("b", Pos(0.5, 0, 0) * Box(1, 1, 1))
+    )
+    assert clash.interference
+    assert abs(clash.volume - 0.5) < 1e-6
+
+
+def test_narrow_phase_reports_touching_solids():
+    clash = narrow_phase(
+        solid("a", Box(1, 1, 1)), solid("b", Pos(1, 0, 0) * Box(1, 1, 1))
+    )
+    assert clash is not None
+    assert not clash.interference
+
+
+def test_detect_clashes_in_worker_processes():
+    solids = [
+        solid("a", Box(1, 1, 1)),
+        solid("b", Pos(0.5, 0, 0) * Box(1, 1, 1)),
+        solid("c", Pos(1.5, 0, 0) * Box(1, 1, 1)),
+        solid("d", Pos(10, 0, 0) * Box(1, 1, 1)),
+    ]
+    results = []
+    done = threading.Event()
+
+    def on_done(clashes):
+        results.append(clashes)
+        done.set()
+
+    assert detect_clashes(solids, on_done) == 2
+    assert done.wait(60)
+    interference, touching = results[0]
+    assert (interference.solid1.name, interference.solid2.name) == ("a", "b")
+    assert abs(interference.volume - 0.5) < 1e-6
+    assert (touching.solid1.name, touching.solid2.name) == ("b", "c")
+    assert not touching.interference
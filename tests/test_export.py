@@ -0,0 +1,55 @@
+import cadquery as cq
+import pytest
+from cq_viewer.export import (
+    ExportFormat,
+    ExportItem,
+    detached_items,
+    ensure_triangulation,
+    export_items,
+    unmeshed_faces,
+    write_step,
+)
+
+
+def box_item() -> ExportItem:
+    return ExportItem("box", cq.Solid.makeBox(1, 2, 3).wrapped, None, None)
+
+
+def test_format_from_path():
+    assert ExportFormat.from_path("part.STP") == ExportFormat.STEP
+    assert ExportFormat.from_path("part.glb").is_mesh
+    with pytest.raises(ValueError):
+        ExportFormat.from_path("part.dxf")
+
+
+def test_step_export(tmp_path):
+    file_path = tmp_path / "box.step"
+
+    export_items([box_item()], str(file_path))
+
+    assert "ISO-10303-21" in file_path.read_text()
+
+
+def test_step_export_failure_raises(tmp_path):
+    with pytest.raises(RuntimeError):
+        write_step([box_item()], str(tmp_path / "missing" / "box.step"))
+
+
+def test_mesh_export_leaves_the_shape_alone(tmp_path):
+    item = box_item()
+    file_path = tmp_path / "box.stl"
+
+    export_items([item], str(file_path))
+
+    assert file_path.stat().st_size > 0
+    assert len(unmeshed_faces(item.shape)) == 6
+
+
+def test_detached_items_keep_the_mesh():
+    item = box_item()
+    ensure_triangulation(item.shape)
+
+    (detached,) = detached_items([item])
+
+    assert not detached.shape.IsSame(item.shape)
+    assert not unmeshed_faces(detached.shape)
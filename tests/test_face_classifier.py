@@ -0,0 +1,34 @@
+import cadquery as cq
+
+from cq_viewer.face_classifier import face_classifier
+
+
+def square_with_hole():
+    return (
+        cq.Workplane()
+        .rect(10, 10)
+        .circle(2)
+        .extrude(1)
+        .faces(">Z")
+        .val()
+        .wrapped
+    )
+
+
+def test_hole_is_outside_of_the_face():
+    classifier = face_classifier(square_with_hole())
+
+    assert not classifier.contains_normalized(0.5, 0.5)
+    assert classifier.contains_normalized(0.1, 0.1)
+    corner = (classifier.u_min + 1, classifier.v_min + 1)
+    center = (
+        (classifier.u_min + classifier.u_max) / 2,
+        (classifier.v_min + classifier.v_max) / 2,
+    )
+    assert classifier.contains_many([corner, center]) == [True, False]
+
+
+def test_classifiers_are_cached_per_face():
+    face = square_with_hole()
+
+    assert face_classifier(face) is face_classifier(face)
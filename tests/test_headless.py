@@ -0,0 +1,63 @@
+import pytest
+
+from cq_viewer.timing import timings
+
+MODEL = """
+import cadquery as cq
+
+box = cq.Workplane().box(10, 10, 10)
+show_object(box, name="box")
+"""
+
+
+@pytest.fixture
+def viewer(tmp_path):
+    from cq_viewer.headless import HeadlessViewer
+
+    try:
+        viewer = HeadlessViewer(400, 300)
+    except Exception as ex:
+        pytest.skip(f"No offscreen OpenGL context: {ex}")
+    model = tmp_path / "model.py"
+    model.write_text(MODEL)
+    viewer.load(str(model))
+    yield viewer
+    viewer.close()
+
+
+def test_display_activates_selection(viewer):
+    assert viewer.ctx.selection_ready
+    assert viewer.ctx.selectable_ais_shapes
+    assert "display" in timings.last
+
+
+def test_hover_and_select_top_face(viewer):
+    x, y = viewer.to_pixel(0, 0, 5)
+
+    viewer.hover(x, y)
+    assert viewer.canvas.context.HasDetected()
+    assert "pick" in timings.last
+
+    viewer.click(x, y)
+    assert len(viewer.ctx.selected_shapes) == 1
+    assert viewer.ctx.measurement.measurements
+    assert "select" in timings.last
+
+    viewer.clear_selection()
+    assert not viewer.ctx.selected_shapes
+
+
+def test_hover_outside_the_model(viewer):
+    viewer.hover(0, 0)
+    assert not viewer.canvas.context.HasDetected()
+
+
+def test_hovering_the_selected_face_does_not_measure_it_twice(viewer):
+    x, y = viewer.to_pixel(0, 0, 5)
+    viewer.click(x, y)
+    assert viewer.ctx.selected_map.Extent() == 1
+    single = dict(viewer.ctx.measurement.measurements)
+
+    viewer.hover(x, y)
+    assert len(viewer.ctx.measurement.base_shapes) == 1
+    assert viewer.ctx.measurement.measurements == single
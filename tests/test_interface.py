@@ -0,0 +1,38 @@
+import cadquery as cq
+import pytest
+from OCP.AIS import AIS_Shape
+
+from cq_viewer.interface import DisplayObject, extract_ais_shapes
+
+
+def test_nested_objects_are_flattened_in_order():
+    box = cq.Solid.makeBox(1, 1, 1)
+    sphere = cq.Solid.makeSphere(1)
+    cylinder = cq.Solid.makeCylinder(1, 1)
+
+    ais_shapes = extract_ais_shapes(
+        [box, None, (sphere, [cq.Workplane().add(cylinder)]), box.wrapped]
+    )
+
+    shapes = [ais_shape.Shape() for ais_shape in ais_shapes]
+    assert len(shapes) == 4
+    assert shapes[0].IsSame(box.wrapped)
+    assert shapes[1].IsSame(sphere.wrapped)
+    assert shapes[2].IsSame(cylinder.wrapped)
+    assert shapes[3].IsSame(box.wrapped)
+
+
+def test_unsupported_objects_raise():
+    with pytest.raises(ValueError):
+        extract_ais_shapes([cq.Solid.makeBox(1, 1, 1), "box"])
+
+
+def test_conversion_is_cached_until_the_object_changes():
+    dp_obj = DisplayObject(None, cq.Workplane().box(1, 1, 1), "box")
+
+    ais_objects = dp_obj.ais_objects
+    assert dp_obj.ais_objects is ais_objects
+    assert all(isinstance(ais_object, AIS_Shape) for ais_object in ais_objects)
+
+    dp_obj.obj = cq.Workplane().sphere(1)
+    assert dp_obj.ais_objects is not ais_objects
@@ -0,0 +1,66 @@
+import os
+import threading
+from multiprocessing import AuthenticationError
+
+import cadquery as cq
+import pytest
+from OCP.TopAbs import TopAbs_SOLID
+
+from cq_viewer.ipc import ViewerClient, ViewerServer, key_path
+
+
+@pytest.fixture
+def received(tmp_path):
+    objects = []
+    arrived = threading.Event()
+
+    def on_object(name, shape, options):
+        objects.append((name, shape, options))
+        arrived.set()
+
+    server = ViewerServer(
+        on_object, lambda name: None, lambda: None, str(tmp_path / "viewer.sock")
+    )
+    server.start()
+    yield server, objects, arrived
+    server.stop()
+
+
+def test_show_object_in_chunks(received):
+    server, objects, arrived = received
+
+    with ViewerClient(server.address) as client:
+        client.show_object(
+            cq.Workplane().box(1, 2, 3), "box", {"color": "red"}, chunk_size=256
+        )
+
+    assert arrived.wait(10)
+    name, shape, options = objects[0]
+    assert name == "box"
+    assert options == {"color": "red"}
+    assert shape.ShapeType() == TopAbs_SOLID
+
+
+def test_socket_and_key_are_private(received):
+    server, _, _ = received
+
+    assert os.stat(server.address).st_mode & 0o777 == 0o600
+    assert os.stat(key_path(server.address)).st_mode & 0o777 == 0o600
+
+
+def test_client_without_the_key_is_rejected(received):
+    server, _, _ = received
+    with open(key_path(server.address), "wb") as f:
+        f.write(b"not the key")
+
+    with pytest.raises(AuthenticationError):
+        ViewerClient(server.address)
+
+
+def test_second_server_does_not_take_over(received):
+    server, _, _ = received
+
+    with pytest.raises(OSError):
+        ViewerServer(
+            lambda *args: None, lambda name: None, lambda: None, server.address
+        ).start()
@@ -0,0 +1,55 @@
+import threading
+
+import cadquery as cq
+import pytest
+
+from cq_viewer import mass_properties
+from cq_viewer.mass_properties import (
+    FAILED,
+    MassPropertiesCache,
+    mass_properties_measurements,
+)
+
+
+def request_and_wait(cache, shapes):
+    ready = threading.Event()
+    if any(mp is None for mp in cache.request(shapes, ready.set)):
+        assert ready.wait(10)
+    return cache.request(shapes)
+
+
+def test_box_properties_are_computed_once():
+    box = cq.Solid.makeBox(1, 2, 3).wrapped
+    cache = MassPropertiesCache()
+
+    (first,) = request_and_wait(cache, [box])
+    assert cache.request([box]) == [first]
+
+    measurements = mass_properties_measurements([first])
+    assert measurements["volume"] == pytest.approx(6)
+    assert measurements["surface_area"] == pytest.approx(22)
+    assert measurements["center_of_mass"] == "(0.5, 1, 1.5)"
+
+
+def test_cache_is_bounded():
+    cache = MassPropertiesCache(size=2)
+    boxes = [cq.Solid.makeBox(1, 1, i + 1).wrapped for i in range(3)]
+
+    for box in boxes:
+        request_and_wait(cache, [box])
+
+    assert cache.get(boxes[0]) is None
+    assert cache.get(boxes[2]) is not None
+    cache.clear()
+    assert cache.get(boxes[2]) is None
+
+
+def test_failures_are_cached(monkeypatch):
+    def fail(shape):
+        raise RuntimeError("no properties")
+
+    monkeypatch.setattr(mass_properties, "compute_mass_properties", fail)
+
+    assert request_and_wait(
+        MassPropertiesCache(), [cq.Solid.makeBox(1, 1, 1).wrapped]
+    ) == [FAILED]
@@ -0,0 +1,51 @@
+import math
+
+import cadquery as cq
+import pytest
+from OCP.BRep import BRep_Tool
+from OCP.TopLoc import TopLoc_Location
+
+from cq_viewer.max_distance import face_samples, max_distance, surface_samples
+from cq_viewer.measurement import optimize_face_face
+
+
+def squares_apart(distance):
+    square = cq.Face.makePlane(2, 2)
+    return square.wrapped, square.translate(cq.Vector(0, 0, distance)).wrapped
+
+
+def test_max_distance_between_parallel_squares():
+    face1, face2 = squares_apart(3)
+
+    _, _, distance = max_distance(face1, face2)
+
+    assert distance == pytest.approx(math.sqrt(8 + 9), rel=1e-4)
+
+
+def test_min_distance_between_parallel_squares():
+    face1, face2 = squares_apart(3)
+
+    _, _, distance = optimize_face_face(face1, face2)
+
+    assert distance == pytest.approx(3, rel=1e-4)
+
+
+def test_surface_samples_cover_the_face():
+    face, _ = squares_apart(0)
+
+    samples = surface_samples(face)
+
+    assert samples.points[:, 0].min() == pytest.approx(-1)
+    assert samples.points[:, 0].max() == pytest.approx(1)
+    assert 0 < samples.radius < 0.2
+
+
+def test_face_samples_leave_the_face_unmeshed():
+    face = cq.Face.makePlane(2, 2).moved(cq.Location(cq.Vector(0, 0, 5))).wrapped
+
+    samples = face_samples(face)
+
+    assert BRep_Tool.Triangulation_s(face, TopLoc_Location()) is None
+    # Nodes are in global coordinates
+    assert samples.points[:, 2] == pytest.approx(5)
+    assert samples.points[:, 0].min() == pytest.approx(-1)
@@ -0,0 +1,41 @@
+import cadquery as cq
+
+from cq_viewer.mass_properties import FAILED
+from cq_viewer.max_distance import shape_samples
+from cq_viewer.measurement import DistanceCache, MeasuredValue
+
+
+def test_measured_value_equality():
+    assert MeasuredValue(1.0) == 1.0
+    assert MeasuredValue(1.0, 0.1) == MeasuredValue(1.0, 0.1)
+    assert MeasuredValue(1.0, 0.1) != MeasuredValue(1.0)
+    assert MeasuredValue(1.0) != "1.0"
+    assert MeasuredValue(1.0) != None  # noqa: E711
+
+
+def test_face_samples_are_cached():
+    face = cq.Face.makePlane(2, 2).wrapped
+
+    samples = shape_samples(face)
+
+    assert shape_samples(face) is samples
+    assert samples.points.shape[1] == 3
+    assert samples.params.min() >= 0 and samples.params.max() <= 1
+
+
+def test_failed_pairs_are_cached_and_reported():
+    calls = []
+
+    def fail(shape1, shape2):
+        calls.append((shape1, shape2))
+        raise ValueError("no distance")
+
+    cache = DistanceCache(fail)
+    box1 = cq.Solid.makeBox(1, 1, 1).wrapped
+    box2 = cq.Solid.makeBox(1, 1, 1, cq.Vector(2, 0, 0)).wrapped
+    updates = []
+
+    assert cache.submit(box1, box2, lambda: updates.append(1)).result() is FAILED
+    assert updates == [1]
+    assert cache.get(box1, box2) is FAILED
+    assert len(calls) == 1
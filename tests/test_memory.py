@@ -0,0 +1,35 @@
+import cadquery as cq
+from OCP.BRepMesh import BRepMesh_IncrementalMesh
+from OCP.TopAbs import TopAbs_EDGE, TopAbs_FACE
+
+from cq_viewer.memory import (
+    NODE_BYTES,
+    TRIANGLE_BYTES,
+    count_sub_shapes,
+    count_triangulation,
+    format_bytes,
+    process_rss,
+)
+
+
+def test_format_bytes():
+    assert format_bytes(512) == "512 B"
+    assert format_bytes(2048) == "2 KiB"
+    assert format_bytes(3 * 1024**3) == "3.0 GiB"
+
+
+def test_box_counts():
+    box = cq.Solid.makeBox(1, 1, 1).wrapped
+    assert count_sub_shapes(box, TopAbs_FACE) == 6
+    assert count_sub_shapes(box, TopAbs_EDGE) == 12
+    assert count_triangulation(box) == (0, 0, 0)
+
+    BRepMesh_IncrementalMesh(box, 0.1)
+    nodes, triangles, mesh_bytes = count_triangulation(box)
+    # Two triangles and four nodes per planar face
+    assert (nodes, triangles) == (24, 12)
+    assert mesh_bytes >= nodes * NODE_BYTES + triangles * TRIANGLE_BYTES
+
+
+def test_process_rss():
+    assert process_rss() > 0
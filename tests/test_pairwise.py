@@ -0,0 +1,62 @@
+import cadquery as cq
+import pytest
+
+from cq_viewer.measurement import CACHE_MISS, DistanceCache
+from cq_viewer.pairwise import (
+    PENDING,
+    all_pairs,
+    closest_pairs,
+    min_distance,
+    nearest_neighbours,
+)
+
+
+def boxes_along_x(*xs):
+    return [cq.Solid.makeBox(1, 1, 1, cq.Vector(x, 0, 0)).wrapped for x in xs]
+
+
+def test_all_pairs_of_boxes_a_known_distance_apart():
+    shapes = boxes_along_x(0, 3, 10)
+
+    distances, complete = all_pairs(
+        len(shapes), lambda i, j: min_distance(shapes[i], shapes[j])
+    )
+
+    assert complete
+    assert distances[(0, 1)][2] == pytest.approx(2)
+    assert distances[(1, 2)][2] == pytest.approx(6)
+    assert distances[(0, 2)][2] == pytest.approx(9)
+    assert closest_pairs(distances, 3) == {(0, 1), (1, 2)}
+
+
+def test_nearest_neighbours_skips_far_pairs_and_reports_pending():
+    shapes = boxes_along_x(0, 3, 10, 30)
+    looked_up = []
+
+    def lookup(i, j):
+        looked_up.append((i, j))
+        return min_distance(shapes[i], shapes[j])
+
+    distances, complete = nearest_neighbours(shapes, lookup)
+    assert complete
+    assert len(looked_up) == len(set(looked_up))
+    assert (0, 3) not in looked_up
+    assert distances[(2, 3)][2] == pytest.approx(19)
+
+    _, complete = nearest_neighbours(shapes, lambda i, j: PENDING)
+    assert not complete
+
+
+def test_symmetric_cache_computes_each_pair_once():
+    shapes = boxes_along_x(0, 3)
+    calls = []
+
+    def compute(shape1, shape2):
+        calls.append(1)
+        return min_distance(shape1, shape2)
+
+    cache = DistanceCache(compute, symmetric=True)
+    assert cache.get(shapes[0], shapes[1]) is CACHE_MISS
+    first = cache.compute(shapes[0], shapes[1])
+    assert cache.compute(shapes[1], shapes[0]) is first
+    assert len(calls) == 1
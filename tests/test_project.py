@@ -0,0 +1,33 @@
+from cq_viewer.project import Project, local_imports
+
+
+def test_local_imports(tmp_path):
+    (tmp_path / "common.py").write_text("WIDTH = 1\n")
+    (tmp_path / "parts").mkdir()
+    (tmp_path / "parts" / "__init__.py").write_text("")
+    (tmp_path / "parts" / "bolt.py").write_text("from common import WIDTH\n")
+    model = tmp_path / "model.py"
+    model.write_text("import os\nimport common\nfrom parts import bolt\n")
+
+    assert local_imports(model) == {
+        (tmp_path / "common.py").resolve(),
+        (tmp_path / "parts" / "__init__.py").resolve(),
+        (tmp_path / "parts" / "bolt.py").resolve(),
+    }
+
+
+def test_affected_files_follow_transitive_imports(tmp_path):
+    (tmp_path / "common.py").write_text("WIDTH = 1\n")
+    (tmp_path / "bracket.py").write_text("import common\n")
+    (tmp_path / "frame.py").write_text("import bracket\n")
+    (tmp_path / "lid.py").write_text("LID = 1\n")
+    project = Project(
+        [tmp_path / "bracket.py", tmp_path / "frame.py", tmp_path / "lid.py"]
+    )
+
+    assert project.affected({tmp_path / "common.py"}) == [
+        (tmp_path / "bracket.py").resolve(),
+        (tmp_path / "frame.py").resolve(),
+    ]
+    assert project.affected({tmp_path / "lid.py"}) == [(tmp_path / "lid.py").resolve()]
+    assert (tmp_path / "common.py").resolve() in project.watched_paths
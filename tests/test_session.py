@@ -0,0 +1,66 @@
+from cq_viewer.session import Replayer, Session, SessionRecorder, file_hash
+from cq_viewer.snapshot import CameraState
+
+CAMERA = CameraState((0, 0, 10), (0, 0, 0), (0, 1, 0), 1.0, True)
+
+
+class RecordingCanvas:
+    def __init__(self):
+        self.calls = []
+
+    def motion(self, x, y, left=False, middle=False, right=False):
+        self.calls.append(("motion", x, y, left))
+
+    def left_up(self, shift=False):
+        self.calls.append(("left_up", shift))
+
+
+def record_session(tmp_path):
+    model = tmp_path / "model.py"
+    model.write_text("show_object(None)")
+    recorder = SessionRecorder(str(tmp_path / "session.jsonl"))
+    assert not recorder.started
+    recorder.begin(str(model), (400, 300), CAMERA)
+    recorder.record("motion", x=10, y=20, left=False, middle=False, right=False)
+    recorder.record("left_up", shift=True)
+    recorder.record("key", code=90)
+    recorder.close()
+    return model, Session.read(recorder.file_path)
+
+
+def test_round_trip(tmp_path):
+    model, session = record_session(tmp_path)
+
+    assert session.model_hash == file_hash(str(model))
+    assert session.size == (400, 300)
+    assert session.camera.eye == [0, 0, 10]
+    assert [event.kind for event in session.events] == ["motion", "left_up", "key"]
+    assert session.events[0].t <= session.events[1].t
+    assert not session.mismatches(str(model), (400, 300))
+
+    model.write_text("changed")
+    assert len(session.mismatches(str(model), (800, 600))) == 2
+
+
+def test_replay_calls_handlers_and_reports_latency(tmp_path):
+    _, session = record_session(tmp_path)
+    session.camera = None
+    canvas = RecordingCanvas()
+    keys = []
+
+    report = Replayer(session, canvas, lambda code: keys.append(code)).run()
+
+    assert canvas.calls == [("motion", 10, 20, False), ("left_up", True)]
+    assert keys == [90]
+    assert report.summary()["motion"]["count"] == 1
+    assert "left_up" in report.format_summary()
+
+
+def test_replay_without_key_handler_skips_keys(tmp_path):
+    _, session = record_session(tmp_path)
+    session.camera = None
+
+    report = Replayer(session, RecordingCanvas()).run()
+
+    assert report.skipped == 1
+    assert "key" not in report.latencies
@@ -0,0 +1,29 @@
+from build123d import Box
+from OCP.TopAbs import TopAbs_FACE
+
+from cq_viewer.interface import DisplayObject, ExecutionContext
+from cq_viewer.shape_index import locate, resolve, signature
+
+
+def display_objects(obj):
+    return [DisplayObject(ExecutionContext(), obj, "box")]
+
+
+def test_selection_resolves_after_reexecution():
+    before = display_objects(Box(1, 2, 3))
+    face = before[0].shape_indexes[0].sub_shapes(TopAbs_FACE)[2]
+    ref = locate(before, face)
+    assert ref.index == 3
+
+    after = display_objects(Box(1, 2, 3))
+    _, resolved = resolve(after, ref)
+    assert not resolved.IsSame(face)
+    assert signature(resolved) == ref.signature
+
+
+def test_edited_face_is_not_restored():
+    before = display_objects(Box(1, 2, 3))
+    face = before[0].shape_indexes[0].sub_shapes(TopAbs_FACE)[0]
+    ref = locate(before, face)
+
+    assert resolve(display_objects(Box(1, 2, 4)), ref) is None
@@ -0,0 +1,27 @@
+from multiprocessing.shared_memory import SharedMemory
+
+import cadquery as cq
+import pytest
+from OCP.BRepGProp import BRepGProp
+from OCP.GProp import GProp_GProps
+
+from cq_viewer.shared_brep import cached_shape, read_shape, release, share_shape
+
+
+def volume(shape) -> float:
+    props = GProp_GProps()
+    BRepGProp.VolumeProperties_s(shape, props)
+    return props.Mass()
+
+
+def test_shape_round_trip():
+    shared = share_shape(cq.Solid.makeBox(1, 2, 3).wrapped)
+
+    assert volume(read_shape(shared)) == pytest.approx(6)
+    assert cached_shape(shared) is cached_shape(shared)
+
+    release(shared)
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(shared.name)
+    # Releasing twice is harmless
+    release(shared)
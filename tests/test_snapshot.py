@@ -0,0 +1,43 @@
+import cadquery as cq
+from OCP.Quantity import Quantity_Color, Quantity_TOC_RGB
+
+from cq_viewer.export import ExportItem
+from cq_viewer.snapshot import CameraState, Snapshot
+
+CAMERA = CameraState((0, 0, 10), (0, 0, 0), (0, 1, 0), 1.0, True)
+
+
+def write_snapshot(tmp_path) -> Snapshot:
+    snapshot = Snapshot(str(tmp_path), str(tmp_path / "model.py"))
+    snapshot.write(
+        [
+            ExportItem(
+                "box",
+                cq.Solid.makeBox(1, 2, 3).wrapped,
+                Quantity_Color(1, 0, 0, Quantity_TOC_RGB),
+                0.5,
+            ),
+            ExportItem("sphere", cq.Solid.makeSphere(1).wrapped, None, None),
+        ],
+        CAMERA,
+    )
+    return snapshot
+
+
+def test_round_trip(tmp_path):
+    items, camera = write_snapshot(tmp_path).read()
+
+    assert [item.name for item, _ in items] == ["box", "sphere"]
+    assert items[0][0].color == [1, 0, 0]
+    assert items[0][0].transparency == 0.5
+    assert items[1][0].color is None
+    assert camera.eye == [0, 0, 10]
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_brep_from_another_write_is_ignored(tmp_path):
+    snapshot = write_snapshot(tmp_path)
+    with open(snapshot.brep_path, "ab") as f:
+        f.write(b"\0")
+
+    assert snapshot.read() is None
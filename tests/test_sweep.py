@@ -0,0 +1,17 @@
+from cq_viewer.sweep import variant_key, variants
+
+
+def test_variants_cover_all_combinations():
+    assert variants({"wall": [1, 2], "holes": [3, 4, 5]}) == [
+        {"wall": 1, "holes": 3},
+        {"wall": 1, "holes": 4},
+        {"wall": 1, "holes": 5},
+        {"wall": 2, "holes": 3},
+        {"wall": 2, "holes": 4},
+        {"wall": 2, "holes": 5},
+    ]
+
+
+def test_variant_key_ignores_order():
+    assert variant_key({"a": 1, "b": 2.5}) == variant_key({"b": 2.5, "a": 1})
+    assert variant_key({"a": 1}) != variant_key({"a": 1.0})
@@ -0,0 +1,23 @@
+import cadquery as cq
+from OCP.BRep import BRep_Tool
+from OCP.TopLoc import TopLoc_Location
+
+from cq_viewer.shared_brep import read_shape, release, share_shape
+from cq_viewer.tessellation import attach_triangulations, explore_faces, tessellate
+
+
+def test_worker_mesh_is_attached_to_the_faces_of_the_shape():
+    shape = cq.Solid.makeCylinder(5, 10).wrapped
+
+    shared = share_shape(shape)
+    meshed_shared = tessellate(shared, 0.1, 0.5)
+    meshed = read_shape(meshed_shared)
+    release(shared)
+    release(meshed_shared)
+    attach_triangulations(shape, meshed)
+
+    for face in explore_faces(shape):
+        triangulation = BRep_Tool.Triangulation_s(face, TopLoc_Location())
+        assert triangulation is not None
+        assert triangulation.NbTriangles() > 0
+        assert triangulation.HasNormals()
@@ -0,0 +1,56 @@
+import threading
+
+import cadquery as cq
+import numpy as np
+import pytest
+
+from cq_viewer.thickness import (
+    NO_HIT_COLOR,
+    THIN_COLOR,
+    MeshSamples,
+    ThicknessResult,
+    analyze_thickness,
+    pack_color,
+    thickness_colors,
+)
+
+
+def test_pack_color_is_red_in_low_byte():
+    assert pack_color((1.0, 0.0, 0.0)) == 0x0000FF
+    assert pack_color((0.0, 0.0, 1.0)) == 0xFF0000
+
+
+def test_thin_nodes_are_highlighted():
+    samples = MeshSamples(np.zeros((3, 3)), np.zeros((3, 3)), np.zeros((0, 3)), 0.1)
+    result = ThicknessResult(samples, np.array([0.5, 2.0, np.nan]), threshold=1.0)
+
+    colors = thickness_colors(result)
+    assert colors[0] == pack_color(THIN_COLOR)
+    assert colors[2] == pack_color(NO_HIT_COLOR)
+    assert result.thin_count == 1
+    assert float(result.minimum) == 0.5
+    assert result.minimum.error == pytest.approx(0.2)
+
+
+def test_exact_mesh_still_has_an_error_bound():
+    samples = MeshSamples(np.zeros((1, 3)), np.zeros((1, 3)), np.zeros((0, 3)), 0.0)
+    result = ThicknessResult(samples, np.array([1.0]), threshold=0.5)
+
+    assert result.minimum.error == 0.0
+    assert not result.minimum.converged
+
+
+def test_plate_thickness():
+    plate = cq.Solid.makeBox(10, 10, 1).wrapped
+    results = []
+    done = threading.Event()
+
+    analyze_thickness(plate, lambda result: (results.append(result), done.set()), 2.0)
+
+    assert done.wait(60)
+    result = results[0]
+    # Rays from nodes on the edges must not stop on the side faces
+    assert float(result.minimum) == pytest.approx(1, abs=1e-6)
+    top_and_bottom = np.abs(result.samples.normals[:, 2]) > 0.9
+    assert result.thin_count == np.sum(top_and_bottom)
+    assert np.nanmin(result.thickness[~top_and_bottom]) == pytest.approx(10, abs=1e-6)
@@ -0,0 +1,55 @@
+import json
+
+from cq_viewer.tracing import NULL_SPAN, Level, Tracer, percentile
+
+
+def test_disabled_tracer_returns_null_span():
+    tracer = Tracer()
+    assert tracer.span("display") is NULL_SPAN
+    with tracer.span("display"):
+        pass
+    assert not tracer.events
+
+
+def test_span_levels():
+    tracer = Tracer(Level.INFO)
+    with tracer.span("display"):
+        pass
+    with tracer.span("tessellation", Level.DEBUG):
+        pass
+    assert [event[0] for event in tracer.events] == ["display"]
+
+
+def test_span_ended_in_a_callback():
+    tracer = Tracer(Level.INFO)
+    span = tracer.begin("thickness analysis")
+    assert not tracer.events
+    span.end()
+    assert [event[0] for event in tracer.events] == ["thickness analysis"]
+
+    Tracer().begin("thickness analysis").end()
+
+
+def test_summary_and_chrome_trace(tmp_path):
+    tracer = Tracer(Level.DEBUG)
+    for _ in range(10):
+        with tracer.span("pick", x=1):
+            pass
+    summary = tracer.summary()
+    assert summary["pick"]["count"] == 10
+    assert summary["pick"]["p50"] <= summary["pick"]["max"]
+
+    file_path = tmp_path / "trace.json"
+    tracer.write_chrome_trace(str(file_path))
+    trace = json.loads(file_path.read_text())
+    assert len(trace["traceEvents"]) == 10
+    assert trace["traceEvents"][0]["ph"] == "X"
+    assert trace["traceEvents"][0]["args"] == {"x": 1}
+
+
+def test_percentile():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([3.0], 90) == 3.0